@@ -0,0 +1,208 @@
+# bench_gui.py - Headless GUI benchmark (frame time and idle CPU)
+"""
+Runs gui_compiler.CompilerGUI on SDL's dummy video driver and reports:
+
+- full frame: clearing and drawing every widget (what every tick cost
+  before dirty-region redraw)
+- keystroke frame: handling one KEYDOWN and redrawing the dirty widgets
+- live keystroke: the same with compile-as-you-type, i.e. the keystroke's
+  latency to updated results from the worker process, typing a reaction
+  for the first time (cold) and again (compile cache hits)
+- paste frame: the frame pasting a reaction of --heavy species into the
+  input, and how long its results take to arrive
+- scroll frame: redrawing the output panel after scrolling 20k lines
+- frames during a heavy compile: the frame rate the UI thread keeps up
+  (redrawing every tick) while the worker process compiles a reaction of
+  --heavy species; a synchronous compile would freeze for its duration
+- batch mode: rows per second compiled into the batch list, and the frame
+  rate while it streams in, for a --batch line synthetic corpus
+- idle CPU: CPU time / wall time while the window sits idle for --idle
+  seconds, with the input focused (caret blinking) and unfocused, for the
+  event-driven loop and for the old fixed-FPS full-redraw loop
+
+Needs pygame. Usage:
+    python bench_gui.py [--frames 200] [--idle 2] [--heavy 5000] [--batch 20000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+import gui_compiler
+from chem_pipeline import Pipeline
+from chem_corpus import write_corpus
+
+
+def frame_ms(action, frames):
+    start = time.perf_counter()
+    for _ in range(frames):
+        action()
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def wait_for_compile(app):
+    while app.compiling is not None:
+        app.handle_events([pygame.event.wait(100)])
+
+
+def live_keystroke_ms(app, text="CH3CH2OH + O2 -> CO2 + H2O"):
+    """Mean latency per keystroke typing text into the input, until its results are drawn"""
+    pygame.event.clear()
+    app.input_box.text = ""
+    app.input_box.active = True
+    keys = [pygame.event.Event(pygame.KEYDOWN, key=0, unicode=char, mod=0, scancode=0) for char in text]
+    start = time.perf_counter()
+    for key in keys:
+        app.handle_events([key])
+        app.update()
+        wait_for_compile(app)
+        app.draw()
+    return (time.perf_counter() - start) / len(keys) * 1000
+
+
+def paste_ms(app, species):
+    """(frame ms, ms until the results are drawn) pasting a large reaction into the empty input"""
+    formula = ' + '.join(['K3[Fe(CN)6]'] * species)  # Not the heavy compile's, which would hit the cache
+    paste = pygame.event.Event(pygame.KEYDOWN, key=0, unicode=f"{formula} -> {formula}", mod=0, scancode=0)
+    pygame.event.clear()
+    app.input_box.text = ""
+    app.input_box.active = True
+    start = time.perf_counter()
+    app.handle_events([paste])
+    app.update()
+    app.draw()
+    frame = time.perf_counter() - start
+    wait_for_compile(app)
+    app.draw()
+    results = time.perf_counter() - start
+    app.input_box.text = ""
+    return frame * 1000, results * 1000
+
+
+def heavy_compile_fps(app, species):
+    """(achieved frames per second, seconds) while the worker compiles a large reaction"""
+    formula = ' + '.join(['K4[Fe(CN)6]'] * species)
+    start = time.perf_counter()
+    app.compile_reaction(f"{formula} -> {formula}")
+    frames = 0
+    while app.compiling is not None:
+        app.handle_events()
+        app.update()
+        app.full_redraw = True
+        app.draw()
+        app.clock.tick(gui_compiler.FPS)
+        frames += 1
+    elapsed = time.perf_counter() - start
+    return frames / elapsed, elapsed
+
+
+def batch_fps(app, lines):
+    """(rows per second, achieved frames per second) compiling a corpus in batch mode"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.txt")
+        write_corpus(path, lines)
+        start = time.perf_counter()
+        app.open_batch(path)
+        frames = 0
+        while not app.batch.done:
+            app.handle_events()
+            app.update()
+            app.draw()
+            app.clock.tick(gui_compiler.FPS)
+            frames += 1
+        elapsed = time.perf_counter() - start
+        rows = len(app.batch)
+        app.close_batch()
+    return rows / elapsed, frames / elapsed
+
+
+def fixed_fps_loop(app):
+    """The loop before dirty-region redraw: full redraw and flip every tick"""
+    while app.running:
+        app.handle_events()
+        app.update()
+        app.draw_all()
+        app.clock.tick(gui_compiler.FPS)
+
+
+def idle_cpu(app, loop, seconds, focused):
+    """Fraction of one core used while idle for `seconds`"""
+    app.running = True
+    app.input_box.active = focused
+    app.full_redraw = True
+    pygame.event.clear()
+    pygame.time.set_timer(pygame.QUIT, int(seconds * 1000), 1)
+    wall, cpu = time.perf_counter(), time.process_time()
+    loop(app)
+    return (time.process_time() - cpu) / (time.perf_counter() - wall)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--frames', type=int, default=200)
+    arg_parser.add_argument('--idle', type=float, default=2.0, help="seconds per idle measurement")
+    arg_parser.add_argument('--heavy', type=int, default=5000, help="species in the heavy compile")
+    arg_parser.add_argument('--batch', type=int, default=20000, help="lines in the batch-mode corpus")
+    args = arg_parser.parse_args(argv)
+
+    pygame.init()
+    app = gui_compiler.CompilerGUI()
+    app.show_result(Pipeline().compile("HCl + NaOH"), None)
+    app.draw_all()
+    print(f"SDL video driver: {pygame.display.get_driver()}")
+
+    print(f"full frame       {frame_ms(app.draw_all, args.frames):8.3f} ms")
+
+    app.input_box.active = True
+    key = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_a, unicode='a', mod=0, scancode=0)
+
+    def keystroke():
+        pygame.event.post(key)
+        app.handle_events()
+        app.input_box.text = app.input_box.text[:40]
+        app.live_due = None  # Input redraw only; 'live keystroke' includes the compile
+        app.update()
+        app.draw()
+    print(f"keystroke frame  {frame_ms(keystroke, args.frames):8.3f} ms")
+
+    for name in ('cold', 'cached'):  # The second pass hits the worker's compile cache
+        print(f"live keystroke   {live_keystroke_ms(app):8.3f} ms ({name})")
+
+    frame, results = paste_ms(app, args.heavy)
+    print(f"paste frame      {frame:8.3f} ms (results after {results:.0f} ms)")
+
+    area = app.output_area
+    area.set_content('\n'.join(f"line {i}: {'x' * (i % 60)}" for i in range(20000)))
+    app.draw()
+    offsets = iter(range(0, 10 ** 9, 37))
+
+    def scroll():
+        area.scroll_offset = next(offsets) % area.max_scroll
+        area.dirty = True
+        app.draw()
+    print(f"scroll frame     {frame_ms(scroll, args.frames):8.3f} ms")
+
+    fps, seconds = heavy_compile_fps(app, args.heavy)
+    print(f"heavy compile    {seconds:8.2f} s in the background at {fps:.0f} fps (target {gui_compiler.FPS})")
+
+    rows, fps = batch_fps(app, args.batch)
+    print(f"batch mode       {rows:8.0f} rows/s at {fps:.0f} fps")
+
+    print(f"idle CPU (fraction of one core over {args.idle:g}s):")
+    for name, loop in (('event-driven', gui_compiler.CompilerGUI.loop), ('fixed FPS', fixed_fps_loop)):
+        for focused in (False, True):
+            usage = idle_cpu(app, loop, args.idle, focused)
+            print(f"  {name:<13} {'focused' if focused else 'unfocused':<10} {usage:6.1%}")
+    app.worker.stop()
+    pygame.quit()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
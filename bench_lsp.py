@@ -0,0 +1,108 @@
+# bench_lsp.py - Edit-to-diagnostics latency of the chem_lsp daemon
+"""
+Runs chem_lsp.py as a subprocess through its scripted client, opens a
+document of --lines reactions and reports the time from sending an edit
+to receiving the whole publishDiagnostics message (read as bytes:
+decoding the JSON is the editor's cost, not the server's).
+
+The document is balanced, valid equations (no diagnostics) with a --noisy
+fraction of lines from the synthetic corpus (chem_corpus), which nearly
+all get a diagnostic: syntax errors, predictions, unbalanced products.
+Publishing sends a document's full diagnostic set, so its cost follows
+the number of diagnostics; --noisy 1 is the worst case.
+
+- open: analyzing every line and publishing
+- keystroke: a character typed into a line (one line re-analyzed)
+- new line: Enter in the first line (every line below renumbered)
+- undo new line: deleting it again
+
+Usage:
+    python bench_lsp.py [--lines 100000] [--noisy 0.02] [--edits 20]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from chem_corpus import CorpusGenerator
+from chem_lsp import LspClient, read_message
+
+URI = 'file:///bench.rxn'
+VALID = (
+    "HCl + NaOH -> NaCl + H2O",
+    "HNO3 + KOH -> KNO3 + H2O",
+    "Zn + H2SO4 -> ZnSO4 + H2",
+    "CaCO3 -> CaO + CO2",
+    "NH3 + HCl -> NH4Cl",
+    "Fe + S -> FeS",
+    "Mg + Cl2 -> MgCl2",
+    "C + O2 -> CO2",
+    "Ba(OH)2 + H2SO4 -> BaSO4 + H4O2",
+)
+
+
+def document(lines, noisy, seed=0):
+    rng = random.Random(seed)
+    corpus = CorpusGenerator(seed)
+    return '\n'.join(corpus.line() if rng.random() < noisy else rng.choice(VALID) for _ in range(lines))
+
+
+def published(client):
+    """Wait for the next publishDiagnostics; returns its size in bytes"""
+    while True:
+        body = read_message(client.process.stdout)
+        if b'"method":"textDocument/publishDiagnostics"' in body[:80]:
+            return len(body)
+
+
+def timed(client, action):
+    """(milliseconds, bytes) from action() to the diagnostics it causes"""
+    start = time.perf_counter()
+    action()
+    size = published(client)
+    return (time.perf_counter() - start) * 1000, size
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--lines', type=int, default=100_000)
+    arg_parser.add_argument('--noisy', type=float, default=0.02,
+                            help="fraction of lines from the synthetic corpus")
+    arg_parser.add_argument('--edits', type=int, default=20, help="repetitions per edit kind")
+    args = arg_parser.parse_args(argv)
+
+    text = document(args.lines, args.noisy)
+    client = LspClient()
+    client.initialize()
+    ms, size = timed(client, lambda: client.open(URI, text))
+    print(f"open          {ms:7.1f} ms  ({args.lines} lines, {size / 1e6:.2f} MB of diagnostics)")
+
+    version = 1
+    middle = args.lines // 2
+
+    def edit(start, end, text):
+        nonlocal version
+        version += 1
+        client.edit(URI, version, start, end, text)
+
+    kinds = {
+        'keystroke': lambda i: edit((middle, 0), (middle, 0), 'H' if i % 2 == 0 else ''),
+        'new line': lambda i: edit((0, 0), (0, 0), '\n'),
+        'undo new line': lambda i: edit((0, 0), (1, 0), ''),
+    }
+    times = {name: [] for name in kinds}
+    for i in range(args.edits):
+        for name, action in kinds.items():
+            if name == 'keystroke' and i % 2:
+                action = lambda i: edit((middle, 0), (middle, 1), '')
+            times[name].append(timed(client, lambda: action(i))[0])
+    for name, samples in times.items():
+        print(f"{name:<13} {statistics.median(samples):7.1f} ms median, {max(samples):7.1f} ms max")
+    code = client.close()
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
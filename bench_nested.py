@@ -0,0 +1,67 @@
+# bench_nested.py - Parser benchmark for deeply nested formulas
+"""
+Benchmark for Parser.parse_molecule on synthetic nested formulas.
+
+Shows that parse time grows linearly with formula length and that
+nesting far deeper than the recursion limit parses without error.
+
+Usage:
+    python bench_nested.py [--repeat N]
+"""
+
+import argparse
+import sys
+import time
+
+from chem_lexer import Lexer
+from chem_parser import Parser
+
+ELEMENTS = ['Fe', 'C', 'N', 'O', 'H', 'S', 'P', 'K', 'Cl', 'Ca']
+
+
+def deep_formula(depth):
+    """Single chain of groups: ((((Fe)2)3)2)..."""
+    opens = []
+    closes = []
+    for i in range(depth):
+        opens.append('[' if i % 2 else '(')
+        closes.append((']' if i % 2 else ')') + str(i % 3 + 1))
+    return ''.join(opens) + 'Fe' + ''.join(reversed(closes))
+
+
+def wide_formula(groups):
+    """Organometallic-style formula: many sibling groups with nested ligands."""
+    parts = []
+    for i in range(groups):
+        a = ELEMENTS[i % len(ELEMENTS)]
+        b = ELEMENTS[(i * 7 + 3) % len(ELEMENTS)]
+        parts.append(f"[{a}({b}O{i % 4 + 1})2]{i % 5 + 1}")
+    return ''.join(parts)
+
+
+def time_parse(text, repeat):
+    tokens = Lexer(text).tokenize()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Parser(tokens).parse()
+        best = min(best, time.perf_counter() - start)
+    return len(tokens), best
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args(argv)
+
+    print(f"Recursion limit: {sys.getrecursionlimit()}")
+    print(f"{'formula':<8} {'size':>8} {'tokens':>8} {'best ms':>10} {'ns/token':>10}")
+    for kind, build, sizes in (('deep', deep_formula, (100, 1000, 10000, 50000)),
+                               ('wide', wide_formula, (100, 1000, 10000, 50000))):
+        for size in sizes:
+            n_tokens, best = time_parse(build(size), args.repeat)
+            print(f"{kind:<8} {size:>8} {n_tokens:>8} {best * 1e3:>10.2f} {best * 1e9 / n_tokens:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# bench_startup.py - Startup (import time) benchmark for the command-line entry points
+"""
+Runs each entry point's script in a fresh interpreter with `python -X
+importtime`, on an empty reaction file, and reports the cumulative time of
+the imports the script made (best of --runs), the heaviest modules it
+pulled in, and any module from its UNWANTED list. Running the script, not
+importing it, also times what its __main__ block imports.
+
+Exit status is 1 if an entry point is over its target or imports an
+unwanted module, so scripts can gate on it. Bytecode caching is enabled
+for the child interpreters (PYTHONDONTWRITEBYTECODE is dropped) and one
+unmeasured run writes the .pyc files first, so the numbers are the warm
+startup a deployed install sees.
+
+Usage:
+    python bench_startup.py [--runs 5] [--show 5] [--target main=10]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Entry point -> cumulative import target in ms (generous: roughly 3x what
+# a modern laptop measures, so slow CI machines still pass)
+TARGETS_MS = {
+    'main': 10.0,
+    'main --batch': 30.0,
+    'chem_batch': 30.0,
+}
+
+# Entry point -> the arguments its script is run with; INPUT is replaced
+# by an empty reaction file, and stdin is empty so the interactive prompt
+# exits at once. Other entry points are timed by importing them.
+INPUT = '{input}'
+COMMANDS = {
+    'main': ('main.py',),
+    'main --batch': ('main.py', '--batch', INPUT),
+    'chem_batch': ('chem_batch.py', INPUT),
+}
+
+# Modules an entry point must not import up front; each is loaded lazily
+# by the feature that needs it (--memprofile, --stats json, stable_hash,
+# argparse for --help and malformed command lines). The bulk tokenizer
+# behind --batch needs re.
+UNWANTED = {
+    'main': ('typing', 'json', 'hashlib', 'tracemalloc', 're', 'pygame', 'traceback', 'argparse'),
+    'main --batch': ('typing', 'json', 'hashlib', 'tracemalloc', 'pygame', 'traceback', 'argparse',
+                     'concurrent.futures'),
+    'chem_batch': ('typing', 'json', 'hashlib', 'tracemalloc', 'pygame', 'concurrent.futures'),
+}
+
+
+def _importtime(args):
+    """[(name, self_us, cumulative_us, top_level)] from `python -X importtime args`"""
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + list(args), cwd=HERE, env=env,
+                          stdin=subprocess.DEVNULL, capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # Header
+        rows.append((name.strip(), int(self_us), int(cumulative_us), not name[1:].startswith(' ')))
+    return rows
+
+
+def import_profile(entry_point):
+    """
+    [(name, self_us, cumulative_us, top_level)] for the modules imported by
+    running entry_point (see COMMANDS) in a fresh interpreter; interpreter
+    startup such as site and encodings is left out
+    """
+    startup = {row[0] for row in _importtime(['-c', 'pass'])}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'empty.txt')
+        open(path, 'w').close()
+        command = COMMANDS.get(entry_point, ('-c', f"import {entry_point}"))
+        rows = _importtime([path if arg == INPUT else arg for arg in command])
+    # Startup modules are never imported a second time, so their names mark them
+    return [row for row in rows if row[0] not in startup]
+
+
+def total_ms(rows):
+    """Cumulative import time of an import_profile() in ms"""
+    return sum(cumulative_us for _, _, cumulative_us, top_level in rows if top_level) / 1000
+
+
+def measure(entry_point, runs=5):
+    """(best cumulative ms, rows of the best run)"""
+    import_profile(entry_point)  # Writes the .pyc files
+    best = None
+    for _ in range(runs):
+        rows = import_profile(entry_point)
+        if best is None or total_ms(rows) < best[0]:
+            best = (total_ms(rows), rows)
+    return best
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--runs', type=int, default=5)
+    arg_parser.add_argument('--show', type=int, default=5, help="heaviest modules to list")
+    arg_parser.add_argument('--target', action='append', default=[], metavar='ENTRY=MS',
+                            help="override a target (or add an entry point)")
+    args = arg_parser.parse_args(argv)
+
+    targets = dict(TARGETS_MS)
+    for item in args.target:
+        entry_point, ms = item.rsplit('=', 1)
+        targets[entry_point] = float(ms)
+
+    failed = False
+    for entry_point, target in targets.items():
+        ms, rows = measure(entry_point, args.runs)
+        imported = {row[0] for row in rows}
+        unwanted = [name for name in UNWANTED.get(entry_point, ()) if name in imported]
+        status = 'ok' if ms <= target and not unwanted else 'FAIL'
+        failed |= status == 'FAIL'
+        print(f"{entry_point:<14} {ms:>7.1f} ms  (target {target:.0f} ms)  {status}")
+        for name, self_us, _, _ in sorted(rows, key=lambda row: -row[1])[:args.show]:
+            print(f"    {self_us / 1000:>6.2f} ms  {name}")
+        if unwanted:
+            print(f"    unwanted imports: {', '.join(unwanted)}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+# bench_suite.py - Benchmark suite for every compiler stage
+"""
+timeit-based micro-benchmarks for each stage plus end-to-end macro
+benchmarks over a fixed corpus, with baseline comparison for CI.
+
+Micro:  lex, parse, classify_compound (warm memo and uncached),
+        predict_products, validate_reaction, and each generate_* method.
+Macro:  the full Pipeline (with and without codegen) and the batch
+        compiler over a fixed corpus and a seeded chem_corpus mix.
+
+Every benchmark reports the best time per operation (ns/op) across
+--repeat runs, with the loop count chosen by timeit's autorange.
+
+Usage:
+    python bench_suite.py                         # print results
+    python bench_suite.py --json results.json     # machine-readable output
+    python bench_suite.py --save-baseline base.json
+    python bench_suite.py --baseline base.json --threshold 0.15
+        (exit status 1 if any benchmark is >15% slower than the baseline)
+    python bench_suite.py --filter codegen        # substring match on names
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+
+from chem_lexer import Lexer
+from chem_parser import Parser
+from chem_semantics import Semantics
+from chem_codegen import CodeGenerator
+from chem_pipeline import Pipeline
+from chem_batch import compile_buffer
+from chem_corpus import CorpusGenerator
+
+SAMPLES = [
+    "HCl + NaOH", "CH4 + O2", "Na + Cl", "Mg + O", "Al + O", "H2 + O2", "KClO3",
+    "H2SO4 + Ca(OH)2", "C2H6 + O2", "HNO3 + KOH", "HCl + NaOH -> NaCl + H2O",
+    "K4[Fe(CN)6] + HCl", "Ca(OH)2 + H2SO4 -> CaSO4 + H2O", "C6H12O6 + O2",
+    "Fe2(SO4)3 + KOH", "NH4NO3", "Cu + S", "CH3COOH + NaOH", "Ba(NO3)2", "Zn + Cl",
+]
+
+# Fixed macro corpora: the samples repeated, plus some invalid lines, and a
+# seeded synthetic mix (see chem_corpus)
+CORPUS = [SAMPLES[i % len(SAMPLES)] for i in range(1000)] + ["bad@ + H", "A - B"] * 10
+SYNTHETIC_SEED = 0
+SYNTHETIC_LINES = 2000
+
+SCHEMA_VERSION = 1
+
+
+def _micro_benchmarks():
+    semantics = Semantics()
+    codegen = CodeGenerator()
+    token_lists = [Lexer(text).tokenize() for text in SAMPLES]
+    reactions = [Parser(tokens).parse() for tokens in token_lists]
+    molecules = [m for r in reactions for m in r.reactants + r.products]
+    for reaction in reactions:
+        if not reaction.products:
+            reaction.products = semantics.predict_products(reaction.reactants)[0]
+    complete = [r for r in reactions if r.products]
+
+    def over(items, fn):
+        return lambda: [fn(item) for item in items], len(items)
+
+    yield 'lex', over(SAMPLES, lambda text: Lexer(text).tokenize())
+    yield 'parse', over(token_lists, lambda tokens: Parser(tokens).parse())
+    yield 'classify_compound', over(molecules, semantics.classify_compound)
+    yield 'classify_compound_uncached', over(molecules, semantics._classify)
+    yield 'predict_products', over(reactions, lambda r: semantics.predict_products(r.reactants))
+    yield 'validate_reaction', over(complete, semantics.validate_reaction)
+    for method in ('generate_python_code', 'generate_balanced_equation', 'generate_ir',
+                   'generate_calculator_code', 'generate_assembly'):
+        yield f"codegen.{method}", over(complete, getattr(codegen, method))
+
+
+def _macro_benchmarks():
+    full = Pipeline(raise_errors=False)
+    no_codegen = Pipeline(raise_errors=False, generate_code=False)
+    data = '\n'.join(CORPUS).encode('utf-8')
+    yield 'pipeline.corpus', (lambda: [full.compile(text) for text in CORPUS], len(CORPUS))
+    yield 'pipeline.corpus_no_codegen', (lambda: [no_codegen.compile(text) for text in CORPUS], len(CORPUS))
+    yield 'batch.corpus', (lambda: compile_buffer(data), len(CORPUS))
+    synthetic = list(CorpusGenerator(seed=SYNTHETIC_SEED, max_depth=2).lines(SYNTHETIC_LINES))
+    synthetic_data = '\n'.join(synthetic).encode('utf-8')
+    yield 'pipeline.synthetic', (lambda: [full.compile(text) for text in synthetic], len(synthetic))
+    yield 'batch.synthetic', (lambda: compile_buffer(synthetic_data), len(synthetic))
+
+
+def benchmarks():
+    """(name, (callable, operations per call)) for every benchmark"""
+    yield from _micro_benchmarks()
+    yield from _macro_benchmarks()
+
+
+def measure(fn, ops, repeat=5, min_time=0.2):
+    """Best and median ns per operation"""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    times = timer.repeat(repeat=repeat, number=number)
+    per_op = [t / number / ops * 1e9 for t in times]
+    return {'ns_per_op': round(min(per_op), 1), 'median_ns_per_op': round(statistics.median(per_op), 1),
+            'ops_per_call': ops, 'calls': number * repeat}
+
+
+def run(name_filter=None, repeat=5, min_time=0.2, out=None):
+    results = {}
+    for name, (fn, ops) in benchmarks():
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = measure(fn, ops, repeat, min_time)
+        if out is not None:
+            print(f"{name:<36} {results[name]['ns_per_op']:>12.1f} ns/op", file=out)
+    return {
+        'schema': SCHEMA_VERSION,
+        'meta': {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                 'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=0.10):
+    """
+    Rows of (name, baseline ns, current ns, ratio, status) for benchmarks
+    present in both; status is 'REGRESSION' when current is more than
+    threshold slower, 'improved' when faster by as much, else 'ok'.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            rows.append((name, None, result['ns_per_op'], None, 'new'))
+            continue
+        ratio = result['ns_per_op'] / base['ns_per_op'] if base['ns_per_op'] else float('inf')
+        if ratio > 1 + threshold:
+            status = 'REGRESSION'
+        elif ratio < 1 - threshold:
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append((name, base['ns_per_op'], result['ns_per_op'], ratio, status))
+    return rows
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--filter', help="only run benchmarks whose name contains this")
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--min-time', type=float, default=0.2,
+                            help="minimum seconds per timed repeat")
+    arg_parser.add_argument('--json', metavar='FILE', help="write results as JSON ('-' for stdout)")
+    arg_parser.add_argument('--save-baseline', metavar='FILE')
+    arg_parser.add_argument('--baseline', metavar='FILE', help="compare against a saved baseline")
+    arg_parser.add_argument('--threshold', type=float, default=0.10,
+                            help="allowed slowdown before failing (0.10 = 10%%)")
+    args = arg_parser.parse_args(argv)
+
+    progress = sys.stderr if args.json == '-' else sys.stdout
+    current = run(args.filter, args.repeat, args.min_time, out=progress)
+
+    if args.json == '-':
+        json.dump(current, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(current, baseline, args.threshold)
+        print(f"\n{'benchmark':<36} {'baseline':>10} {'current':>10} {'ratio':>7}  status", file=progress)
+        for name, base, now, ratio, status in rows:
+            base_text = f"{base:>10.1f}" if base is not None else f"{'-':>10}"
+            ratio_text = f"{ratio:>7.2f}" if ratio is not None else f"{'-':>7}"
+            print(f"{name:<36} {base_text} {now:>10.1f} {ratio_text}  {status}", file=progress)
+        regressions = [row for row in rows if row[4] == 'REGRESSION']
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}",
+                  file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
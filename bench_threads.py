@@ -0,0 +1,91 @@
+# bench_threads.py - Thread-scaling benchmark for the shared compiler pipeline
+"""
+Compiles a fixed workload with 1, 2, 4, ... threads that all share one
+Semantics and one CodeGenerator, and reports throughput and speedup.
+
+On a standard (GIL) CPython build the speedup stays near 1x, since the
+pipeline is pure Python; on a free-threaded build (python3.13t and later)
+it should scale with cores. Every run's output is compared against the
+single-threaded result, so the benchmark also checks correctness.
+
+Usage:
+    python bench_threads.py [--reactions N] [--threads 1,2,4,8] [--repeat N]
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from chem_lexer import Lexer
+from chem_parser import Parser
+from chem_semantics import Semantics
+from chem_codegen import CodeGenerator
+
+REACTIONS = [
+    "HCl + NaOH", "CH4 + O2", "Na + Cl", "Mg + O", "Al + O", "H2 + O2",
+    "KClO3", "H2SO4 + Ca(OH)2", "C2H6 + O2", "HNO3 + KOH",
+    "HCl + NaOH -> NaCl + H2O", "K4[Fe(CN)6] + HCl", "Ca + Cl", "C6H12O6 + O2",
+]
+
+
+def compile_one(text, semantics, codegen):
+    """Full pipeline for one reaction; returns a comparable summary"""
+    reaction = Parser(Lexer(text).tokenize()).parse()
+    rule = None
+    if not reaction.products:
+        products, rule = semantics.predict_products(reaction.reactants)
+        reaction.products = products
+    is_valid, msg = semantics.validate_reaction(reaction)
+    outputs = codegen.generate(reaction) if is_valid and reaction.products else None
+    return str(reaction), rule, is_valid, msg, outputs
+
+
+def run(workload, threads, semantics, codegen):
+    """Compile workload split into `threads` contiguous slices; returns (seconds, results)"""
+    size = (len(workload) + threads - 1) // threads
+    slices = [workload[i:i + size] for i in range(0, len(workload), size)]
+
+    def work(texts):
+        return [compile_one(text, semantics, codegen) for text in texts]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        parts = list(pool.map(work, slices))
+    elapsed = time.perf_counter() - start
+    return elapsed, [result for part in parts for result in part]
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--reactions', type=int, default=20000)
+    arg_parser.add_argument('--threads', default='1,2,4,8')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args(argv)
+
+    workload = [REACTIONS[i % len(REACTIONS)] for i in range(args.reactions)]
+    thread_counts = [int(n) for n in args.threads.split(',')]
+    semantics = Semantics()
+    codegen = CodeGenerator()
+    _, expected = run(workload, 1, semantics, codegen)  # Also warms the caches
+
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, "
+          f"{args.reactions} reactions")
+    print(f"{'threads':>8} {'best s':>10} {'reactions/s':>12} {'speedup':>8}")
+    baseline = None
+    for threads in thread_counts:
+        best = float('inf')
+        for _ in range(args.repeat):
+            elapsed, results = run(workload, threads, semantics, codegen)
+            if results != expected:
+                print(f"MISMATCH with {threads} threads", file=sys.stderr)
+                return 1
+            best = min(best, elapsed)
+        baseline = baseline or best
+        print(f"{threads:>8} {best:>10.3f} {args.reactions / best:>12.0f} {baseline / best:>7.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
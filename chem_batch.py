@@ -0,0 +1,254 @@
+# chem_batch.py - Batch compiler over memory-mapped reaction files
+"""
+Compiles every line of a (possibly huge) reaction file.
+
+The file is memory-mapped and never read line by line:
+
+- split_ranges() cuts the mapping into byte ranges that end on newlines
+  (found with mmap.find), so no line straddles two ranges.
+- Each range goes through the bulk tokenizer (chem_bulk_lexer), which
+  scans the mapped bytes directly; no str is created for ordinary lines.
+- A line is decoded and re-lexed with Lexer only when the bulk pass flags
+  it (a non-ASCII character other than '→', or an invalid character, where
+  Lexer's diagnostic is wanted).
+- With workers > 1, worker processes receive (path, start, end) and map
+  the file themselves, so they share the OS page cache instead of having
+  line copies pickled to them.
+
+Lines are compiled through chem_pipeline.Pipeline (without code
+generation), so --stats reports the same per-stage numbers as the
+interactive driver.
+
+Usage:
+    python chem_batch.py reactions.txt [--workers 4] [--stats [json|prometheus]] [--memprofile]
+    python main.py --batch reactions.txt [--workers 4] [--stats] [--memprofile]
+"""
+
+import mmap
+import os
+import sys
+
+from chem_bulk_lexer import tokenize_buffer
+from chem_parser import Parser
+from chem_pipeline import Pipeline, CompileResult, StatsCollector
+from chem_semantics import Semantics
+
+MAX_ERRORS = 100  # Diagnostics kept per result; the counters cover the rest
+
+_warm_semantics = {}  # warm-state path -> Semantics restored from it, once per process
+
+
+class BatchResult:
+    """Counters for a compiled range, plus the first few errors"""
+
+    COUNTERS = ('lines', 'blank', 'syntax_errors', 'predicted', 'unpredicted', 'valid', 'invalid')
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.errors = []  # (byte offset of the line, message)
+        self.stats = None   # StatsCollector when compiled with stats=True
+        self.memory = None  # MemoryProfiler when compiled with memprofile=True
+
+    def add_error(self, offset, message):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((offset, message))
+
+    def merge(self, other):
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.errors = sorted(self.errors + other.errors)[:MAX_ERRORS]
+        return self
+
+    def summary(self):
+        return (f"{self.lines} lines: {self.valid} valid, {self.invalid} failed validation, "
+                f"{self.syntax_errors} syntax errors, {self.unpredicted} without a prediction, "
+                f"{self.blank} blank ({self.predicted} products predicted)")
+
+
+def split_ranges(buffer, parts, start=0, end=None):
+    """Split buffer[start:end] into at most `parts` (start, end) ranges on line boundaries"""
+    if end is None:
+        end = len(buffer)
+    ranges = []
+    step = max(1, (end - start) // max(1, parts))
+    while start < end:
+        cut = min(end, start + step)
+        if cut < end:
+            nl = buffer.find(b'\n', cut - 1, end)
+            cut = end if nl < 0 else nl + 1
+        ranges.append((start, cut))
+        start = cut
+    return ranges
+
+
+def compile_buffer(buffer, start=0, end=None, pipeline=None):
+    """
+    Compile every line of buffer[start:end] (bytes, mmap or str). pipeline
+    defaults to a non-raising Pipeline without code generation; pass one
+    with collectors attached to instrument the run.
+    """
+    if pipeline is None:
+        pipeline = Pipeline(generate_code=False, raise_errors=False)
+    result = BatchResult()
+
+    def bulk_lex(summary):
+        summary.tokens = tokenize_buffer(buffer, start, end)
+        summary.n_tokens = len(summary.tokens.types) - (len(summary.tokens) - 1)
+
+    # One 'lex' stage per range: the bulk pass covers every line at once
+    summary = CompileResult(None)
+    pipeline.run_stage('lex', bulk_lex, summary)
+    bulk = summary.tokens
+
+    # An empty range has no lines (the tokenizer still reports one, blank)
+    for line in range(len(bulk) if bulk.end > bulk.start else 0):
+        result.lines += 1
+        if bulk.is_blank(line):
+            result.blank += 1
+            continue
+        offset = bulk.line_starts[line]
+
+        if bulk.has_error(line):
+            # Rare path: decode just this line and let Lexer decide
+            text = bulk.line_text(line)
+            if not isinstance(text, str):
+                text = text.decode('utf-8', 'replace')
+            compiled = pipeline.compile(text)
+        else:
+            compiled = pipeline.compile_tokens(bulk.tokens(line, positions=False))
+
+        if compiled.error is not None:
+            error = compiled.error
+            if error.pos is None:
+                # Redo with positions so the diagnostic can point at the token
+                parser = Parser(bulk.tokens(line), raise_errors=False)
+                parser.parse()
+                error = parser.error
+            result.syntax_errors += 1
+            result.add_error(offset, error.message)
+            continue
+
+        if not compiled.reaction.products:
+            result.unpredicted += 1
+            continue
+        if compiled.predicted:
+            result.predicted += 1
+        if compiled.valid:
+            result.valid += 1
+        else:
+            result.invalid += 1
+            result.add_error(offset, compiled.message)
+    return result
+
+
+def warm_semantics(path):
+    """
+    A Semantics with the chem_warmstate snapshot at path restored (along
+    with its interned molecules); shared by every range this process
+    compiles. An unusable snapshot is reported and the run starts cold.
+    """
+    semantics = _warm_semantics.get(path)
+    if semantics is None:
+        from chem_warmstate import restore, WarmStateError
+        semantics = Semantics()
+        try:
+            restore(path, semantics)
+        except (WarmStateError, OSError) as e:
+            print(f"warm state not loaded: {e}", file=sys.stderr)
+        _warm_semantics[path] = semantics
+    return semantics
+
+
+def compile_range(path, start, end, stats=False, memprofile=False, warm_state=None):
+    """Worker entry point: map the file and compile one byte range"""
+    semantics = warm_semantics(warm_state) if warm_state else None
+    pipeline = Pipeline(semantics, generate_code=False, raise_errors=False)
+    collector = pipeline.add_collector(StatsCollector()) if stats else None
+    profiler = None
+    if memprofile:
+        from chem_memprofile import MemoryProfiler
+        profiler = pipeline.add_collector(MemoryProfiler())
+    if start == end:
+        result = compile_buffer(b'', 0, 0, pipeline)  # An empty file can't be mapped
+    else:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                result = compile_buffer(mapped, start, end, pipeline)
+    result.stats = collector
+    result.memory = profiler.finish() if profiler else None
+    return result
+
+
+def compile_file(path, workers=1, chunks_per_worker=4, stats=False, memprofile=False, warm_state=None):
+    """
+    Compile a reaction file; workers > 1 uses a process pool over byte
+    ranges. With stats=True, result.stats is a StatsCollector, and with
+    memprofile=True result.memory is a MemoryProfiler (both merged across
+    workers). warm_state names a chem_warmstate snapshot to start from.
+    """
+    size = os.path.getsize(path)
+    if workers <= 1 or size == 0:
+        return compile_range(path, 0, size, stats, memprofile, warm_state)
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            ranges = split_ranges(mapped, workers * chunks_per_worker)
+
+    from concurrent.futures import ProcessPoolExecutor
+    result = BatchResult()
+    result.stats = StatsCollector() if stats else None
+    if memprofile:
+        from chem_memprofile import MemoryProfiler
+        result.memory = MemoryProfiler()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(compile_range, path, start, end, stats, memprofile, warm_state)
+                   for start, end in ranges]
+        for future in futures:
+            part = future.result()
+            result.merge(part)
+            if stats:
+                result.stats.merge(part.stats)
+            if memprofile:
+                result.memory.merge(part.memory)
+    return result
+
+
+def format_stats(stats, style='text'):
+    if style == 'json':
+        return stats.to_json(indent=2)
+    if style == 'prometheus':
+        return stats.to_prometheus()
+    return stats.format()
+
+
+def main(argv=None):
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="Compile every reaction in a file.")
+    arg_parser.add_argument('input')
+    arg_parser.add_argument('--workers', type=int, default=1,
+                            help="worker processes, each mapping its own byte ranges")
+    arg_parser.add_argument('--stats', choices=('text', 'json', 'prometheus'), nargs='?',
+                            const='text', help="print per-stage timings and counters")
+    arg_parser.add_argument('--memprofile', action='store_true',
+                            help="report per-stage peak memory and allocation sites (tracemalloc)")
+    arg_parser.add_argument('--warm-state', metavar='FILE',
+                            help="restore compiler caches from a chem_warmstate snapshot first")
+    args = arg_parser.parse_args(argv)
+    return run(args.input, args.workers, args.stats, args.memprofile, args.warm_state)
+
+
+def run(path, workers=1, stats=None, memprofile=False, warm_state=None):
+    """Compile path and print the report; the exit status (1 on syntax errors)"""
+    result = compile_file(path, workers, stats=bool(stats), memprofile=memprofile, warm_state=warm_state)
+    for offset, message in result.errors:
+        print(f"byte {offset}: {message}", file=sys.stderr)
+    print(result.summary())
+    if stats:
+        print(format_stats(result.stats, stats))
+    if memprofile:
+        print(result.memory.format())
+    return 1 if result.syntax_errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
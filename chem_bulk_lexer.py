@@ -0,0 +1,219 @@
+# chem_bulk_lexer.py - Bulk tokenizer for many reactions at once
+"""
+Tokenizes a whole chunk of newline-separated reactions in one pass.
+
+Lexer is called once per line and builds a Token object per token. For
+bulk imports that per-line overhead dominates, so tokenize_buffer runs a
+single regex findall over the entire buffer and stores the tokens in
+compact parallel arrays:
+
+    types[t]      token type code (TYPE_CODES), one byte per token
+    values[t]     NUMBER value, or element symbol ID (index into symbols)
+    line_tokens[l] .. line_tokens[l+1]   tokens of line l
+    line_starts[l]                       offset where line l starts
+
+Token text -> (code, value) goes through a per-call cache (a corpus has
+only a few hundred distinct tokens), so the per-token work runs inside
+C-level map() calls. Positions and Token objects are only computed for a
+line when tokens(line) asks for them (tokens(line, positions=False) skips
+the position re-scan).
+
+The buffer may be str, bytes, bytearray or mmap.mmap; bytes-like input is
+scanned in place (the regex engine reads the buffer directly), so a
+memory-mapped file is tokenized without decoding it into one big string.
+
+The token rules are the same as Lexer's for ASCII text plus the UTF-8 '→'
+arrow. Any other character becomes an ERROR token; callers that need
+Lexer's Unicode handling (e.g. non-ASCII digits) can re-lex that line.
+"""
+
+import re
+from array import array
+
+from chem_lexer import (Token, TOKEN_ELEMENT, TOKEN_NUMBER, TOKEN_PLUS, TOKEN_ARROW, TOKEN_EOF,
+                        TOKEN_LPAREN, TOKEN_RPAREN, TOKEN_LBRACKET, TOKEN_RBRACKET, TOKEN_ERROR)
+
+TOKEN_TYPES = (TOKEN_ELEMENT, TOKEN_NUMBER, TOKEN_PLUS, TOKEN_ARROW, TOKEN_LPAREN,
+               TOKEN_RPAREN, TOKEN_LBRACKET, TOKEN_RBRACKET, TOKEN_ERROR)
+TYPE_CODES = {token_type: code for code, token_type in enumerate(TOKEN_TYPES)}
+CODE_ELEMENT = TYPE_CODES[TOKEN_ELEMENT]
+CODE_NUMBER = TYPE_CODES[TOKEN_NUMBER]
+CODE_ERROR = TYPE_CODES[TOKEN_ERROR]
+CODE_NEWLINE = len(TOKEN_TYPES)  # Line separator, never returned by tokens()
+
+PUNCTUATION = {'+': TOKEN_PLUS, '->': TOKEN_ARROW, '→': TOKEN_ARROW, '(': TOKEN_LPAREN,
+               ')': TOKEN_RPAREN, '[': TOKEN_LBRACKET, ']': TOKEN_RBRACKET}
+TOKEN_VALUES = {TOKEN_PLUS: '+', TOKEN_ARROW: '->', TOKEN_LPAREN: '(', TOKEN_RPAREN: ')',
+                TOKEN_LBRACKET: '[', TOKEN_RBRACKET: ']'}
+
+# Leading blanks are skipped and '\n' is its own token. The catch-all
+# excludes blanks so trailing whitespace never becomes a token.
+_PATTERN = r'[ \t\r\f\v]*([A-Z][a-z]*|[0-9]+|->|→|\n|[^ \t\r\f\v])'
+STR_PATTERN = re.compile(_PATTERN)
+BYTES_PATTERN = re.compile(_PATTERN.encode('utf-8'))
+
+
+class _TokenCache(dict):
+    """Token text -> type code; values[text] is filled alongside"""
+
+    def __init__(self, symbols):
+        super().__init__()
+        self.symbols = symbols
+        self.symbol_ids = {}
+        self.values = {}
+
+    def __missing__(self, text):
+        word = text if isinstance(text, str) else text.decode('utf-8', 'replace')
+        value = 0
+        if word == '\n':
+            code = CODE_NEWLINE
+        elif 'A' <= word[0] <= 'Z':
+            code = CODE_ELEMENT
+            value = self.symbol_ids.get(word)
+            if value is None:
+                value = self.symbol_ids[word] = len(self.symbols)
+                self.symbols.append(word)
+        elif '0' <= word[0] <= '9':
+            code = CODE_NUMBER
+            value = int(word)
+        elif word in PUNCTUATION:
+            code = TYPE_CODES[PUNCTUATION[word]]
+        else:
+            code = CODE_ERROR
+        self[text] = code
+        self.values[text] = value
+        return code
+
+
+class BulkTokens:
+    """Parallel token arrays for every line of a buffer"""
+
+    def __init__(self, buffer, start, end):
+        self.buffer = buffer
+        self.start = start
+        self.end = end                 # Offset where the last line ends
+        self.types = bytearray()       # Includes a CODE_NEWLINE between lines
+        self.values = array('q')
+        self.line_starts = array('q')
+        self.line_tokens = array('q')  # First token of each line, plus the total
+        self.symbols = []              # Element symbol ID -> str
+
+    def __len__(self):
+        return len(self.line_starts)
+
+    def _line_end(self, line):
+        return self.line_starts[line + 1] - 1 if line + 1 < len(self.line_starts) else self.end
+
+    def line_text(self, line):
+        """Text of one line (str for str buffers, bytes otherwise)"""
+        return self.buffer[self.line_starts[line]:self._line_end(line)]
+
+    def has_error(self, line):
+        """True if the line contains a character outside the token alphabet"""
+        return self.types.find(CODE_ERROR, self.line_tokens[line], self.line_tokens[line + 1]) >= 0
+
+    def error_position(self, line):
+        """Offset of the first invalid character in the line, or None"""
+        if not self.has_error(line):
+            return None
+        return self.tokens(line)[-1].pos
+
+    def _token_range(self, line):
+        end = self.line_tokens[line + 1]
+        return self.line_tokens[line], end - 1 if line + 1 < len(self.line_starts) else end
+
+    def tokens(self, line, positions=True):
+        """
+        Token list for one line, ending in EOF (or at the first ERROR), with
+        positions relative to the line start like Lexer's (byte offsets for
+        bytes-like buffers). Positions come from re-scanning just this line;
+        positions=False skips that and leaves Token.pos as None.
+        """
+        if positions:
+            return self._tokens_with_positions(line)
+        first, last = self._token_range(line)
+        types = self.types
+        values = self.values
+        result = []
+        for t in range(first, last):
+            code = types[t]
+            if code == CODE_ELEMENT:
+                result.append(Token(TOKEN_ELEMENT, self.symbols[values[t]]))
+            elif code == CODE_NUMBER:
+                result.append(Token(TOKEN_NUMBER, values[t]))
+            elif code == CODE_ERROR:
+                result.append(Token(TOKEN_ERROR, None))
+                return result
+            else:
+                token_type = TOKEN_TYPES[code]
+                result.append(Token(token_type, TOKEN_VALUES[token_type]))
+        result.append(Token(TOKEN_EOF, None))
+        return result
+
+    def _tokens_with_positions(self, line):
+        start = self.line_starts[line]
+        end = self._line_end(line)
+        pattern = STR_PATTERN if isinstance(self.buffer, str) else BYTES_PATTERN
+        result = []
+        t = self.line_tokens[line]
+        for m in pattern.finditer(self.buffer, start, end):
+            code = self.types[t]
+            pos = m.start(1) - start
+            if code == CODE_ERROR:
+                if m.group(1) in ('-', b'-'):
+                    pos += 1  # Like Lexer: the error is the missing '>'
+                result.append(Token(TOKEN_ERROR, None, pos))
+                return result
+            token_type = TOKEN_TYPES[code]
+            if code == CODE_ELEMENT:
+                value = self.symbols[self.values[t]]
+            elif code == CODE_NUMBER:
+                value = self.values[t]
+            else:
+                value = TOKEN_VALUES[token_type]
+            result.append(Token(token_type, value, pos))
+            t += 1
+        result.append(Token(TOKEN_EOF, None, end - start))
+        return result
+
+    def is_blank(self, line):
+        first, last = self._token_range(line)
+        return first == last
+
+
+def tokenize_buffer(buffer, start=0, end=None):
+    """Tokenize buffer[start:end] (all of it by default) into BulkTokens"""
+    is_str = isinstance(buffer, str)
+    pattern = STR_PATTERN if is_str else BYTES_PATTERN
+    newline = '\n' if is_str else b'\n'
+    if end is None:
+        end = len(buffer)
+
+    result = BulkTokens(buffer, start, end)
+    cache = _TokenCache(result.symbols)
+    words = pattern.findall(buffer, start, end)
+    types = result.types = bytearray(map(cache.__getitem__, words))
+    result.values = array('q', map(cache.values.__getitem__, words))
+
+    # Every '\n' in the range is exactly one CODE_NEWLINE token
+    line_starts = result.line_starts
+    line_tokens = result.line_tokens
+    pos = start
+    t = 0
+    while True:
+        line_starts.append(pos)
+        line_tokens.append(t)
+        nl = buffer.find(newline, pos, end)
+        if nl < 0:
+            break
+        t = types.find(CODE_NEWLINE, t) + 1
+        pos = nl + 1
+    line_tokens.append(len(types))
+
+    if len(line_starts) > 1 and line_starts[-1] == end:
+        # Range ended with a newline: no empty trailing line
+        line_starts.pop()
+        line_tokens.pop()
+        line_tokens[-1] = len(types) - 1
+        result.end = end - 1
+    return result
@@ -12,9 +12,9 @@ Compilation Stages:
 4. Code Generation (THIS FILE) ← Final Stage
 """
 
+from __future__ import annotations
+
 from chem_parser import Reaction, Molecule
-from typing import Dict, List, Tuple
-import math
 
 class CodeGenerator:
     """
@@ -25,13 +25,12 @@ class CodeGenerator:
     2. Balanced equation with coefficients
     3. Stoichiometry calculator
     4. Intermediate representation (IR)
+
+    The generator is stateless: every method builds its output in local
+    variables, so one instance can be shared by any number of threads.
     """
-    
-    def __init__(self):
-        self.output_code = []
-        self.ir_code = []  # Intermediate Representation
-        
-    def generate(self, reaction: Reaction) -> Dict[str, str]:
+
+    def generate(self, reaction: Reaction) -> dict[str, str]:
         """
         Main code generation method.
         
@@ -183,10 +182,18 @@ class CodeGenerator:
         code = []
         code.append("# Stoichiometry Calculator")
         code.append("# Calculate moles and masses for this reaction\n")
-        
+
+        # Unknown elements give a NaN mass, which has no literal; they are None
+        molar_masses = {}
+        for mol in reaction.reactants + reaction.products:
+            mass = mol.molar_mass()
+            molar_masses[str(mol)] = round(mass, 3) if mass == mass else None
+        code.append(f"MOLAR_MASSES = {molar_masses}  # g/mol, None if unknown\n")
+
         code.append("def calculate_stoichiometry(reactant_moles):")
         code.append("    '''")
         code.append(f"    Reaction: {reaction}")
+        code.append("    Returns {formula: (moles, grams)} for each product.")
         code.append("    '''")
         code.append("    results = {}")
         code.append("    ")
@@ -196,9 +203,13 @@ class CodeGenerator:
         code.append("    ")
         
         if reaction.products:
-            code.append("    # Calculate product moles (1:1 ratio for simplicity)")
+            code.append("    # Calculate product moles (1:1 ratio for simplicity) and grams")
+            code.append(f"    moles = reactant_moles.get('{reaction.reactants[0]}', 0)")
             for mol in reaction.products:
-                code.append(f"    results['{mol}'] = reactant_moles.get('{reaction.reactants[0]}', 0)")
+                if molar_masses[str(mol)] is None:
+                    code.append(f"    results['{mol}'] = (moles, None)  # Mass unknown")
+                else:
+                    code.append(f"    results['{mol}'] = (moles, moles * MOLAR_MASSES['{mol}'])")
         
         code.append("    ")
         code.append("    return results")
@@ -246,7 +257,7 @@ class CodeGenerator:
         
         return '\n'.join(asm)
     
-    def _molecule_to_dict(self, molecule: Molecule) -> Dict[str, int]:
+    def _molecule_to_dict(self, molecule: Molecule) -> dict[str, int]:
         """Convert Molecule to dictionary representation."""
         result = {}
         for symbol, count in molecule.elements:
@@ -256,7 +267,7 @@ class CodeGenerator:
                 result[symbol] = count
         return result
     
-    def _attempt_balance(self, reaction: Reaction, coeffs_r: List[int], coeffs_p: List[int]) -> Tuple[List[int], List[int]]:
+    def _attempt_balance(self, reaction: Reaction, coeffs_r: list[int], coeffs_p: list[int]) -> tuple[list[int], list[int]]:
         """
         Attempt to balance the equation.
         Returns (reactant_coefficients, product_coefficients) or None.
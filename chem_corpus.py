@@ -0,0 +1,261 @@
+# chem_corpus.py - Deterministic synthetic reaction corpus generator
+"""
+Generates large, reproducible reaction files for benchmarks and load tests.
+
+Species are built from PERIODIC_TABLE for each signature tag the prediction
+rules look for (PAIR_RULE_TAGS / SINGLE_RULE_TAGS in chem_semantics), and
+every generated species is checked against Semantics.signature, so a
+line drawn for a rule really exercises that rule. Each tag gets a fixed
+pool of species (pool_size), built once from the seed; lines then pick
+from the pools, which keeps generation fast and gives the corpus the
+repeated species that real inputs have.
+
+The mix is controlled per line:
+
+    invalid_rate    syntax errors (invalid characters, unbalanced groups,
+                    dangling '+', broken arrows, missing reactants)
+    products_rate   lines written with '-> products' (the rule's predicted
+                    products, or arbitrary species when no rule matches)
+    random_rate     reactant sets of 1..max_species species drawn from any
+                    pool, which mostly match no rule
+    duplicate_rate  exact repeats of one of the last DUPLICATE_WINDOW lines
+    unicode_rate    '→' instead of '->' on lines with products
+    max_depth       group nesting depth, e.g. 1 for Ca(OH)2, 2 for K3[Fe(CN)6]
+
+The same seed and options always produce the same lines.
+
+Usage:
+    python chem_corpus.py corpus.txt --lines 1000000 [--seed 1] [--invalid 0.05] ...
+    python chem_corpus.py - --lines 100            # write to stdout
+"""
+
+import random
+import sys
+import time
+
+from chem_utils import PERIODIC_TABLE, is_metal, is_nonmetal
+from chem_lexer import Lexer
+from chem_parser import Parser
+from chem_semantics import Semantics, PAIR_RULE_TAGS, SINGLE_RULE_TAGS
+
+DUPLICATE_WINDOW = 1024
+CHUNK_LINES = 8192
+PREDICTION_CACHE_LIMIT = 100_000  # Memoized reactant sets; past this, predict uncached
+INVALID_CHARS = '@#$%!?&~'
+SPECIES_TAGS = ('OxygenGas', 'Hydrogen', 'Hydrocarbon', 'Acid', 'Base',
+                'OxygenatedCompound', 'MetalElement', 'NonmetalElement')
+
+METALS = [s for s in PERIODIC_TABLE if is_metal(s)]
+NONMETALS = [s for s in PERIODIC_TABLE if is_nonmetal(s) and s not in ('H', 'O')]
+ANION_FORMERS = [s for s in NONMETALS if s != 'C']
+
+
+class CorpusGenerator:
+    """Seeded line generator; see the module docstring for the options"""
+
+    def __init__(self, seed=0, invalid_rate=0.05, products_rate=0.3, random_rate=0.1,
+                 duplicate_rate=0.05, unicode_rate=0.1, max_depth=1, max_species=3,
+                 pool_size=64):
+        self.invalid_rate = invalid_rate
+        self.products_rate = products_rate
+        self.random_rate = random_rate
+        self.duplicate_rate = duplicate_rate
+        self.unicode_rate = unicode_rate
+        self.max_depth = max_depth
+        self.max_species = max_species
+        self.rng = random.Random(seed)
+        self.semantics = Semantics()
+        self.rules = [list(pair) for pair in PAIR_RULE_TAGS] + [[tag] for tag in SINGLE_RULE_TAGS]
+        self.pools = {tag: self._build_pool(tag, pool_size) for tag in SPECIES_TAGS}
+        self.all_species = [text for tag in SPECIES_TAGS for text in self.pools[tag]]
+        self._recent = []
+        self._products = {}  # reactant texts -> products text ('' if no rule matches)
+
+    # Species
+
+    def _count(self, low=2, high=4):
+        return str(self.rng.randint(low, high))
+
+    def _nest(self, inner, depth):
+        """Wrap inner in depth levels of (...)n / [...]n"""
+        for level in range(depth):
+            opening, closing = '()' if level % 2 == 0 else '[]'
+            inner = f"{opening}{inner}{closing}{self._count()}"
+        return inner
+
+    def _species_text(self, tag):
+        rng = self.rng
+        depth = rng.randint(0, self.max_depth)
+        if tag == 'OxygenGas':
+            return 'O2'
+        if tag == 'Hydrogen':
+            return rng.choice(('H2', 'H'))
+        if tag == 'Hydrocarbon':
+            carbons = rng.randint(1, 8)
+            text = f"C{carbons if carbons > 1 else ''}H{rng.randint(carbons, 2 * carbons + 2)}"
+            if depth:
+                text += self._nest(f"CH{rng.randint(2, 3)}", depth)
+            if rng.random() < 0.2:
+                text += 'OH'
+            return text
+        if tag == 'Acid':
+            anion = rng.choice(ANION_FORMERS)
+            if rng.random() < 0.5:
+                anion += f"O{self._count(2, 4)}"
+            hydrogens = rng.randint(1, 3)
+            return f"H{hydrogens if hydrogens > 1 else ''}{anion}"
+        if tag == 'Base':
+            metal = rng.choice(METALS)
+            charge = abs(PERIODIC_TABLE[metal]['charge'])
+            if depth > 1:
+                return f"{metal}{self._nest('OH', depth - 1)}"
+            return f"{metal}(OH){charge}" if charge > 1 else f"{metal}OH"
+        if tag == 'OxygenatedCompound':
+            metal = rng.choice(METALS)
+            anion = f"{rng.choice(NONMETALS)}O{self._count(2, 4)}"
+            if depth:
+                return f"{metal}{self._count(1, 3).replace('1', '')}{self._nest(anion, depth)}"
+            return metal + anion
+        if tag == 'MetalElement':
+            return rng.choice(METALS)
+        if tag == 'NonmetalElement':
+            symbol = rng.choice(NONMETALS)
+            return symbol + rng.choice(('', '2'))
+        raise ValueError(f"Unknown species tag: {tag}")
+
+    def _build_pool(self, tag, size):
+        """Distinct species (in generation order) whose signature carries tag"""
+        pool = {}
+        for _ in range(size * 20):
+            text = self._species_text(tag)
+            molecule = Parser(Lexer(text).tokenize()).parse().reactants[0]
+            if tag in self.semantics.signature(molecule):
+                pool.setdefault(text, None)
+                if len(pool) == size:
+                    break
+        return list(pool)
+
+    # Lines
+
+    def _reactants(self):
+        # Per-line hot path: one random() per pick instead of choice()/shuffle()
+        random = self.rng.random
+        if random() < self.random_rate:
+            return self.rng.sample(self.all_species, self.rng.randint(1, self.max_species))
+        rule = self.rules[int(random() * len(self.rules))]
+        species = []
+        for tag in rule:
+            pool = self.pools[tag]
+            species.append(pool[int(random() * len(pool))])
+        if len(species) == 2 and random() < 0.5:
+            species.reverse()
+        return species
+
+    def _predicted(self, reactants):
+        key = tuple(reactants)
+        products = self._products.get(key)
+        if products is None:
+            reaction = Parser(Lexer(' + '.join(reactants)).tokenize()).parse()
+            predicted, _ = self.semantics.predict_products(reaction.reactants)
+            products = ' + '.join(str(m) for m in predicted)
+            if len(self._products) < PREDICTION_CACHE_LIMIT:
+                self._products[key] = products
+        return products
+
+    def _corrupt(self, line):
+        """Turn a well-formed line into one with a syntax error"""
+        rng = self.rng
+        kind = rng.randrange(5)
+        if kind == 0:
+            at = rng.randint(0, len(line))
+            return line[:at] + rng.choice(INVALID_CHARS) + line[at:]
+        if kind == 1 and ')' in line:
+            at = line.index(')')
+            return line[:at] + line[at + 1:]
+        if kind == 2:
+            return line + ' +'
+        if kind == 3:
+            return '-> ' + line.split(' ->')[0].split(' →')[0]
+        return line.replace(' + ', ' - ', 1) if ' + ' in line else '+ ' + line
+
+    def line(self):
+        rng = self.rng
+        recent = self._recent
+        if recent and rng.random() < self.duplicate_rate:
+            return recent[int(rng.random() * len(recent))]
+
+        reactants = self._reactants()
+        text = ' + '.join(reactants)
+        if rng.random() < self.products_rate:
+            products = self._predicted(reactants)
+            if not products:
+                products = ' + '.join(rng.sample(self.all_species, rng.randint(1, 2)))
+            arrow = '→' if rng.random() < self.unicode_rate else '->'
+            text = f"{text} {arrow} {products}"
+        if rng.random() < self.invalid_rate:
+            text = self._corrupt(text)
+
+        if len(recent) < DUPLICATE_WINDOW:
+            recent.append(text)
+        else:
+            recent[int(rng.random() * DUPLICATE_WINDOW)] = text
+        return text
+
+    def lines(self, count):
+        line = self.line
+        for _ in range(count):
+            yield line()
+
+
+def write_corpus(out, count, generator=None):
+    """
+    Stream count lines to out (a path or a text file object) in chunks;
+    returns the number of characters written.
+    """
+    generator = generator or CorpusGenerator()
+    if isinstance(out, str):
+        with open(out, 'w', encoding='utf-8', newline='\n') as f:
+            return write_corpus(f, count, generator)
+    written = 0
+    line = generator.line
+    while count > 0:
+        chunk = min(count, CHUNK_LINES)
+        text = '\n'.join([line() for _ in range(chunk)]) + '\n'
+        out.write(text)
+        written += len(text)
+        count -= chunk
+    return written
+
+
+def main(argv=None):
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="Generate a synthetic reaction corpus.")
+    arg_parser.add_argument('output', help="output file, or - for stdout")
+    arg_parser.add_argument('--lines', type=int, default=100_000)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--invalid', type=float, default=0.05, help="syntax error rate")
+    arg_parser.add_argument('--products', type=float, default=0.3, help="rate of lines with products")
+    arg_parser.add_argument('--random', type=float, default=0.1,
+                            help="rate of random reactant sets (mostly matching no rule)")
+    arg_parser.add_argument('--duplicates', type=float, default=0.05, help="exact repeat rate")
+    arg_parser.add_argument('--unicode', type=float, default=0.1, help="'→' rate on product lines")
+    arg_parser.add_argument('--depth', type=int, default=1, help="maximum group nesting depth")
+    arg_parser.add_argument('--species', type=int, default=3, help="maximum species in a random set")
+    arg_parser.add_argument('--pool', type=int, default=64, help="distinct species per tag")
+    args = arg_parser.parse_args(argv)
+
+    generator = CorpusGenerator(args.seed, args.invalid, args.products, args.random,
+                                args.duplicates, args.unicode, args.depth, args.species, args.pool)
+    start = time.perf_counter()
+    if args.output == '-':
+        write_corpus(sys.stdout, args.lines, generator)
+        return 0
+    written = write_corpus(args.output, args.lines, generator)
+    elapsed = time.perf_counter() - start
+    print(f"{args.lines} lines ({written / 1e6:.1f} MB) in {elapsed:.2f}s "
+          f"({args.lines / elapsed:,.0f} lines/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# chem_dedup.py - Streaming reaction corpus deduplication
+"""
+Collapses a reaction file to its unique reactions plus occurrence counts.
+
+Two lines are duplicates when their reactions have the same canonical form
+(see Reaction.canonical), so 'HCl + NaOH' and 'NaOH  +HCl' are merged.
+Keys are 128-bit stable hashes of the canonical form.
+
+Memory is bounded: at most max_in_memory unique reactions are held in a
+dict. When that is exceeded, the dict is spilled to hash-partitioned
+temporary files, and each partition is merged separately at the end, so
+peak memory is roughly (unique reactions / partitions).
+
+Usage:
+    python chem_dedup.py input.txt [-o unique.txt] [--max-in-memory N]
+
+Output lines are 'count<TAB>reaction', using the first spelling seen.
+"""
+
+import os
+import sys
+import tempfile
+
+from chem_parser import try_parse
+
+
+class ReactionDeduplicator:
+    """Counts unique reactions in a stream of lines"""
+
+    def __init__(self, max_in_memory=1_000_000, partitions=64, spill_dir=None):
+        self.max_in_memory = max_in_memory
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self.entries = {}   # 128-bit canonical hash -> [first text, count]
+        self.total = 0
+        self.invalid = 0
+        self.unique = None  # Set by dedup_file once results are written
+        self._tmpdir = None
+        self._spill_files = None
+
+    def add(self, text):
+        """Add one line; returns False if it is blank or not a valid reaction"""
+        text = text.strip()
+        if not text:
+            return False
+        self.total += 1
+        reaction, error = try_parse(text)
+        if error is not None:
+            self.invalid += 1
+            return False
+        key = reaction.canonical_hash(bits=128)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = [text, 1]
+            if len(self.entries) > self.max_in_memory:
+                self._spill()
+        else:
+            entry[1] += 1
+        return True
+
+    def add_lines(self, lines):
+        for line in lines:
+            self.add(line)
+        return self
+
+    def _spill(self):
+        """Move the in-memory entries to the partition files"""
+        if self._spill_files is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix='chem_dedup_', dir=self.spill_dir)
+            self._spill_files = [
+                open(os.path.join(self._tmpdir.name, f"part{i:04d}.tsv"), 'w', encoding='utf-8')
+                for i in range(self.partitions)
+            ]
+        for key, (text, count) in self.entries.items():
+            self._spill_files[key % self.partitions].write(f"{key:032x}\t{count}\t{text}\n")
+        self.entries = {}
+
+    @property
+    def spilled(self):
+        return self._spill_files is not None
+
+    def results(self):
+        """
+        Yield (first text, count) for every unique reaction.
+        In-memory runs keep first-seen order; spilled runs go partition by
+        partition. Iterating a spilled run consumes the temporary files.
+        """
+        if not self.spilled:
+            for text, count in self.entries.values():
+                yield text, count
+            return
+
+        self._spill()
+        try:
+            for f in self._spill_files:
+                f.close()
+            for f in self._spill_files:
+                merged = {}
+                with open(f.name, encoding='utf-8') as part:
+                    for line in part:
+                        key, count, text = line.rstrip('\n').split('\t', 2)
+                        entry = merged.get(key)
+                        if entry is None:
+                            merged[key] = [text, int(count)]
+                        else:
+                            entry[1] += int(count)
+                for text, count in merged.values():
+                    yield text, count
+        finally:
+            self._spill_files = None
+            self._tmpdir.cleanup()
+
+
+def dedup_file(input_path, output_file, max_in_memory=1_000_000, partitions=64):
+    """Deduplicate input_path into output_file; returns the deduplicator for stats"""
+    dedup = ReactionDeduplicator(max_in_memory, partitions)
+    with open(input_path, encoding='utf-8') as f:
+        dedup.add_lines(f)
+    unique = 0
+    for text, count in dedup.results():
+        output_file.write(f"{count}\t{text}\n")
+        unique += 1
+    dedup.unique = unique
+    return dedup
+
+
+def main(argv=None):
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="Collapse a reaction file to unique reactions with counts.")
+    arg_parser.add_argument('input')
+    arg_parser.add_argument('-o', '--output', help="output file (default: stdout)")
+    arg_parser.add_argument('--max-in-memory', type=int, default=1_000_000,
+                            help="unique reactions held before spilling to disk")
+    arg_parser.add_argument('--partitions', type=int, default=64)
+    args = arg_parser.parse_args(argv)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            dedup = dedup_file(args.input, out, args.max_in_memory, args.partitions)
+    else:
+        dedup = dedup_file(args.input, sys.stdout, args.max_in_memory, args.partitions)
+
+    print(f"{dedup.total} reactions, {dedup.invalid} invalid, {dedup.unique} unique",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# chem_errors.py
+"""
+Error codes shared by the Lexer and Parser.
+
+Both stages describe a failure as a code plus the values needed to explain
+it. In the default mode the message is formatted and raised as SyntaxError;
+in check mode only a Diagnostic is recorded and the message is built lazily.
+"""
+
+ERR_INVALID_CHAR = 1         # Lexer: character outside the alphabet
+ERR_EXPECTED_ARROW_HEAD = 2  # Lexer: '-' not followed by '>'
+ERR_UNEXPECTED_TOKEN = 3     # Parser: eat() got the wrong token type
+ERR_EXPECTED_MOLECULE = 4    # Parser: molecule or group does not start with Element/'('
+ERR_TRAILING_INPUT = 5       # Parser: tokens left after a complete reaction
+
+ERROR_NAMES = {
+    ERR_INVALID_CHAR: 'INVALID_CHAR',
+    ERR_EXPECTED_ARROW_HEAD: 'EXPECTED_ARROW_HEAD',
+    ERR_UNEXPECTED_TOKEN: 'UNEXPECTED_TOKEN',
+    ERR_EXPECTED_MOLECULE: 'EXPECTED_MOLECULE',
+    ERR_TRAILING_INPUT: 'TRAILING_INPUT',
+}
+
+ERROR_MESSAGES = {
+    ERR_INVALID_CHAR: lambda char, pos: f"Invalid character '{char}' at position {pos}",
+    ERR_EXPECTED_ARROW_HEAD: lambda char, pos: f"Unexpected character '{char}' at position {pos}. Expected '>' after '-'",
+    ERR_UNEXPECTED_TOKEN: lambda token, expected: f"Unexpected token '{token.value}' (type: {token.type}). Expected {expected}",
+    ERR_EXPECTED_MOLECULE: lambda token: f"Expected Element or '(', got {token}",
+    ERR_TRAILING_INPUT: lambda token: f"Unexpected token at end: {token}. Expected end of input.",
+}
+
+def format_error(code, args):
+    return ERROR_MESSAGES[code](*args)
+
+class Diagnostic:
+    """Compact record of the first error found in an input"""
+    __slots__ = ('code', 'pos', 'args')
+
+    def __init__(self, code, pos, args=()):
+        self.code = code
+        self.pos = pos    # Character offset in the input (None if unknown)
+        self.args = args  # Values for the message, formatted only on demand
+
+    @property
+    def name(self):
+        return ERROR_NAMES[self.code]
+
+    @property
+    def message(self):
+        return format_error(self.code, self.args)
+
+    def __repr__(self):
+        return f"Diagnostic({self.name}, pos={self.pos})"
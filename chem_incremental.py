@@ -0,0 +1,174 @@
+# chem_incremental.py - Incremental recompilation of an edited reaction
+"""
+Compiles successive versions of one input line (the GUI's input box, an
+editor buffer) reusing the work done for the previous version:
+
+    compile cache   results of recently compiled texts, so undoing an edit
+                    or retyping a reaction costs one dict lookup
+    lexing          only the edited window is re-lexed. Tokens that end
+                    before the first changed character are kept; lexing
+                    resumes there and stops as soon as a new token starts
+                    where an old one did inside the unchanged tail, whose
+                    tokens are then reused with their positions shifted
+    parsing         the token list is split into molecule spans at '+' and
+                    the arrow; a span whose tokens are unchanged reuses
+                    the Molecule parsed for it last time, and only new
+                    spans are parsed
+
+Anything the span split can't handle (a second arrow, an empty molecule, a
+group error) is parsed by the ordinary Parser, so results, diagnostics
+and error messages are exactly those of Pipeline.compile. Prediction,
+validation and code generation then run through the pipeline as usual,
+with its collectors. An IncrementalCompiler is not thread-safe; use one
+per editor.
+
+Example:
+    compiler = IncrementalCompiler()
+    for text in ("HCl", "HCl +", "HCl + NaOH"):
+        result = compiler.compile(text)
+"""
+
+from bisect import bisect_left
+
+from chem_lexer import Lexer, Token, TOKEN_PLUS, TOKEN_ARROW, TOKEN_EOF, TOKEN_ERROR
+from chem_parser import Parser, Reaction
+from chem_pipeline import Pipeline, CompileResult
+
+COMPILE_CACHE_SIZE = 256  # Texts whose results are kept; the oldest is dropped first
+
+
+class IncrementalCompiler:
+    """Pipeline front end that re-lexes and re-parses only what an edit changed"""
+
+    def __init__(self, pipeline=None, cache_size=COMPILE_CACHE_SIZE):
+        self.pipeline = pipeline if pipeline else Pipeline(raise_errors=False)
+        self.cache_size = cache_size
+        self.cache = {}  # text -> CompileResult, in insertion order
+        # The last text lexed, its tokens and each token's start and end offset
+        self.text = ''
+        self.tokens = [Token(TOKEN_EOF, None, 0)]
+        self.starts = [0]
+        self.ends = [0]
+        self.molecules = {}  # Span signature -> Molecule, from the last parse
+        # Counters, cumulative
+        self.cache_hits = 0
+        self.lexed_tokens = 0
+        self.reused_tokens = 0
+        self.reused_molecules = 0
+
+    def compile(self, text):
+        """CompileResult for text, as Pipeline.compile would produce it"""
+        result = self.cache.get(text)
+        if result is not None:
+            self.cache_hits += 1
+            return result
+        result = CompileResult(text)
+        pipeline = self.pipeline
+        if pipeline.run_stage('lex', self._lex, result) and pipeline.run_stage('parse', self._parse, result):
+            pipeline.compile_parsed(result)
+        if len(self.cache) >= self.cache_size:
+            del self.cache[next(iter(self.cache))]
+        self.cache[text] = result
+        return result
+
+    def _lex(self, result):
+        text, old = result.text, self.text
+        old_tokens, old_starts = self.tokens, self.starts
+
+        # Unchanged prefix and suffix (not overlapping in either text)
+        limit = min(len(old), len(text))
+        prefix = 0
+        while prefix < limit and old[prefix] == text[prefix]:
+            prefix += 1
+        limit -= prefix
+        suffix = 0
+        while suffix < limit and old[-1 - suffix] == text[-1 - suffix]:
+            suffix += 1
+
+        # Keep tokens ending before the edit; one ending right at it may grow
+        # ('C' + 'l', '1' + '2'), so it is re-lexed. EOF/ERROR end at len(old).
+        keep = bisect_left(self.ends, prefix)
+        tokens, starts, ends = old_tokens[:keep], old_starts[:keep], self.ends[:keep]
+        start = ends[-1] if keep else 0
+
+        lexer = Lexer(text, self.pipeline.raise_errors)
+        lexer.pos = start
+        lexer.current_char = text[start] if start < len(text) else None
+        # Old tokens in the unchanged tail are candidates to resynchronize on,
+        # unless the old text stopped at an error before reaching them
+        delta = len(text) - len(old)
+        j = bisect_left(old_starts, len(old) - suffix)
+        n_old = len(old_tokens) if old_tokens[-1].type == TOKEN_EOF else 0
+        lexed = 0
+        while True:
+            token = lexer.get_next_token()
+            lexed += 1
+            old_pos = token.pos - delta
+            while j < n_old and old_starts[j] < old_pos:
+                j += 1
+            if j < n_old and old_starts[j] == old_pos and token.type != TOKEN_ERROR:
+                # Same text from here to the end: the old tokens follow
+                lexed -= 1
+                self.reused_tokens += n_old - j
+                for k in range(j, n_old):
+                    old_token = old_tokens[k]
+                    tokens.append(Token(old_token.type, old_token.value, old_token.pos + delta))
+                    starts.append(old_starts[k] + delta)
+                    ends.append(self.ends[k] + delta)
+                break
+            tokens.append(token)
+            starts.append(token.pos)
+            if token.type == TOKEN_EOF or token.type == TOKEN_ERROR:
+                ends.append(len(text))
+                break
+            ends.append(lexer.pos)
+        self.lexed_tokens += lexed
+        self.reused_tokens += keep
+
+        self.text, self.tokens, self.starts, self.ends = text, tokens, starts, ends
+        result.tokens = tokens
+        result.n_tokens = len(tokens) - 1
+        result.error = lexer.error
+
+    def _parse(self, result):
+        tokens = result.tokens
+        previous, molecules = self.molecules, {}
+        reactants, products = [], []
+        side = reactants
+        span_start = 0
+        reused = 0
+        for i, token in enumerate(tokens):
+            if token.type != TOKEN_PLUS and token.type != TOKEN_ARROW and token.type != TOKEN_EOF:
+                continue
+            if i == span_start:
+                # Empty molecule: only allowed as the missing products of 'A ->'
+                if not (token.type == TOKEN_EOF and side is products and not products):
+                    return self._parse_fully(result)
+                break
+            span = tokens[span_start:i]
+            key = tuple((t.type, t.value) for t in span)
+            molecule = previous.get(key) or molecules.get(key)
+            if molecule is not None:
+                reused += 1
+            else:
+                parser = Parser(span + [Token(TOKEN_EOF, None, token.pos)], raise_errors=False)
+                molecule = parser.parse_molecule()
+                if parser.error is not None or parser.current_token.type != TOKEN_EOF:
+                    return self._parse_fully(result)
+            molecules[key] = molecule
+            side.append(molecule)
+            if token.type == TOKEN_ARROW:
+                if side is products:
+                    return self._parse_fully(result)
+                side = products
+            span_start = i + 1
+        self.molecules = molecules
+        self.reused_molecules += reused
+        result.reaction = Reaction(reactants, products)
+
+    def _parse_fully(self, result):
+        """The ordinary parser, for inputs with grammar errors"""
+        self.molecules = {}
+        parser = Parser(result.tokens, self.pipeline.raise_errors)
+        result.reaction = parser.parse()
+        result.error = parser.error
@@ -0,0 +1,198 @@
+# chem_index.py - Inverted index over compiled reactions
+"""
+Inverted index from species and elements to the reactions that use them.
+
+Every reaction added gets an integer ID (increasing; explicit IDs may
+leave gaps, so the IDs in use are kept too), and for each side
+(reactants / products) the index keeps posting lists:
+    species canonical formula -> sorted reaction IDs
+    element symbol            -> sorted reaction IDs
+
+Queries intersect posting lists, starting from the shortest one, so
+"which reactions produce CO2 and consume any Fe species" only touches the
+IDs that can possibly match.
+
+Example:
+    index = ReactionIndex()
+    index.add_text("CH4 + O2 -> CO2 + H2O")
+    index.query(produces=["CO2"], consumes_elements=["C"])   # -> [0]
+"""
+
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from chem_parser import Molecule, Parser, parse_formula
+from chem_lexer import Lexer
+
+REACTANTS = 'reactants'
+PRODUCTS = 'products'
+SIDES = (REACTANTS, PRODUCTS)
+
+INDEX_MAGIC = b'CHEMIDX2'  # CHEMIDX1 files (no ID list, no gaps) still load
+INDEX_MAGIC_V1 = b'CHEMIDX1'
+POSTING_TYPECODE = 'q'
+
+
+def species_key(species):
+    """Canonical formula for a Molecule or a formula string like 'Ca(OH)2'"""
+    if isinstance(species, Molecule):
+        return species.canonical()
+    return parse_formula(species).canonical()
+
+
+def intersect_sorted(small, large):
+    """Intersect two sorted ID sequences (len(small) <= len(large))"""
+    result = []
+    if len(small) * 16 < len(large):
+        # Few candidates: binary-search each one in the long list
+        lo = 0
+        n = len(large)
+        for value in small:
+            lo = bisect_left(large, value, lo)
+            if lo == n:
+                break
+            if large[lo] == value:
+                result.append(value)
+    else:
+        # Similar sizes: hash intersection runs in C and beats a Python merge
+        result = sorted(set(small).intersection(large))
+    return result
+
+
+class ReactionIndex:
+    """Species/element posting lists for each side of a reaction corpus"""
+
+    def __init__(self):
+        self.next_id = 0
+        self.ids = array(POSTING_TYPECODE)  # IDs in use, sorted
+        self.species = {REACTANTS: {}, PRODUCTS: {}}
+        self.elements = {REACTANTS: {}, PRODUCTS: {}}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, reaction, reaction_id=None):
+        """
+        Index a parsed Reaction and return its ID. Explicit IDs must be
+        increasing so posting lists stay sorted without re-sorting.
+        """
+        if reaction_id is None:
+            reaction_id = self.next_id
+        elif reaction_id < self.next_id:
+            raise ValueError(f"Reaction IDs must increase: got {reaction_id}, expected >= {self.next_id}")
+
+        for side, molecules in ((REACTANTS, reaction.reactants), (PRODUCTS, reaction.products)):
+            species_keys = set()
+            element_keys = set()
+            for mol in molecules:
+                species_keys.add(mol.canonical())
+                element_keys.update(mol.get_counts())
+            self._post(self.species[side], species_keys, reaction_id)
+            self._post(self.elements[side], element_keys, reaction_id)
+
+        self.ids.append(reaction_id)
+        self.next_id = reaction_id + 1
+        return reaction_id
+
+    def add_text(self, text, reaction_id=None):
+        return self.add(Parser(Lexer(text).tokenize()).parse(), reaction_id)
+
+    def _post(self, table, keys, reaction_id):
+        for key in keys:
+            postings = table.get(key)
+            if postings is None:
+                postings = table[key] = array(POSTING_TYPECODE)
+            postings.append(reaction_id)
+
+    def postings(self, side, species=None, element=None):
+        """Posting list for one species (formula/Molecule) or element on one side"""
+        if species is not None:
+            return self.species[side].get(species_key(species), array(POSTING_TYPECODE))
+        return self.elements[side].get(element, array(POSTING_TYPECODE))
+
+    def query(self, produces=(), consumes=(), produces_elements=(), consumes_elements=()):
+        """
+        IDs of reactions matching every condition, in increasing order.
+        produces/consumes take formulas or Molecules; the *_elements
+        arguments take element symbols (any species containing them).
+        """
+        lists = [self.postings(PRODUCTS, species=s) for s in produces]
+        lists += [self.postings(REACTANTS, species=s) for s in consumes]
+        lists += [self.postings(PRODUCTS, element=e) for e in produces_elements]
+        lists += [self.postings(REACTANTS, element=e) for e in consumes_elements]
+        if not lists:
+            return list(self.ids)
+
+        lists.sort(key=len)
+        result = lists[0]
+        for postings in lists[1:]:
+            if not result:
+                break
+            result = intersect_sorted(result, postings)
+        return list(result)
+
+    def save(self, path):
+        """Write the index in a compact little-endian binary format"""
+        with open(path, 'wb') as f:
+            f.write(INDEX_MAGIC)
+            f.write(struct.pack('<qQ', self.next_id, len(self.ids)))
+            f.write(self._le_bytes(self.ids))
+            for table in self._tables():
+                f.write(struct.pack('<I', len(table)))
+                for key, postings in table.items():
+                    encoded = key.encode('utf-8')
+                    f.write(struct.pack('<HQ', len(encoded), len(postings)))
+                    f.write(encoded)
+                    f.write(self._le_bytes(postings))
+
+    @staticmethod
+    def _le_bytes(postings):
+        if sys.byteorder == 'big':
+            postings = array(POSTING_TYPECODE, postings)
+            postings.byteswap()
+        return postings.tobytes()
+
+    @staticmethod
+    def _read_postings(data, offset, count):
+        postings = array(POSTING_TYPECODE)
+        postings.frombytes(data[offset:offset + count * postings.itemsize])
+        if sys.byteorder == 'big':
+            postings.byteswap()
+        return postings
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic = data[:len(INDEX_MAGIC)]
+        if magic not in (INDEX_MAGIC, INDEX_MAGIC_V1):
+            raise ValueError(f"{path} is not a reaction index file")
+        offset = len(INDEX_MAGIC)
+        (index.next_id,) = struct.unpack_from('<q', data, offset)
+        offset += 8
+        item_size = array(POSTING_TYPECODE).itemsize
+        if magic == INDEX_MAGIC_V1:
+            index.ids = array(POSTING_TYPECODE, range(index.next_id))
+        else:
+            (n_ids,) = struct.unpack_from('<Q', data, offset)
+            offset += 8
+            index.ids = index._read_postings(data, offset, n_ids)
+            offset += n_ids * item_size
+        for table in index._tables():
+            (n_keys,) = struct.unpack_from('<I', data, offset)
+            offset += 4
+            for _ in range(n_keys):
+                key_len, n_postings = struct.unpack_from('<HQ', data, offset)
+                offset += struct.calcsize('<HQ')
+                key = data[offset:offset + key_len].decode('utf-8')
+                offset += key_len
+                table[key] = index._read_postings(data, offset, n_postings)
+                offset += n_postings * item_size
+        return index
+
+    def _tables(self):
+        return [self.species[REACTANTS], self.species[PRODUCTS],
+                self.elements[REACTANTS], self.elements[PRODUCTS]]
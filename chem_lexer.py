@@ -1,5 +1,5 @@
 # chem_lexer.py
-import re
+from chem_errors import ERR_INVALID_CHAR, ERR_EXPECTED_ARROW_HEAD, Diagnostic, format_error
 
 # Token Types
 TOKEN_ELEMENT = 'ELEMENT'
@@ -9,20 +9,35 @@ TOKEN_ARROW = 'ARROW'
 TOKEN_EOF = 'EOF'
 TOKEN_LPAREN = 'LPAREN' # Optional, for complex formulas like Ca(OH)2
 TOKEN_RPAREN = 'RPAREN'
+TOKEN_LBRACKET = 'LBRACKET' # Coordination complexes like K4[Fe(CN)6]
+TOKEN_RBRACKET = 'RBRACKET'
+TOKEN_ERROR = 'ERROR' # Emitted instead of raising when raise_errors=False
 
 class Token:
-    def __init__(self, type, value):
+    def __init__(self, type, value, pos=None):
         self.type = type
         self.value = value
+        self.pos = pos # Offset of the token's first character in the input
 
     def __repr__(self):
         return f"Token({self.type}, '{self.value}')"
 
 class Lexer:
-    def __init__(self, input_text):
+    def __init__(self, input_text, raise_errors=True):
         self.input_text = input_text
         self.pos = 0
         self.current_char = self.input_text[self.pos] if self.input_text else None
+        self.raise_errors = raise_errors
+        self.error = None # First Diagnostic when raise_errors=False
+
+    def fail(self, code, *args):
+        """Raise SyntaxError, or record a Diagnostic and stop scanning"""
+        if self.raise_errors:
+            raise SyntaxError(format_error(code, args))
+        if self.error is None:
+            self.error = Diagnostic(code, self.pos, args)
+        self.current_char = None
+        return Token(TOKEN_ERROR, None, self.pos)
 
     def advance(self):
         self.pos += 1
@@ -37,7 +52,7 @@ class Lexer:
 
     def number(self):
         result = ''
-        while self.current_char is not None and self.current_char.isdigit():
+        while self.current_char is not None and self.current_char.isdecimal():
             result += self.current_char
             self.advance()
         return int(result)
@@ -59,48 +74,58 @@ class Lexer:
                 self.skip_whitespace()
                 continue
 
-            if self.current_char.isdigit():
-                return Token(TOKEN_NUMBER, self.number())
+            start = self.pos
+
+            if self.current_char.isdecimal():
+                return Token(TOKEN_NUMBER, self.number(), start)
 
             if self.current_char.isupper():
-                return Token(TOKEN_ELEMENT, self.element())
+                return Token(TOKEN_ELEMENT, self.element(), start)
 
             if self.current_char == '+':
                 self.advance()
-                return Token(TOKEN_PLUS, '+')
+                return Token(TOKEN_PLUS, '+', start)
 
             if self.current_char == '-':
                 # Check for arrow '->'
                 self.advance()
                 if self.current_char == '>':
                     self.advance()
-                    return Token(TOKEN_ARROW, '->')
+                    return Token(TOKEN_ARROW, '->', start)
                 else:
-                    raise SyntaxError(f"Unexpected character '{self.current_char}' at position {self.pos}. Expected '>' after '-'")
+                    return self.fail(ERR_EXPECTED_ARROW_HEAD, self.current_char, self.pos)
             
             # Handle unicode arrow if user pastes it
             if self.current_char == '→':
                 self.advance()
-                return Token(TOKEN_ARROW, '->')
+                return Token(TOKEN_ARROW, '->', start)
 
             if self.current_char == '(':
                 self.advance()
-                return Token(TOKEN_LPAREN, '(')
+                return Token(TOKEN_LPAREN, '(', start)
             
             if self.current_char == ')':
                 self.advance()
-                return Token(TOKEN_RPAREN, ')')
+                return Token(TOKEN_RPAREN, ')', start)
+
+            if self.current_char == '[':
+                self.advance()
+                return Token(TOKEN_LBRACKET, '[', start)
+
+            if self.current_char == ']':
+                self.advance()
+                return Token(TOKEN_RBRACKET, ']', start)
 
-            raise SyntaxError(f"Invalid character '{self.current_char}' at position {self.pos}")
+            return self.fail(ERR_INVALID_CHAR, self.current_char, self.pos)
 
-        return Token(TOKEN_EOF, None)
+        return Token(TOKEN_EOF, None, self.pos)
 
     def tokenize(self):
         tokens = []
         while True:
             token = self.get_next_token()
             tokens.append(token)
-            if token.type == TOKEN_EOF:
+            if token.type == TOKEN_EOF or token.type == TOKEN_ERROR:
                 break
         return tokens
 
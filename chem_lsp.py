@@ -0,0 +1,421 @@
+# chem_lsp.py - Language-server-style diagnostics daemon over stdio
+"""
+Speaks JSON-RPC 2.0 with LSP framing (Content-Length headers) on stdin and
+stdout, so an editor's LSP client can show diagnostics for reaction files
+(one reaction per line, e.g. *.rxn) while they are edited:
+
+    syntax errors        Error, at the offending character
+    failed validation    Warning over the line (atoms not conserved,
+                         unsupported metal-metal reactions); predicted
+                         products are not checked, as the rules don't
+                         balance them
+    predicted products   Information over a line written without products
+                         ("Predicted: NaCl + H2O (Acid-Base Neutralization)"),
+                         or a Hint when no rule matches
+
+Handled: initialize, initialized, shutdown, exit, textDocument/didOpen,
+didChange (full or incremental sync) and didClose; diagnostics go out as
+textDocument/publishDiagnostics. A malformed message never stops the
+daemon: it gets an error response (a notification's failure is logged to
+stderr) and the next message is handled as usual.
+
+Each open document keeps its lines, each line's analysis (its diagnostics
+as a JSON template, with a placeholder for the line number) and each
+line's rendered JSON. An edit re-lexes, re-parses and re-validates only
+the lines it touches (Lexer, Parser and Semantics, via a Pipeline without
+code generation); analyses are also cached by line text, since reaction
+files repeat lines. Lines below an edit are re-rendered (one str.replace
+each, no re-analysis) only when the edit adds or removes lines, as their
+numbers shift. The published diagnostics array is a join of the per-line
+strings, so publishing encodes nothing for unchanged lines. Messages that
+arrive together (a burst of keystrokes) are all applied before one
+publish per document.
+
+Publishing cost grows with the number of diagnostics, not of lines: the
+protocol sends a document's full set each time.
+
+Columns are UTF-16 code units, as LSP requires. LspClient is a scripted
+client that runs the daemon as a subprocess, for tests and bench_lsp.py.
+
+Usage:
+    python chem_lsp.py          # talks on stdin/stdout
+"""
+
+import json
+import queue
+import subprocess
+import sys
+import threading
+from collections import deque
+
+from chem_pipeline import Pipeline
+
+SEVERITY_ERROR, SEVERITY_WARNING, SEVERITY_INFORMATION, SEVERITY_HINT = 1, 2, 3, 4
+SYNC_FULL, SYNC_INCREMENTAL = 1, 2
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+LINE_CACHE_LIMIT = 100_000  # Distinct line texts whose analysis is kept; past this, not stored
+
+# Line number placeholder in analysis templates (JSON text never contains
+# a raw NUL: json.dumps escapes it)
+LINE = '\0'
+PUBLISH = '{"jsonrpc":"2.0","method":"textDocument/publishDiagnostics","params":{"uri":%s,"version":%s,"diagnostics":[%s]}}'
+
+
+def read_message(stream):
+    """Body (bytes) of the next message on a binary stream with LSP framing; None at EOF"""
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            if length is not None:
+                break
+            continue  # Stray blank line before the headers
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'content-length':
+            length = int(value)
+    body = stream.read(length)
+    return body if len(body) == length else None
+
+
+def write_message(stream, message):
+    """Send message (a dict, or JSON text) with LSP framing"""
+    if not isinstance(message, str):
+        message = json.dumps(message, separators=(',', ':'))
+    data = message.encode('utf-8')
+    stream.write(b'Content-Length: %d\r\n\r\n%s' % (len(data), data))
+    stream.flush()
+
+
+def utf16_column(line, index):
+    """UTF-16 column of code point index in line"""
+    if line.isascii():
+        return index
+    return len(line[:index].encode('utf-16-le')) // 2
+
+
+def code_point_index(line, column):
+    """Code point index of UTF-16 column in line"""
+    if line.isascii():
+        return column
+    return len(line.encode('utf-16-le')[:column * 2].decode('utf-16-le', errors='ignore'))
+
+
+class LineAnalyzer:
+    """
+    Diagnostics of one line as a JSON template: each diagnostic object
+    preceded by a comma, with LINE where the line number goes ('' if the
+    line has none). Cached by line text.
+    """
+
+    def __init__(self, pipeline=None):
+        self.pipeline = pipeline if pipeline else Pipeline(generate_code=False, raise_errors=False)
+        self.cache = {}
+
+    def analyze(self, line):
+        analysis = self.cache.get(line)
+        if analysis is None:
+            analysis = self._analyze(line)
+            if len(self.cache) < LINE_CACHE_LIMIT:
+                self.cache[line] = analysis
+        return analysis
+
+    def _analyze(self, line):
+        text = line.rstrip()
+        if not text:
+            return ''
+        start = utf16_column(line, len(line) - len(line.lstrip()))
+        end = utf16_column(line, len(text))
+        try:
+            result = self.pipeline.compile(text)
+        except Exception as e:
+            return self._diagnostic(start, end, SEVERITY_ERROR, 'INTERNAL', f"Compiler error: {e}")
+        error = result.error
+        if error is not None:
+            column = utf16_column(line, error.pos)
+            return self._diagnostic(column, min(column + 1, end), SEVERITY_ERROR, error.name, error.message)
+        reaction = result.reaction
+        if result.predicted:
+            products = ' + '.join(str(m) for m in reaction.products)
+            return self._diagnostic(start, end, SEVERITY_INFORMATION, 'PREDICTED',
+                                    f"Predicted: {products} ({result.rule})")
+        template = ''
+        if not reaction.products:
+            template = self._diagnostic(start, end, SEVERITY_HINT, 'NO_PREDICTION', f"No prediction: {result.rule}")
+        if not result.valid:
+            template += self._diagnostic(start, end, SEVERITY_WARNING, 'VALIDATION', result.message)
+        return template
+
+    @staticmethod
+    def _diagnostic(start, end, severity, code, message):
+        return (f',{{"range":{{"start":{{"line":{LINE},"character":{start}}},'
+                f'"end":{{"line":{LINE},"character":{end}}}}},'
+                f'"severity":{severity},"source":"chem","code":"{code}",'
+                f'"message":{json.dumps(message, ensure_ascii=False)}}}')
+
+
+class Document:
+    """An open document: lines, their analysis templates and their rendered diagnostics"""
+
+    def __init__(self, uri, text, version, analyzer):
+        self.uri = uri
+        self.analyzer = analyzer
+        self.set_text(text, version)
+
+    def set_text(self, text, version=None):
+        self.version = version
+        self.lines = text.split('\n')
+        analyze = self.analyzer.analyze
+        self.analyses = [analyze(line) for line in self.lines]
+        self.rendered = [a.replace(LINE, str(n)) if a else '' for n, a in enumerate(self.analyses)]
+        self.dirty = True
+
+    def apply(self, change):
+        """Apply one TextDocumentContentChangeEvent"""
+        if 'range' not in change:
+            self.set_text(change['text'], self.version)
+            return
+        lines = self.lines
+        start, end = change['range']['start'], change['range']['end']
+        first = min(start['line'], len(lines) - 1)
+        last = min(end['line'], len(lines) - 1)
+        head = lines[first][:code_point_index(lines[first], start['character'])]
+        tail = lines[last][code_point_index(lines[last], end['character']):]
+        new = (head + change['text'] + tail).split('\n')
+        lines[first:last + 1] = new
+        analyze = self.analyzer.analyze
+        self.analyses[first:last + 1] = [analyze(line) for line in new]
+        # Lines below the edit are re-rendered only if their numbers moved
+        stop = last + 1 if len(new) == last - first + 1 else len(self.rendered)
+        analyses = self.analyses
+        self.rendered[first:stop] = [analyses[n].replace(LINE, str(n)) if analyses[n] else ''
+                                     for n in range(first, first + len(new) + stop - last - 1)]
+        self.dirty = True
+
+    def diagnostics_json(self):
+        """The diagnostics array's contents, as JSON"""
+        return ''.join(self.rendered)[1:]
+
+
+class LanguageServer:
+    """JSON-RPC dispatch and per-document state; serve() runs until exit or EOF"""
+
+    def __init__(self, rfile, wfile, analyzer=None):
+        self.rfile = rfile
+        self.wfile = wfile
+        self.analyzer = analyzer if analyzer else LineAnalyzer()
+        self.documents = {}  # uri -> Document
+        self.shutdown_requested = False
+        self.exited = False
+        self.requests = {
+            'initialize': self.initialize,
+            'shutdown': self.shutdown,
+        }
+        self.notifications = {
+            'initialized': lambda params: None,
+            'exit': self.exit,
+            'textDocument/didOpen': self.did_open,
+            'textDocument/didChange': self.did_change,
+            'textDocument/didClose': self.did_close,
+        }
+
+    def serve(self):
+        """Handle messages until exit (or EOF); returns the process exit code"""
+        # Messages are read and decoded on a thread, so the ones that arrive
+        # while an edit is being applied are waiting, decoded, afterwards.
+        # The reader stops after exit rather than block on a read at shutdown.
+        inbox = queue.Queue()
+
+        def reader():
+            while True:
+                try:
+                    body = read_message(self.rfile)
+                except ValueError:  # Bad Content-Length: the stream can't be resynchronized
+                    body = None
+                if body is None:
+                    inbox.put(None)
+                    return
+                try:
+                    message = json.loads(body)
+                except ValueError as e:
+                    message = e
+                inbox.put(message)
+                if isinstance(message, dict) and message.get('method') == 'exit':
+                    return
+        threading.Thread(target=reader, name="lsp-reader", daemon=True).start()
+
+        while not self.exited:
+            messages = [inbox.get()]
+            while not inbox.empty():
+                messages.append(inbox.get_nowait())
+            for message in messages:
+                if message is None:
+                    self.exited = True
+                    break
+                self.dispatch(message)
+                if self.exited:
+                    break
+            self.publish()
+        return 0 if self.shutdown_requested else 1
+
+    def dispatch(self, message):
+        if isinstance(message, ValueError):
+            self.send_error(None, PARSE_ERROR, str(message))
+            return
+        if not isinstance(message, dict):  # A batch, or not an object at all
+            self.send_error(None, INVALID_REQUEST, "Expected a JSON object")
+            return
+        method = message.get('method')
+        params = message.get('params')
+        if method is None and 'id' in message and ('result' in message or 'error' in message):
+            return  # A response; the server sends no requests
+        if not isinstance(method, str):
+            self.send_error(message.get('id'), INVALID_REQUEST, "Missing or invalid method")
+            return
+        if 'id' not in message:
+            handler = self.notifications.get(method)
+            if handler is None:
+                return  # Unknown notifications are ignored
+            try:
+                handler(params)
+            except Exception as e:
+                print(f"chem-lsp: {method} failed: {type(e).__name__}: {e}", file=sys.stderr)
+            return
+        handler = self.requests.get(method)
+        if handler is None:
+            self.send_error(message['id'], METHOD_NOT_FOUND, f"Unknown method: {method}")
+            return
+        try:
+            result = handler(params)
+        except Exception as e:
+            self.send_error(message['id'], INTERNAL_ERROR, f"{method} failed: {type(e).__name__}: {e}")
+            return
+        self.send({'jsonrpc': '2.0', 'id': message['id'], 'result': result})
+
+    def send_error(self, request_id, code, message):
+        self.send({'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}})
+
+    def send(self, message):
+        write_message(self.wfile, message)
+
+    def publish(self):
+        """Send diagnostics for every document changed since the last publish"""
+        for document in self.documents.values():
+            if document.dirty:
+                document.dirty = False
+                self.send(PUBLISH % (json.dumps(document.uri), json.dumps(document.version),
+                                     document.diagnostics_json()))
+
+    # --- Methods ---
+
+    def initialize(self, params):
+        return {'capabilities': {'positionEncoding': 'utf-16',
+                                 'textDocumentSync': {'openClose': True, 'change': SYNC_INCREMENTAL}},
+                'serverInfo': {'name': 'chem-lsp'}}
+
+    def shutdown(self, params):
+        self.shutdown_requested = True
+        return None
+
+    def exit(self, params):
+        self.exited = True
+
+    def did_open(self, params):
+        item = params['textDocument']
+        self.documents[item['uri']] = Document(item['uri'], item['text'], item.get('version'), self.analyzer)
+
+    def did_change(self, params):
+        document = self.documents.get(params['textDocument']['uri'])
+        if document is None:
+            return
+        for change in params['contentChanges']:
+            document.apply(change)
+        document.version = params['textDocument'].get('version')
+
+    def did_close(self, params):
+        uri = params['textDocument']['uri']
+        if self.documents.pop(uri, None) is not None:
+            self.send(PUBLISH % (json.dumps(uri), 'null', ''))
+
+
+class LspClient:
+    """Scripted client: runs the daemon as a subprocess and talks to it over pipes"""
+
+    def __init__(self, command=None):
+        self.process = subprocess.Popen(command or [sys.executable, __file__],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self._next_id = 0
+        self.pending = deque()  # Messages read while waiting for something else
+
+    def send(self, message):
+        write_message(self.process.stdin, dict(message, jsonrpc='2.0'))
+
+    def notify(self, method, params=None):
+        self.send({'method': method, 'params': params})
+
+    def request(self, method, params=None):
+        """Send a request and return its response (the whole message)"""
+        self._next_id += 1
+        self.send({'id': self._next_id, 'method': method, 'params': params})
+        return self.receive(lambda message: message.get('id') == self._next_id and 'method' not in message)
+
+    def receive(self, match):
+        """Next message for which match(message) is true; others are kept for later"""
+        for message in self.pending:
+            if match(message):
+                self.pending.remove(message)
+                return message
+        while True:
+            body = read_message(self.process.stdout)
+            if body is None:
+                raise EOFError("language server closed its output")
+            message = json.loads(body)
+            if match(message):
+                return message
+            self.pending.append(message)
+
+    def diagnostics(self, uri):
+        """Params of the next publishDiagnostics for uri"""
+        return self.receive(lambda message: message.get('method') == 'textDocument/publishDiagnostics'
+                            and message['params']['uri'] == uri)['params']
+
+    def initialize(self):
+        result = self.request('initialize', {'processId': None, 'rootUri': None, 'capabilities': {}})
+        self.notify('initialized', {})
+        return result['result']
+
+    def open(self, uri, text, version=1):
+        self.notify('textDocument/didOpen', {'textDocument': {'uri': uri, 'languageId': 'rxn',
+                                                              'version': version, 'text': text}})
+
+    def edit(self, uri, version, start, end, text):
+        """Replace the text between two (line, character) positions"""
+        change = {'range': {'start': {'line': start[0], 'character': start[1]},
+                            'end': {'line': end[0], 'character': end[1]}}, 'text': text}
+        self.notify('textDocument/didChange', {'textDocument': {'uri': uri, 'version': version},
+                                               'contentChanges': [change]})
+
+    def close(self, timeout=10):
+        """shutdown + exit; returns the daemon's exit code"""
+        self.request('shutdown')
+        self.notify('exit')
+        self.process.stdin.close()
+        code = self.process.wait(timeout)
+        self.process.stdout.close()
+        return code
+
+
+def main(argv=None):
+    import argparse
+    argparse.ArgumentParser(description="Reaction diagnostics language server (stdio).").parse_args(argv)
+    server = LanguageServer(sys.stdin.buffer, sys.stdout.buffer)
+    return server.serve()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# chem_mass.py - Molar masses and batch mass balance
+"""
+Mass calculations on top of Molecule.molar_mass.
+
+mass_balance() computes reactant and product mass totals for a whole array
+of reactions in one pass: species are deduplicated into a mass table, each
+side becomes a pair of (reaction row, species column) index arrays, and the
+totals are a single weighted bincount. NumPy is used when installed; the
+pure-Python fallback returns the same numbers in array('d') form.
+
+Example:
+    balance = mass_balance(reactions, extents=moles_per_reaction)
+    balance.reactants[i], balance.products[i], balance.error[i]   # grams
+"""
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; see the fallback in mass_balance
+    np = None
+
+
+def moles_to_grams(molecule, moles):
+    return moles * molecule.molar_mass()
+
+def grams_to_moles(molecule, grams):
+    return grams / molecule.molar_mass()
+
+
+class MassBalance:
+    """Per-reaction mass totals (g, or g/mol when no extents are given)"""
+
+    def __init__(self, reactants, products, error):
+        self.reactants = reactants
+        self.products = products
+        self.error = error  # products - reactants; 0 when mass is conserved
+
+    def __len__(self):
+        return len(self.reactants)
+
+
+def mass_balance(reactions, extents=None, use_numpy=None):
+    """
+    Mass totals for each side of every reaction.
+
+    extents: optional moles of reaction per reaction (scalar or sequence);
+             totals are multiplied by it to give grams.
+    use_numpy: force (True) or avoid (False) NumPy; default is to use it
+               when available.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    elif use_numpy and np is None:
+        raise ImportError("mass_balance(use_numpy=True) requires NumPy")
+
+    # Mass table with one entry per distinct species
+    columns = {}
+    masses = array('d')
+    sides = ((array('q'), array('q')), (array('q'), array('q')))  # (rows, cols) per side
+    n = 0
+    for row, reaction in enumerate(reactions):
+        for (rows, cols), molecules in zip(sides, (reaction.reactants, reaction.products)):
+            for mol in molecules:
+                key = mol.canonical()
+                col = columns.get(key)
+                if col is None:
+                    col = columns[key] = len(masses)
+                    masses.append(mol.molar_mass())
+                rows.append(row)
+                cols.append(col)
+        n = row + 1
+
+    if use_numpy:
+        mass_table = np.frombuffer(masses, dtype=np.float64)
+        totals = []
+        for rows, cols in sides:
+            weights = mass_table[np.frombuffer(cols, dtype=np.int64)]
+            totals.append(np.bincount(np.frombuffer(rows, dtype=np.int64), weights=weights, minlength=n))
+        if extents is not None:
+            scale = np.asarray(extents, dtype=np.float64)
+            totals = [t * scale for t in totals]
+        return MassBalance(totals[0], totals[1], totals[1] - totals[0])
+
+    totals = []
+    for rows, cols in sides:
+        total = array('d', bytes(8 * n))
+        for row, col in zip(rows, cols):
+            total[row] += masses[col]
+        totals.append(total)
+    if extents is not None:
+        scales = [extents] * n if isinstance(extents, (int, float)) else extents
+        totals = [array('d', (t * s for t, s in zip(total, scales))) for total in totals]
+    error = array('d', (p - r for r, p in zip(totals[0], totals[1])))
+    return MassBalance(totals[0], totals[1], error)
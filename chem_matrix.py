@@ -0,0 +1,216 @@
+# chem_matrix.py - Sparse stoichiometric matrix export
+"""
+Exports the element x species and species x reaction matrices of a
+reaction corpus as sparse arrays, without SciPy and without densifying.
+
+- Species and element IDs come from ReactionStore (first-seen order), so
+  they are stable for a given corpus and saved alongside the matrices.
+- Matrices are built as COO triplets in array.array columns, so memory is
+  proportional to the number of non-zeros. to_csr() converts with a
+  counting sort in O(nnz + rows).
+- The stoichiometric matrix uses -n for species consumed and +n for
+  species produced (n = how often the species appears on that side).
+
+Files:
+    save_npz(prefix)   -> prefix_elements.npz, prefix_stoichiometry.npz in
+                          scipy.sparse.save_npz's CSR layout (load with
+                          numpy.load, or scipy.sparse.load_npz if installed),
+                          plus prefix_ids.json
+    save_npy_dir(dir)  -> one .npy per array (numpy.load(mmap_mode='r'))
+                          plus ids.json
+Both are written with the standard library only.
+"""
+
+import json
+import os
+import struct
+import sys
+import zipfile
+from array import array
+
+from chem_store import ReactionStore
+
+NPY_DESCR = {'i': '<i4', 'q': '<i8', 'd': '<f8'}
+NPY_TYPECODES = {descr: typecode for typecode, descr in NPY_DESCR.items()}
+
+
+class CSRMatrix:
+    """Compressed sparse rows: row r is indices/data[indptr[r]:indptr[r+1]]"""
+
+    def __init__(self, shape, indptr, indices, data):
+        self.shape = shape
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def arrays(self):
+        return {'indptr': self.indptr, 'indices': self.indices, 'data': self.data}
+
+
+class COOMatrix:
+    """Coordinate-format sparse matrix built by appending entries"""
+
+    def __init__(self, shape, data_typecode='q'):
+        self.shape = shape
+        self.rows = array('i')
+        self.cols = array('i')
+        self.data = array(data_typecode)
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def append(self, row, col, value):
+        self.rows.append(row)
+        self.cols.append(col)
+        self.data.append(value)
+
+    def to_csr(self):
+        """Counting sort by row; column order within a row is kept"""
+        n_rows = self.shape[0]
+        indptr = array('q', bytes(8 * (n_rows + 1)))
+        for row in self.rows:
+            indptr[row + 1] += 1
+        for r in range(n_rows):
+            indptr[r + 1] += indptr[r]
+        fill = array('q', indptr[:-1])
+        indices = array('i', bytes(4 * self.nnz))
+        data = array(self.data.typecode, bytes(self.data.itemsize * self.nnz))
+        for row, col, value in zip(self.rows, self.cols, self.data):
+            i = fill[row]
+            indices[i] = col
+            data[i] = value
+            fill[row] = i + 1
+        return CSRMatrix(self.shape, indptr, indices, data)
+
+    def to_dense(self):
+        """Nested lists; only for small matrices and tests"""
+        dense = [[0] * self.shape[1] for _ in range(self.shape[0])]
+        for row, col, value in zip(self.rows, self.cols, self.data):
+            dense[row][col] += value
+        return dense
+
+    def arrays(self):
+        return {'row': self.rows, 'col': self.cols, 'data': self.data}
+
+
+class StoichiometricMatrices:
+    """Element x species and species x reaction matrices with their ID maps"""
+
+    def __init__(self, store):
+        self.elements = list(store.elements)
+        self.species = [store.molecule(s).canonical() for s in range(store.n_species)]
+        self.n_reactions = len(store)
+        self.element_matrix = self._element_matrix(store)
+        self.stoichiometry = self._stoichiometry(store)
+
+    def _element_matrix(self, store):
+        matrix = COOMatrix((len(self.elements), len(self.species)))
+        for sid in range(store.n_species):
+            counts = {}
+            for i in range(store.species_offsets[sid], store.species_offsets[sid + 1]):
+                eid = store.species_elements[i]
+                counts[eid] = counts.get(eid, 0) + store.species_counts[i]
+            for eid, count in counts.items():
+                matrix.append(eid, sid, count)
+        return matrix
+
+    def _stoichiometry(self, store):
+        matrix = COOMatrix((len(self.species), self.n_reactions))
+        for rid in range(self.n_reactions):
+            net = {}
+            for sid in store.reactant_ids(rid):
+                net[sid] = net.get(sid, 0) - 1
+            for sid in store.product_ids(rid):
+                net[sid] = net.get(sid, 0) + 1
+            for sid, coefficient in net.items():
+                if coefficient:
+                    matrix.append(sid, rid, coefficient)
+        return matrix
+
+    def id_maps(self):
+        return {'elements': self.elements, 'species': self.species, 'n_reactions': self.n_reactions}
+
+    def save_npz(self, prefix):
+        """CSR .npz files readable by numpy.load / scipy.sparse.load_npz"""
+        for name, matrix in (('elements', self.element_matrix), ('stoichiometry', self.stoichiometry)):
+            csr = matrix.to_csr()
+            with zipfile.ZipFile(f"{prefix}_{name}.npz", 'w', zipfile.ZIP_STORED) as zf:
+                zf.writestr('format.npy', npy_bytes_scalar_str('csr'))
+                zf.writestr('shape.npy', npy_bytes(array('q', csr.shape)))
+                for key, values in csr.arrays().items():
+                    zf.writestr(f"{key}.npy", npy_bytes(values))
+        with open(f"{prefix}_ids.json", 'w', encoding='utf-8') as f:
+            json.dump(self.id_maps(), f)
+
+    def save_npy_dir(self, directory):
+        """One memory-mappable .npy file per COO array"""
+        os.makedirs(directory, exist_ok=True)
+        for name, matrix in (('elements', self.element_matrix), ('stoichiometry', self.stoichiometry)):
+            for key, values in matrix.arrays().items():
+                write_npy(os.path.join(directory, f"{name}_{key}.npy"), values)
+            write_npy(os.path.join(directory, f"{name}_shape.npy"), array('q', matrix.shape))
+        with open(os.path.join(directory, 'ids.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.id_maps(), f)
+
+
+def export_matrices(source):
+    """
+    Build the matrices from a ReactionStore, or from an iterable of
+    Reaction objects / reaction lines (streamed into a new store).
+    """
+    if isinstance(source, ReactionStore):
+        return StoichiometricMatrices(source)
+    store = ReactionStore()
+    for item in source:
+        if isinstance(item, str):
+            if item.strip():
+                store.add_text(item.strip())
+        else:
+            store.add(item)
+    return StoichiometricMatrices(store)
+
+
+# --- Minimal .npy format (version 1.0) ---
+
+def _npy_header(descr, shape):
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': {shape}, }}"
+    # Magic (6) + version (2) + length (2) + header + '\n' is padded to 64 bytes
+    padding = 64 - (10 + len(header) + 1) % 64
+    header = header + ' ' * padding + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+def npy_bytes(values):
+    """Serialize a 1-D array.array as .npy bytes"""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return _npy_header(NPY_DESCR[values.typecode], (len(values),)) + values.tobytes()
+
+def npy_bytes_scalar_str(text):
+    """0-d byte-string array, as scipy writes the 'format' entry"""
+    encoded = text.encode('ascii')
+    return _npy_header(f'|S{len(encoded)}', ()) + encoded
+
+def write_npy(path, values):
+    with open(path, 'wb') as f:
+        f.write(npy_bytes(values))
+
+def read_npy(path):
+    """Read a 1-D .npy written by write_npy back into an array.array"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:6] != b'\x93NUMPY':
+        raise ValueError(f"{path} is not a .npy file")
+    (header_len,) = struct.unpack_from('<H', data, 8)
+    header = data[10:10 + header_len].decode('latin1')
+    descr = header.split("'descr': '")[1].split("'")[0]
+    values = array(NPY_TYPECODES[descr])
+    values.frombytes(data[10 + header_len:])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
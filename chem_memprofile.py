@@ -0,0 +1,177 @@
+# chem_memprofile.py - Per-stage memory profiling with tracemalloc
+"""
+A pipeline Collector (see chem_pipeline) that measures memory per stage.
+
+For every stage call it reads tracemalloc's current and peak traced
+memory, which is cheap, and keeps per stage:
+
+    peak_bytes   largest transient growth above the memory in use when the
+                 stage started (e.g. Token lists, codegen string lists).
+                 Before Python 3.9 tracemalloc can't reset its peak, so
+                 this is the growth at the stage's end instead
+    net_bytes    memory still held when the stage returned, summed over calls
+
+Every sample_every-th call of a stage (starting with the first, at most
+max_samples per stage) is also bracketed by tracemalloc snapshots, and the
+growth is attributed to source lines, so the report can name the
+allocation sites behind each stage. Snapshots cost milliseconds each,
+hence the cap. Tracing itself makes allocation-heavy code several times
+slower, so profile a representative slice of a large input.
+
+finish() collects garbage and reports the bytes still retained since the
+profiler was attached, per reaction. That total includes long-lived caches
+such as interned molecules and the classification memo.
+
+Example:
+    profiler = MemoryProfiler()
+    pipeline = Pipeline(collectors=[profiler])
+    ...
+    profiler.finish()
+    print(profiler.format())
+"""
+
+import gc
+import linecache
+import os
+import tracemalloc
+
+from chem_pipeline import Collector, STAGES
+
+TOP_SITES = 5
+RESET_PEAK = hasattr(tracemalloc, 'reset_peak')  # Python 3.9+
+
+
+class StageMemory:
+    """Memory figures for one stage"""
+
+    def __init__(self):
+        self.calls = 0
+        self.peak_bytes = 0
+        self.net_bytes = 0
+        self.sampled = 0
+        self.sites = {}  # 'file:line' -> bytes allocated during sampled calls
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.peak_bytes = max(self.peak_bytes, other.peak_bytes)
+        self.net_bytes += other.net_bytes
+        self.sampled += other.sampled
+        for site, size in other.sites.items():
+            self.sites[site] = self.sites.get(site, 0) + size
+
+    def top_sites(self, n=TOP_SITES):
+        return sorted(self.sites.items(), key=lambda item: -item[1])[:n]
+
+    def to_dict(self):
+        return {'calls': self.calls, 'peak_bytes': self.peak_bytes, 'net_bytes': self.net_bytes,
+                'sampled_calls': self.sampled, 'top_sites': self.top_sites()}
+
+
+class MemoryProfiler(Collector):
+    """tracemalloc-based per-stage memory collector"""
+
+    def __init__(self, sample_every=100, max_samples=10, frames=1):
+        self.sample_every = sample_every
+        self.max_samples = max_samples
+        self.frames = frames
+        self.stages = {stage: StageMemory() for stage in STAGES}
+        self.reactions = 0
+        self.baseline_bytes = 0
+        self.retained_bytes = None
+        self._started_tracing = False
+        self._start_current = 0
+        self._snapshot = None
+        self._filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                         tracemalloc.Filter(False, __file__),
+                         tracemalloc.Filter(False, linecache.__file__)]
+
+    def attach(self, pipeline):
+        self.start()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        gc.collect()
+        self.baseline_bytes = tracemalloc.get_traced_memory()[0]
+
+    def __getstate__(self):
+        # Profilers travel back from batch workers; snapshots stay behind
+        state = dict(self.__dict__)
+        state['_snapshot'] = None
+        state['_filters'] = None
+        return state
+
+    def before(self, stage, result):
+        memory = self.stages[stage]
+        if memory.sampled < self.max_samples and memory.calls % self.sample_every == 0:
+            self._snapshot = tracemalloc.take_snapshot().filter_traces(self._filters)
+        if RESET_PEAK:
+            tracemalloc.reset_peak()
+        self._start_current = tracemalloc.get_traced_memory()[0]
+
+    def after(self, stage, result, elapsed_ns):
+        current, peak = tracemalloc.get_traced_memory()
+        if not RESET_PEAK:
+            peak = current
+        memory = self.stages[stage]
+        memory.calls += 1
+        memory.peak_bytes = max(memory.peak_bytes, peak - self._start_current)
+        memory.net_bytes += current - self._start_current
+        if stage == 'parse':
+            self.reactions += 1
+        if self._snapshot is not None:
+            snapshot = tracemalloc.take_snapshot().filter_traces(self._filters)
+            for diff in snapshot.compare_to(self._snapshot, 'lineno')[:TOP_SITES * 2]:
+                if diff.size_diff > 0:
+                    frame = diff.traceback[0]
+                    site = f"{os.path.basename(frame.filename)}:{frame.lineno}"
+                    memory.sites[site] = memory.sites.get(site, 0) + diff.size_diff
+            memory.sampled += 1
+            self._snapshot = None
+
+    def finish(self):
+        """Record retained memory; stops tracemalloc if this profiler started it"""
+        gc.collect()
+        self.retained_bytes = tracemalloc.get_traced_memory()[0] - self.baseline_bytes
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return self
+
+    def merge(self, other):
+        """Add another profiler's numbers (e.g. from a worker process)"""
+        for stage in STAGES:
+            self.stages[stage].merge(other.stages[stage])
+        self.reactions += other.reactions
+        if other.retained_bytes is not None:
+            self.retained_bytes = (self.retained_bytes or 0) + other.retained_bytes
+        return self
+
+    @property
+    def retained_per_reaction(self):
+        if self.retained_bytes is None or not self.reactions:
+            return None
+        return self.retained_bytes / self.reactions
+
+    def to_dict(self):
+        return {'stages': {stage: memory.to_dict() for stage, memory in self.stages.items()},
+                'reactions': self.reactions, 'retained_bytes': self.retained_bytes,
+                'retained_per_reaction': self.retained_per_reaction}
+
+    def format(self):
+        """Human-readable report for --memprofile"""
+        lines = [f"{'stage':<10} {'calls':>8} {'peak KiB':>10} {'net KiB':>10}"]
+        for stage, memory in self.stages.items():
+            if not memory.calls:
+                continue
+            lines.append(f"{stage:<10} {memory.calls:>8} {memory.peak_bytes / 1024:>10.1f} "
+                         f"{memory.net_bytes / 1024:>10.1f}")
+            for site, size in memory.top_sites():
+                lines.append(f"    {size / 1024:>9.1f} KiB  {site}")
+        if self.retained_bytes is not None:
+            per = self.retained_per_reaction
+            per_text = f", {per:.0f} B/reaction" if per is not None else ""
+            lines.append(f"retained after run: {self.retained_bytes / 1024:.1f} KiB "
+                         f"over {self.reactions} reactions{per_text}")
+        return '\n'.join(lines)
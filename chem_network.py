@@ -0,0 +1,145 @@
+# chem_network.py - Reaction network expansion
+"""
+Explores which species become reachable from a starting set when the
+products of Semantics.predict_products are fed back in as reactants.
+
+Worklist algorithm:
+- Species are deduplicated by canonical formula (Molecule.canonical).
+- Every prediction rule takes one or two reactants, so only singletons and
+  pairs are tried. Each species is indexed by its rule signature
+  (Semantics.signature), and a new species is only paired with known
+  species in a compatible signature bucket (PAIR_RULE_TAGS). Sets that no
+  rule could match are never handed to predict_products.
+- Results are memoized per reactant set, so repeated expansions are cheap.
+- Expansion stops at max_depth generations or max_species species.
+
+Example:
+    network = NetworkExpander().expand(["Na", "Cl2", "H2", "O2"], max_depth=2)
+    for reaction, rule in network.reactions:
+        print(rule, reaction)
+"""
+
+from collections import deque
+
+from chem_parser import Molecule, Reaction, parse_formula
+from chem_semantics import Semantics, PAIR_RULE_TAGS, SINGLE_RULE_TAGS
+
+
+def to_molecule(species):
+    """Accept a Molecule or a formula string"""
+    if isinstance(species, Molecule):
+        return species
+    return parse_formula(species)
+
+
+class ReactionNetwork:
+    """Species and reactions discovered by NetworkExpander.expand"""
+
+    def __init__(self):
+        self.species = {}      # canonical formula -> Molecule
+        self.depth = {}        # canonical formula -> generation it was found in
+        self.reactions = []    # (Reaction, rule) in discovery order
+        self.truncated = False # True if max_species stopped the expansion
+
+    def __repr__(self):
+        return f"ReactionNetwork({len(self.species)} species, {len(self.reactions)} reactions)"
+
+    def edges(self):
+        """Yield (reactant key, product key, reaction index) for every edge"""
+        for i, (reaction, rule) in enumerate(self.reactions):
+            for r in reaction.reactants:
+                for p in reaction.products:
+                    yield r.canonical(), p.canonical(), i
+
+    def to_dot(self):
+        """Graphviz source with species and reaction nodes"""
+        lines = ["digraph reactions {"]
+        for key, depth in self.depth.items():
+            lines.append(f'  "{key}" [label="{self.species[key]}\\nd={depth}"];')
+        for i, (reaction, rule) in enumerate(self.reactions):
+            lines.append(f'  r{i} [shape=box, label="{rule}"];')
+            for r in reaction.reactants:
+                lines.append(f'  "{r.canonical()}" -> r{i};')
+            for p in reaction.products:
+                lines.append(f'  r{i} -> "{p.canonical()}";')
+        lines.append("}")
+        return '\n'.join(lines)
+
+
+class NetworkExpander:
+    """Worklist-based forward expansion with memoized predictions"""
+
+    def __init__(self, semantics=None):
+        self.semantics = semantics if semantics else Semantics()
+        self.memo = {}  # sorted tuple of canonical formulas -> (products, rule)
+        self.stats = {'predictions': 0, 'memo_hits': 0, 'candidates': 0}
+
+        # Tag -> tags it can pair with
+        self.partners = {}
+        for a, b in PAIR_RULE_TAGS:
+            self.partners.setdefault(a, set()).add(b)
+            self.partners.setdefault(b, set()).add(a)
+
+    def predict(self, molecules):
+        key = tuple(sorted(m.canonical() for m in molecules))
+        cached = self.memo.get(key)
+        if cached is not None:
+            self.stats['memo_hits'] += 1
+            return cached
+        self.stats['predictions'] += 1
+        result = self.semantics.predict_products(list(molecules))
+        self.memo[key] = result
+        return result
+
+    def expand(self, start_species, max_depth=3, max_species=10000):
+        network = ReactionNetwork()
+        worklist = deque()
+        buckets = {}   # tag -> canonical keys of expanded species
+
+        def discover(molecule, depth):
+            key = molecule.canonical()
+            if key in network.species:
+                return
+            if len(network.species) >= max_species:
+                network.truncated = True
+                return
+            network.species[key] = molecule
+            network.depth[key] = depth
+            if depth < max_depth:
+                worklist.append(key)
+
+        def react(molecules):
+            self.stats['candidates'] += 1
+            products, rule = self.predict(molecules)
+            if not products:
+                return
+            network.reactions.append((Reaction(list(molecules), products), rule))
+            depth = max(network.depth[m.canonical()] for m in molecules) + 1
+            for product in products:
+                discover(product, depth)
+
+        for species in start_species:
+            discover(to_molecule(species), 0)
+
+        while worklist and not network.truncated:
+            key = worklist.popleft()
+            molecule = network.species[key]
+            tags = self.semantics.signature(molecule)
+
+            if any(tag in SINGLE_RULE_TAGS for tag in tags):
+                react((molecule,))
+
+            # Pair only with already-expanded species, so each pair is tried once
+            seen = set()
+            for tag in tags:
+                for partner_tag in self.partners.get(tag, ()):
+                    for partner_key in buckets.get(partner_tag, ()):
+                        if partner_key in seen:
+                            continue
+                        seen.add(partner_key)
+                        react((network.species[partner_key], molecule))
+
+            for tag in tags:
+                buckets.setdefault(tag, []).append(key)
+
+        return network
@@ -1,9 +1,30 @@
 # chem_parser.py
-from chem_lexer import TOKEN_ELEMENT, TOKEN_NUMBER, TOKEN_PLUS, TOKEN_ARROW, TOKEN_EOF, TOKEN_LPAREN, TOKEN_RPAREN
+from chem_lexer import (Lexer, Token, TOKEN_ELEMENT, TOKEN_NUMBER, TOKEN_PLUS, TOKEN_ARROW, TOKEN_EOF,
+                        TOKEN_LPAREN, TOKEN_RPAREN, TOKEN_LBRACKET, TOKEN_RBRACKET, TOKEN_ERROR)
+from chem_errors import (ERR_UNEXPECTED_TOKEN, ERR_EXPECTED_MOLECULE, ERR_TRAILING_INPUT,
+                         Diagnostic, format_error)
+from chem_utils import get_mass
+
+# Opening group token -> token that must close it
+GROUP_OPEN = {TOKEN_LPAREN: TOKEN_RPAREN, TOKEN_LBRACKET: TOKEN_RBRACKET}
+GROUP_CLOSE = (TOKEN_RPAREN, TOKEN_RBRACKET)
+GROUP_START = (TOKEN_ELEMENT, TOKEN_LPAREN, TOKEN_LBRACKET)
+MOLECULE_TOKENS = (TOKEN_ELEMENT, TOKEN_NUMBER, TOKEN_LPAREN, TOKEN_RPAREN, TOKEN_LBRACKET, TOKEN_RBRACKET)
 
 class Molecule:
-    def __init__(self, elements):
-        self.elements = elements # List of (symbol, count) tuples
+    def __init__(self, elements, counts=None):
+        self.elements = elements # List of (symbol, count) tuples, groups flattened
+        self.counts = counts     # {symbol: total count}, built lazily if not given
+        self._canonical = None
+        self._molar_mass = None
+
+    def __eq__(self, other):
+        if not isinstance(other, Molecule):
+            return NotImplemented
+        return self.canonical() == other.canonical()
+
+    def __hash__(self):
+        return hash(self.canonical())
 
     def __repr__(self):
         res = ""
@@ -16,6 +37,55 @@ class Molecule:
     def get_formula(self):
         return self.__repr__()
 
+    def get_counts(self):
+        """Return {symbol: total count}, merging repeated symbols."""
+        if self.counts is None:
+            counts = {}
+            for sym, count in self.elements:
+                counts[sym] = counts.get(sym, 0) + count
+            self.counts = counts
+        return self.counts
+
+    def canonical(self):
+        """
+        Hill-order formula: C first, then H, then the rest alphabetically
+        (all alphabetical when there is no carbon). Groups and repeated
+        symbols are merged, so CH3COOH and C2H4O2 are the same species.
+        """
+        if self._canonical is None:
+            counts = self.get_counts()
+            if 'C' in counts:
+                order = ['C'] + (['H'] if 'H' in counts else [])
+                order += sorted(sym for sym in counts if sym not in ('C', 'H'))
+            else:
+                order = sorted(counts)
+            self._canonical = ''.join(sym if counts[sym] == 1 else f"{sym}{counts[sym]}" for sym in order)
+        return self._canonical
+
+    def molar_mass(self):
+        """Molar mass in g/mol, cached (NaN if an element has no known mass)"""
+        if self._molar_mass is None:
+            self._molar_mass = sum(get_mass(sym) * count for sym, count in self.get_counts().items())
+        return self._molar_mass
+
+# Parsed molecules are interned by their flattened element list, so a species
+# that appears on many lines is one object whose counts, canonical formula
+# and molar mass are computed once. Past INTERN_LIMIT entries new species are
+# simply not interned. setdefault makes concurrent parsers agree on one
+# object per species without a lock (Molecule's lazy caches are safe to
+# race on: each is computed locally and then published in one assignment).
+INTERN_LIMIT = 100_000
+INTERNED_MOLECULES = {}
+
+def intern_molecule(elements, counts=None):
+    key = tuple(elements)
+    molecule = INTERNED_MOLECULES.get(key)
+    if molecule is None:
+        molecule = Molecule(elements, counts)
+        if len(INTERNED_MOLECULES) < INTERN_LIMIT:
+            molecule = INTERNED_MOLECULES.setdefault(key, molecule)
+    return molecule
+
 class Reaction:
     def __init__(self, reactants, products=None):
         self.reactants = reactants
@@ -28,11 +98,59 @@ class Reaction:
             return f"{lhs} -> {rhs}"
         return f"{lhs} -> ?"
 
+    def __eq__(self, other):
+        if not isinstance(other, Reaction):
+            return NotImplemented
+        return self.canonical() == other.canonical()
+
+    def __hash__(self):
+        # Reactions are mutable (products get filled in by prediction), so
+        # the hash is not cached; don't change a reaction used as a dict key.
+        return hash(self.canonical())
+
+    def canonical(self):
+        """
+        Order-insensitive form: each side is the sorted multiset of the
+        species' Hill formulas, e.g. 'HCl + NaOH' and 'NaOH + HCl' both
+        give 'ClH + HNaO -> ?'.
+        """
+        lhs = " + ".join(sorted(m.canonical() for m in self.reactants))
+        rhs = " + ".join(sorted(m.canonical() for m in self.products)) if self.products else "?"
+        return f"{lhs} -> {rhs}"
+
+    def canonical_hash(self, bits=64):
+        """Stable (process-independent) hash of canonical(), 64 or 128 bits"""
+        return stable_hash(self.canonical(), bits)
+
+_blake2b = None  # hashlib.blake2b, bound on first use: hashlib adds ~4 ms to startup
+
+def stable_hash(text, bits=64):
+    """BLAKE2b digest of text as an int; unlike hash(), identical across runs"""
+    global _blake2b
+    if _blake2b is None:
+        from hashlib import blake2b as _blake2b
+    digest = _blake2b(text.encode('utf-8'), digest_size=bits // 8).digest()
+    return int.from_bytes(digest, 'big')
+
 class Parser:
-    def __init__(self, tokens):
+    def __init__(self, tokens, raise_errors=True):
         self.tokens = tokens
         self.pos = 0
         self.current_token = self.tokens[self.pos]
+        self.raise_errors = raise_errors
+        self.error = None # First Diagnostic when raise_errors=False
+
+    def fail(self, code, *args):
+        """
+        Raise SyntaxError, or record a Diagnostic and replace the current
+        token with an ERROR token. No grammar rule accepts ERROR, so every
+        loop in the parser unwinds on its own without raising.
+        """
+        if self.raise_errors:
+            raise SyntaxError(format_error(code, args))
+        if self.error is None:
+            self.error = Diagnostic(code, self.current_token.pos, args)
+            self.current_token = Token(TOKEN_ERROR, None, self.current_token.pos)
 
     def eat(self, token_type):
         """Consume a token of the expected type, or raise an error"""
@@ -41,57 +159,93 @@ class Parser:
             if self.pos < len(self.tokens):
                 self.current_token = self.tokens[self.pos]
         else:
-            raise SyntaxError(f"Unexpected token '{self.current_token.value}' (type: {self.current_token.type}). Expected {token_type}")
+            self.fail(ERR_UNEXPECTED_TOKEN, self.current_token, token_type)
+
+    def group_multipliers(self):
+        """
+        Pre-scan the molecule starting at the current token and return
+        {index of opening token: multiplier written after its closing token}.
+
+        Only matched groups are recorded; parse_molecule reports mismatches.
+        """
+        multipliers = {}
+        opens = []
+        i = self.pos
+        n = len(self.tokens)
+        while i < n and self.tokens[i].type in MOLECULE_TOKENS:
+            token_type = self.tokens[i].type
+            if token_type in GROUP_CLOSE:
+                if not opens:
+                    break
+                j = opens.pop()
+                if i + 1 < n and self.tokens[i + 1].type == TOKEN_NUMBER:
+                    multipliers[j] = self.tokens[i + 1].value
+            elif token_type in GROUP_OPEN:
+                opens.append(i)
+            i += 1
+        return multipliers
 
     def parse_molecule(self):
         """
         Parse a molecule according to the grammar:
         Molecule → ElementGroup+
-        ElementGroup → Element Number? | '(' Element+ ')' Number?
+        ElementGroup → Element Number?
+                     | '(' ElementGroup+ ')' Number?
+                     | '[' ElementGroup+ ']' Number?
         
-        Examples: H2O, Ca(OH)2, NaCl, O2
+        Examples: H2O, Ca(OH)2, NaCl, O2, K4[Fe(CN)6], (NH4)2(Fe(SO4)2)
+
+        Groups nest to any depth. Instead of recursing per group, the
+        multiplier of every group is found by a linear pre-scan, and a
+        stack of running multipliers is kept while walking the tokens, so
+        each element is flattened and counted exactly once.
         """
-        # Molecule -> (Element Number?)+
-        # Simplified: We just grab a sequence of Elements and Numbers
         elements = []
+        counts = {}
         
         # Check if we have a valid start of a molecule
-        if self.current_token.type not in (TOKEN_ELEMENT, TOKEN_LPAREN):
-             raise SyntaxError(f"Expected Element or '(', got {self.current_token}")
+        if self.current_token.type not in GROUP_START:
+            self.fail(ERR_EXPECTED_MOLECULE, self.current_token)
+            return None
 
-        while self.current_token.type in (TOKEN_ELEMENT, TOKEN_LPAREN):
-            if self.current_token.type == TOKEN_ELEMENT:
+        multipliers = self.group_multipliers()
+        stack = [1]     # Running multiplier of each open group
+        closers = []    # Token type expected to close each open group
+
+        while True:
+            token_type = self.current_token.type
+            if token_type == TOKEN_ELEMENT:
                 sym = self.current_token.value
                 self.eat(TOKEN_ELEMENT)
                 count = 1
                 if self.current_token.type == TOKEN_NUMBER:
                     count = self.current_token.value
                     self.eat(TOKEN_NUMBER)
+                count *= stack[-1]
                 elements.append((sym, count))
-            elif self.current_token.type == TOKEN_LPAREN:
-                # Handle groups like (OH)2
-                self.eat(TOKEN_LPAREN)
-                group_elements = []
-                while self.current_token.type == TOKEN_ELEMENT:
-                    sym = self.current_token.value
-                    self.eat(TOKEN_ELEMENT)
-                    count = 1
-                    if self.current_token.type == TOKEN_NUMBER:
-                        count = self.current_token.value
-                        self.eat(TOKEN_NUMBER)
-                    group_elements.append((sym, count))
-                self.eat(TOKEN_RPAREN)
-                
-                group_count = 1
+                counts[sym] = counts.get(sym, 0) + count
+            elif token_type in GROUP_OPEN:
+                # Handle groups like (OH)2 or [Fe(CN)6]
+                stack.append(stack[-1] * multipliers.get(self.pos, 1))
+                closers.append(GROUP_OPEN[token_type])
+                self.eat(token_type)
+                if self.current_token.type not in GROUP_START:
+                    self.fail(ERR_EXPECTED_MOLECULE, self.current_token)
+            elif closers and token_type in GROUP_CLOSE:
+                self.eat(closers.pop())
+                stack.pop()
+                # The group multiplier was already applied via the stack
                 if self.current_token.type == TOKEN_NUMBER:
-                    group_count = self.current_token.value
                     self.eat(TOKEN_NUMBER)
-                
-                # Flatten group
-                for sym, count in group_elements:
-                    elements.append((sym, count * group_count))
+            else:
+                break
+
+        if closers:
+            self.eat(closers[-1])
 
-        return Molecule(elements)
+        if self.error is not None:
+            return None
+        return intern_molecule(elements, counts)
 
     def parse_reaction(self):
         """
@@ -124,9 +278,41 @@ class Parser:
                     products.append(self.parse_molecule())
         
         if self.current_token.type != TOKEN_EOF:
-             raise SyntaxError(f"Unexpected token at end: {self.current_token}. Expected end of input.")
+            self.fail(ERR_TRAILING_INPUT, self.current_token)
 
+        if self.error is not None:
+            return None
         return Reaction(reactants, products)
 
     def parse(self):
         return self.parse_reaction()
+
+
+def parse_formula(text):
+    """Parse a single species formula like 'Ca(OH)2' into a Molecule"""
+    parser = Parser(Lexer(text).tokenize())
+    molecule = parser.parse_molecule()
+    parser.eat(TOKEN_EOF)
+    return molecule
+
+
+def try_parse(text):
+    """
+    Lex and parse text without raising.
+    Returns (Reaction, None) on success or (None, Diagnostic) on error.
+    """
+    lexer = Lexer(text, raise_errors=False)
+    tokens = lexer.tokenize()
+    if lexer.error is not None:
+        return None, lexer.error
+    parser = Parser(tokens, raise_errors=False)
+    reaction = parser.parse()
+    return reaction, parser.error
+
+
+def check(text):
+    """
+    Fast-path validation: returns None if text is a well-formed reaction,
+    otherwise a Diagnostic with .code and .pos (.message is built on demand).
+    """
+    return try_parse(text)[1]
@@ -0,0 +1,367 @@
+# chem_pipeline.py - Instrumented compilation pipeline
+"""
+Runs Lexer -> Parser -> Semantics (predict, validate) -> CodeGenerator as
+one object, with hook points before and after every stage.
+
+Hooks are Collector objects:
+
+    class Collector:
+        def before(self, stage, result): ...
+        def after(self, stage, result, elapsed_ns): ...
+
+where stage is one of STAGES and result is the CompileResult being built.
+StatsCollector is the built-in one: per-stage perf_counter_ns histograms,
+token/molecule counts, rule hits and cache hit rates, exportable as JSON
+(to_dict) or Prometheus text (to_prometheus), or printed with format().
+
+With no collectors attached, a stage costs one extra method call and an
+empty-list check, so instrumentation can stay in the code path.
+
+Example:
+    stats = StatsCollector()
+    pipeline = Pipeline(collectors=[stats])
+    result = pipeline.compile("HCl + NaOH")
+    print(stats.format())
+"""
+
+import bisect
+import time
+
+from chem_lexer import Lexer
+from chem_parser import Parser, INTERNED_MOLECULES
+from chem_semantics import Semantics
+from chem_codegen import CodeGenerator
+
+STAGES = ('lex', 'parse', 'predict', 'validate', 'codegen')
+
+# Histogram bucket upper bounds in nanoseconds (plus an implicit +Inf)
+BUCKETS_NS = (1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000,
+              500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000, 100_000_000)
+
+
+class CompileResult:
+    """Everything the pipeline produced for one input"""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = None
+        self.n_tokens = 0       # Tokens excluding EOF
+        self.reaction = None
+        self.predicted = False  # Products came from predict_products
+        self.rule = None
+        self.valid = False
+        self.message = None
+        self.outputs = None     # CodeGenerator.generate() dict
+        self.error = None       # Diagnostic (raise_errors=False) or exception
+
+
+class Pipeline:
+    """Lexer -> Parser -> Semantics -> CodeGenerator with stage hooks"""
+
+    def __init__(self, semantics=None, codegen=None, collectors=None,
+                 generate_code=True, raise_errors=True):
+        self.semantics = semantics if semantics else Semantics()
+        self.codegen = codegen if codegen else CodeGenerator()
+        self.generate_code = generate_code
+        self.raise_errors = raise_errors
+        self.collectors = []
+        for collector in collectors or ():
+            self.add_collector(collector)
+
+    def add_collector(self, collector):
+        attach = getattr(collector, 'attach', None)
+        if attach is not None:
+            attach(self)
+        self.collectors.append(collector)
+        return collector
+
+    def compile(self, text):
+        """
+        Compile one reaction. Syntax errors raise SyntaxError, or with
+        raise_errors=False are stored as result.error (a Diagnostic) and
+        the remaining stages are skipped.
+        """
+        result = CompileResult(text)
+        if self.run_stage('lex', self._lex, result):
+            self._compile_tokens(result)
+        return result
+
+    def compile_tokens(self, tokens, text=None):
+        """Compile an already tokenized reaction (skips the lex stage)"""
+        result = CompileResult(text)
+        result.tokens = tokens
+        result.n_tokens = len(tokens) - 1
+        self._compile_tokens(result)
+        return result
+
+    # --- Stages ---
+
+    def _compile_tokens(self, result):
+        if self.run_stage('parse', self._parse, result):
+            self.compile_parsed(result)
+
+    def compile_parsed(self, result):
+        """
+        Run the stages after parsing on a result whose reaction is set,
+        for drivers that lex and parse themselves (e.g. chem_incremental)
+        """
+        if not result.reaction.products:
+            self.run_stage('predict', self._predict, result)
+        self.run_stage('validate', self._validate, result)
+        if self.generate_code and result.valid and result.reaction.products:
+            self.run_stage('codegen', self._codegen, result)
+
+    def run_stage(self, stage, run, result):
+        """
+        Call run(result) as the given stage, between the collectors' hooks;
+        False if it recorded an error. Public so drivers can report stages
+        they run themselves (e.g. bulk lexing in chem_batch).
+        """
+        if not self.collectors:
+            run(result)
+            return result.error is None
+        for collector in self.collectors:
+            collector.before(stage, result)
+        start = time.perf_counter_ns()
+        try:
+            run(result)
+        except Exception as e:
+            result.error = e
+            raise
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            for collector in self.collectors:
+                collector.after(stage, result, elapsed)
+        return result.error is None
+
+    def _lex(self, result):
+        lexer = Lexer(result.text, self.raise_errors)
+        result.tokens = lexer.tokenize()
+        result.n_tokens = len(result.tokens) - 1
+        result.error = lexer.error
+
+    def _parse(self, result):
+        parser = Parser(result.tokens, self.raise_errors)
+        result.reaction = parser.parse()
+        result.error = parser.error
+
+    def _predict(self, result):
+        products, rule = self.semantics.predict_products(result.reaction.reactants)
+        result.rule = rule
+        if products:
+            result.reaction.products = products
+            result.predicted = True
+
+    def _validate(self, result):
+        is_valid, msg = self.semantics.validate_reaction(result.reaction)
+        result.valid = is_valid
+        result.message = msg
+
+    def _codegen(self, result):
+        result.outputs = self.codegen.generate(result.reaction)
+
+
+class Collector:
+    """Base class for pipeline hooks; override what you need"""
+
+    def before(self, stage, result):
+        pass
+
+    def after(self, stage, result, elapsed_ns):
+        pass
+
+
+class StageHistogram:
+    """Fixed-bucket latency histogram (Prometheus-style cumulative export)"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_NS) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def observe(self, elapsed_ns):
+        self.buckets[bisect.bisect_left(BUCKETS_NS, elapsed_ns)] += 1
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+
+    def merge(self, other):
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile q (max for the +Inf bucket)"""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_NS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self):
+        return {'count': self.count, 'sum_ns': self.total_ns, 'max_ns': self.max_ns,
+                'buckets_ns': dict(zip([str(b) for b in BUCKETS_NS] + ['+Inf'], self.buckets))}
+
+
+class StatsCollector(Collector):
+    """Per-stage timings plus pipeline counters"""
+
+    def __init__(self):
+        self.stages = {stage: StageHistogram() for stage in STAGES}
+        self.errors = {stage: 0 for stage in STAGES}
+        self.reactions = 0
+        self.tokens = 0
+        self.molecules = 0
+        self.valid = 0
+        self.invalid = 0
+        self.rules = {}
+        # cache name -> [hits, lookups]; estimated from cache growth, so
+        # approximate once a cache reaches its size limit
+        self.caches = {'intern': [0, 0], 'classify': [0, 0]}
+        self._semantics = None
+        self._size_before = 0
+
+    def attach(self, pipeline):
+        self._semantics = pipeline.semantics
+
+    def __getstate__(self):
+        # Collectors travel back from batch workers; the Semantics stays behind
+        state = dict(self.__dict__)
+        state['_semantics'] = None
+        return state
+
+    def _cache(self, stage):
+        if stage == 'parse':
+            return INTERNED_MOLECULES
+        if stage == 'predict' and self._semantics is not None:
+            return self._semantics._classifications
+        return None
+
+    def before(self, stage, result):
+        cache = self._cache(stage)
+        if cache is not None:
+            self._size_before = len(cache)
+
+    def after(self, stage, result, elapsed_ns):
+        self.stages[stage].observe(elapsed_ns)
+        if result is None:
+            return
+        if result.error is not None:
+            self.errors[stage] += 1
+            return
+        if stage == 'lex':
+            self.tokens += result.n_tokens
+        elif stage == 'parse':
+            self.reactions += 1
+            lookups = len(result.reaction.reactants) + len(result.reaction.products)
+            self.molecules += lookups
+            self._count_cache('intern', stage, lookups)
+        elif stage == 'predict':
+            self.rules[result.rule] = self.rules.get(result.rule, 0) + 1
+            self._count_cache('classify', stage, len(result.reaction.reactants))
+        elif stage == 'validate':
+            if result.valid:
+                self.valid += 1
+            else:
+                self.invalid += 1
+
+    def _count_cache(self, name, stage, lookups):
+        cache = self._cache(stage)
+        if cache is None:
+            return
+        misses = min(lookups, max(0, len(cache) - self._size_before))
+        counts = self.caches[name]
+        counts[0] += lookups - misses
+        counts[1] += lookups
+
+    def merge(self, other):
+        """Add another collector's numbers (e.g. from a worker process)"""
+        for stage in STAGES:
+            self.stages[stage].merge(other.stages[stage])
+            self.errors[stage] += other.errors[stage]
+        for name in ('reactions', 'tokens', 'molecules', 'valid', 'invalid'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for rule, n in other.rules.items():
+            self.rules[rule] = self.rules.get(rule, 0) + n
+        for name, (hits, lookups) in other.caches.items():
+            self.caches[name][0] += hits
+            self.caches[name][1] += lookups
+        return self
+
+    def hit_rate(self, name):
+        hits, lookups = self.caches[name]
+        return hits / lookups if lookups else None
+
+    # --- Export ---
+
+    def to_dict(self):
+        return {
+            'stages': {stage: hist.to_dict() for stage, hist in self.stages.items()},
+            'errors': dict(self.errors),
+            'reactions': self.reactions,
+            'tokens': self.tokens,
+            'molecules': self.molecules,
+            'valid': self.valid,
+            'invalid': self.invalid,
+            'rules': dict(self.rules),
+            'cache_hit_rate': {name: self.hit_rate(name) for name in self.caches},
+        }
+
+    def to_json(self, indent=None):
+        import json
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self, prefix='chem'):
+        lines = [f"# HELP {prefix}_stage_duration_seconds Time spent in each compiler stage",
+                 f"# TYPE {prefix}_stage_duration_seconds histogram"]
+        for stage, hist in self.stages.items():
+            cumulative = 0
+            for bound, n in zip(BUCKETS_NS, hist.buckets):
+                cumulative += n
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound / 1e9:g}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {hist.total_ns / 1e9:.9f}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {hist.count}')
+
+        lines.append(f"# TYPE {prefix}_stage_errors_total counter")
+        for stage, n in self.errors.items():
+            lines.append(f'{prefix}_stage_errors_total{{stage="{stage}"}} {n}')
+        for name in ('reactions', 'tokens', 'molecules', 'valid', 'invalid'):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {getattr(self, name)}")
+        lines.append(f"# TYPE {prefix}_rule_hits_total counter")
+        for rule, n in sorted(self.rules.items()):
+            label = rule.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'{prefix}_rule_hits_total{{rule="{label}"}} {n}')
+        lines.append(f"# TYPE {prefix}_cache_hit_ratio gauge")
+        for name in self.caches:
+            rate = self.hit_rate(name)
+            if rate is not None:
+                lines.append(f'{prefix}_cache_hit_ratio{{cache="{name}"}} {rate:.6f}')
+        return '\n'.join(lines) + '\n'
+
+    def format(self):
+        """Human-readable summary for --stats"""
+        lines = [f"{'stage':<10} {'calls':>8} {'total ms':>10} {'mean us':>9} {'p95 us':>9} {'max us':>9} {'errors':>7}"]
+        for stage, hist in self.stages.items():
+            if not hist.count:
+                continue
+            mean = hist.total_ns / hist.count / 1e3
+            lines.append(f"{stage:<10} {hist.count:>8} {hist.total_ns / 1e6:>10.2f} {mean:>9.1f} "
+                         f"{hist.quantile(0.95) / 1e3:>9.1f} {hist.max_ns / 1e3:>9.1f} {self.errors[stage]:>7}")
+        lines.append(f"reactions {self.reactions}, tokens {self.tokens}, molecules {self.molecules}, "
+                     f"valid {self.valid}, invalid {self.invalid}")
+        for rule, n in sorted(self.rules.items(), key=lambda item: -item[1]):
+            lines.append(f"  rule {rule}: {n}")
+        for name in self.caches:
+            rate = self.hit_rate(name)
+            if rate is not None:
+                lines.append(f"  {name} cache hit rate: {rate:.1%}")
+        return '\n'.join(lines)
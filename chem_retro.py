@@ -0,0 +1,275 @@
+# chem_retro.py - Retrosynthesis search
+"""
+Finds reactant sets and multi-step routes that Semantics.predict_products
+says lead to a target species, e.g. Al2O3 <- Al + O2.
+
+Instead of pushing every reactant combination through the forward rules,
+the search runs the rules backwards:
+- An index maps each product signature (binary metal/nonmetal compound,
+  salt, water, CO2, O2, oxygen-free compound) to the rules that can produce
+  it and the precursor classes they need. Synthesis products for every
+  metal/nonmetal pair in PERIODIC_TABLE are precomputed.
+- Each candidate precursor set is confirmed with one forward call to
+  predict_products (memoized), so routes never disagree with the rules.
+- A* search over "species still to be made": step cost plus reagent cost
+  from a CostModel, with a heuristic of one step per species still needed.
+  Precursors per species are memoized and a node budget bounds the search.
+
+Example:
+    routes = RetroSearch().search("Al2O3")
+    print(routes[0])
+"""
+
+import heapq
+from itertools import count
+
+from chem_parser import Molecule, Reaction, parse_formula
+from chem_semantics import Semantics
+from chem_utils import PERIODIC_TABLE, is_metal, is_nonmetal
+
+# Elements that exist as diatomic molecules in their standard state
+DIATOMIC = {'H', 'N', 'O', 'F', 'Cl', 'Br', 'I'}
+
+# Fuels tried for combustion products when the reagent pool has none
+DEFAULT_FUELS = ('CH4',)
+
+
+def elemental_form(symbol):
+    """Standard-state molecule of an element (O2, Na, ...)"""
+    return Molecule([(symbol, 2 if symbol in DIATOMIC else 1)])
+
+
+class CostModel:
+    """
+    Cost of a route = step_cost per reaction + the cost of every starting
+    reagent. Reagents in `available` cost what the mapping says; elemental
+    substances cost element_cost unless element_cost is None. Anything
+    else must be synthesized.
+    """
+
+    def __init__(self, available=None, element_cost=1.0, step_cost=1.0):
+        self.available = {}
+        for species, cost in (available or {}).items():
+            key = species.canonical() if isinstance(species, Molecule) else parse_formula(species).canonical()
+            self.available[key] = cost
+        self.element_cost = element_cost
+        self.step_cost = step_cost
+
+    def reagent_cost(self, molecule):
+        """Cost of buying molecule, or None if it has to be made"""
+        cost = self.available.get(molecule.canonical())
+        if cost is not None:
+            return cost
+        if self.element_cost is not None and len(molecule.get_counts()) == 1:
+            return self.element_cost
+        return None
+
+
+class Route:
+    """A synthesis route: reactions in forward order plus starting reagents"""
+
+    def __init__(self, target, steps, reagents, cost):
+        self.target = target
+        self.steps = steps         # [(Reaction, rule)], earliest first
+        self.reagents = reagents   # canonical formulas bought, sorted
+        self.cost = cost
+
+    def __repr__(self):
+        lines = [f"Route to {self.target} (cost {self.cost:g}, {len(self.steps)} steps)"]
+        for i, (reaction, rule) in enumerate(self.steps):
+            lines.append(f"  {i + 1}. {reaction}  [{rule}]")
+        return '\n'.join(lines)
+
+
+class RetroSearch:
+    """Best-first (A*) reverse search over the prediction rules"""
+
+    def __init__(self, semantics=None, pool=()):
+        """pool: extra reagents (formulas or Molecules) used as precursor candidates"""
+        self.semantics = semantics if semantics else Semantics()
+        self.forward_memo = {}   # sorted reactant formulas -> set of product formulas, rule
+        self.precursor_memo = {} # target formula -> [(reactants, rule)]
+        self.stats = {'expanded': 0, 'forward_calls': 0}
+
+        self.pool = [m if isinstance(m, Molecule) else parse_formula(m) for m in pool]
+        self.pool_by_class = {}
+        for mol in self.pool:
+            self.pool_by_class.setdefault(self.semantics.classify_compound(mol), []).append(mol)
+
+        # Precomputed Synthesis table: product formula -> [(metal, nonmetal)]
+        self.synthesis_table = {}
+        metals = [s for s in PERIODIC_TABLE if is_metal(s)]
+        nonmetals = [s for s in PERIODIC_TABLE if is_nonmetal(s)]
+        for metal in metals:
+            for nonmetal in nonmetals:
+                reactants = (elemental_form(metal), elemental_form(nonmetal))
+                products, rule = self.semantics.predict_products(list(reactants))
+                if rule == "Synthesis":
+                    self.synthesis_table.setdefault(products[0].canonical(), []).append(reactants)
+
+        # Product signature -> precursor generators
+        self.rule_index = {
+            'binary': [self._synthesis_precursors],
+            'water': [self._hydrogen_combustion_precursors, self._combustion_precursors,
+                      self._any_neutralization_precursors],
+            'carbon_dioxide': [self._combustion_precursors],
+            'oxygen': [self._pool_decomposition_precursors],
+            'salt': [self._any_neutralization_precursors, self._neutralization_precursors],
+            'oxygen_free': [self._decomposition_precursors],
+        }
+
+    def product_signature(self, molecule):
+        counts = molecule.get_counts()
+        key = molecule.canonical()
+        signature = []
+        if key in self.synthesis_table:
+            signature.append('binary')
+        if key == 'H2O':
+            signature.append('water')
+        elif key == 'CO2':
+            signature.append('carbon_dioxide')
+        elif key == 'O2':
+            signature.append('oxygen')
+        if len(counts) >= 2 and any(is_metal(s) and c == 1 for s, c in counts.items()):
+            signature.append('salt')
+        if 'O' not in counts and 'H' not in counts:
+            signature.append('oxygen_free')
+        return signature
+
+    # --- Precursor generators: candidate reactant tuples for a target ---
+
+    def _synthesis_precursors(self, target):
+        return self.synthesis_table.get(target.canonical(), [])
+
+    def _fuels(self):
+        fuels = list(self.pool_by_class.get('Hydrocarbon', []))
+        keys = {f.canonical() for f in fuels}
+        fuels += [parse_formula(f) for f in DEFAULT_FUELS if parse_formula(f).canonical() not in keys]
+        return fuels
+
+    def _combustion_precursors(self, target):
+        return [(fuel, elemental_form('O')) for fuel in self._fuels()]
+
+    def _hydrogen_combustion_precursors(self, target):
+        return [(elemental_form('H'), elemental_form('O'))]
+
+    def _any_neutralization_precursors(self, target):
+        return [(acid, base) for acid in self.pool_by_class.get('Acid', [])
+                for base in self.pool_by_class.get('Base', [])]
+
+    def _neutralization_precursors(self, target):
+        # Forward rule: salt = (metal, 1) + acid's non-H parts
+        counts = target.get_counts()
+        candidates = []
+        for metal, n in counts.items():
+            if not is_metal(metal) or n != 1:
+                continue
+            anion = [(s, c) for s, c in counts.items() if s != metal]
+            acid = Molecule([('H', 1)] + anion)
+            base = Molecule([(metal, 1), ('O', 1), ('H', 1)])
+            candidates.append((acid, base))
+        return candidates
+
+    def _decomposition_precursors(self, target):
+        # Forward rule: compound with O (no H) -> compound minus O + O2
+        elements = list(target.get_counts().items())
+        return [(Molecule(elements + [('O', k)]),) for k in range(1, 5)]
+
+    def _pool_decomposition_precursors(self, target):
+        return [(mol,) for mol in self.pool_by_class.get('OxygenatedCompound', [])]
+
+    # --- Search ---
+
+    def forward(self, reactants):
+        """Memoized predict_products returning (product formulas, rule)"""
+        key = tuple(sorted(m.canonical() for m in reactants))
+        result = self.forward_memo.get(key)
+        if result is None:
+            self.stats['forward_calls'] += 1
+            products, rule = self.semantics.predict_products(list(reactants))
+            result = ({p.canonical() for p in products}, rule, products)
+            self.forward_memo[key] = result
+        return result
+
+    def precursors(self, target):
+        """Confirmed [(reactants, rule, products)] whose products include target"""
+        key = target.canonical()
+        result = self.precursor_memo.get(key)
+        if result is None:
+            result = []
+            seen = set()
+            for kind in self.product_signature(target):
+                for generator in self.rule_index[kind]:
+                    for reactants in generator(target):
+                        reactant_keys = tuple(sorted(m.canonical() for m in reactants))
+                        if reactant_keys in seen or key in reactant_keys:
+                            continue
+                        seen.add(reactant_keys)
+                        product_keys, rule, products = self.forward(reactants)
+                        if key in product_keys:
+                            result.append((reactants, rule, products))
+            self.precursor_memo[key] = result
+        return result
+
+    def search(self, target, cost_model=None, max_routes=1, max_nodes=5000):
+        """
+        Return up to max_routes cheapest Routes to target (formula or
+        Molecule), or fewer if the node budget runs out. The default cost
+        model treats the pool as free and elements as cost 1.
+        """
+        cost_model = cost_model if cost_model else CostModel({m: 0 for m in self.pool})
+        target = target if isinstance(target, Molecule) else parse_formula(target)
+        step = cost_model.step_cost
+
+        tie = count()
+        # (f, tiebreak, g, needed {formula: Molecule}, made formulas, steps, reagents)
+        start = ({target.canonical(): target}, frozenset(), (), ())
+        frontier = [(step, next(tie), 0.0) + start]
+        visits = {}   # state -> times expanded; the k-th pop is its k-th best path
+        routes = []
+        nodes = 0
+
+        while frontier and len(routes) < max_routes and nodes < max_nodes:
+            f, _, g, needed, made, steps, reagents = heapq.heappop(frontier)
+            if not needed:
+                routes.append(Route(target.get_formula(), list(reversed(steps)), sorted(reagents), g))
+                continue
+
+            state = (frozenset(needed), made)
+            visits[state] = visits.get(state, 0) + 1
+            if visits[state] > max_routes:
+                continue
+            nodes += 1
+            self.stats['expanded'] += 1
+
+            # Expand the first needed species (deterministic order)
+            key = min(needed)
+            molecule = needed[key]
+            rest = {k: m for k, m in needed.items() if k != key}
+            now_made = made | {key}
+
+            for reactants, rule, products in self.precursors(molecule):
+                new_needed = dict(rest)
+                new_reagents = list(reagents)
+                new_g = g + step
+                cycle = False
+                for r in reactants:
+                    r_key = r.canonical()
+                    if r_key in now_made:
+                        cycle = True
+                        break
+                    cost = cost_model.reagent_cost(r)
+                    if cost is not None:
+                        if r_key not in new_reagents:
+                            new_reagents.append(r_key)
+                            new_g += cost
+                    else:
+                        new_needed[r_key] = r
+                if cycle:
+                    continue
+                reaction = Reaction(list(reactants), products)
+                h = step * len(new_needed)
+                heapq.heappush(frontier, (new_g + h, next(tie), new_g, new_needed, now_made,
+                                          steps + ((reaction, rule),), tuple(new_reagents)))
+
+        return routes
@@ -2,17 +2,48 @@
 from chem_utils import is_metal, is_nonmetal, get_charge, get_name
 from chem_parser import Molecule, Reaction
 
+# Signature tags that a reactant set must carry for predict_products to have
+# any chance of matching. Two-reactant rules need one reactant with each tag
+# of a pair; the one-reactant rule needs the single tag. Keep these in step
+# with the rules below: they let callers skip sets that cannot react.
+PAIR_RULE_TAGS = (
+    ('OxygenGas', 'Hydrocarbon'),         # Rule 1: Combustion
+    ('OxygenGas', 'Hydrogen'),            # Rule 1: Combustion (Hydrogen)
+    ('Acid', 'Base'),                     # Rule 2: Neutralization
+    ('MetalElement', 'NonmetalElement'),  # Rule 4: Synthesis
+)
+SINGLE_RULE_TAGS = ('OxygenatedCompound',)  # Rule 3: Decomposition
+
+# Classifications memoized per Semantics instance; past this many distinct
+# element lists new results are computed but not stored.
+CLASSIFY_CACHE_LIMIT = 100_000
+
 class Semantics:
+    """
+    Rule-based prediction and validation. Safe to share between threads:
+    the only mutable state is the classification memo, which is lock-free
+    (entries are computed from the molecule alone, so two threads racing
+    on a miss store equal values and setdefault keeps the first).
+    """
+
     def __init__(self):
-        pass
+        self._classifications = {}  # tuple(molecule.elements) -> class name
 
     def get_element_counts(self, molecule):
-        counts = {}
-        for sym, count in molecule.elements:
-            counts[sym] = counts.get(sym, 0) + count
-        return counts
+        return dict(molecule.get_counts())
 
     def classify_compound(self, molecule):
+        # Keyed by the ordered element list: the acid rule looks at the
+        # first symbol, so HCl and ClH may classify differently.
+        key = tuple(molecule.elements)
+        cached = self._classifications.get(key)
+        if cached is None:
+            cached = self._classify(molecule)
+            if len(self._classifications) < CLASSIFY_CACHE_LIMIT:
+                cached = self._classifications.setdefault(key, cached)
+        return cached
+
+    def _classify(self, molecule):
         counts = self.get_element_counts(molecule)
         elements = list(counts.keys())
         
@@ -49,6 +80,24 @@ class Semantics:
 
         return 'Unknown'
 
+    def signature(self, molecule):
+        """
+        Classification plus element-level tags used by the prediction rules:
+        'Hydrogen' for pure hydrogen, 'MetalElement'/'NonmetalElement' for
+        single-element species.
+        """
+        tags = {self.classify_compound(molecule)}
+        counts = molecule.get_counts()
+        if len(counts) == 1:
+            (sym,) = counts
+            if sym == 'H':
+                tags.add('Hydrogen')
+            if is_metal(sym):
+                tags.add('MetalElement')
+            elif is_nonmetal(sym):
+                tags.add('NonmetalElement')
+        return frozenset(tags)
+
     def predict_products(self, reactants):
         # reactants is a list of Molecule objects
         if not reactants:
@@ -0,0 +1,356 @@
+# chem_server.py - Long-running compile server (asyncio, NDJSON)
+"""
+Serves the compiler over a local TCP or Unix socket so other programs do
+not pay interpreter start-up and import costs per reaction.
+
+Protocol: newline-delimited JSON, one object per line in each direction.
+
+    -> {"id": 1, "reaction": "HCl + NaOH", "codegen": false}
+    <- {"id": 1, "ok": true, "reaction": "HCl + NaOH -> NaCl + H2O",
+        "predicted": true, "rule": "...", "valid": true, "message": "Valid"}
+    <- {"id": 2, "ok": false, "error": {"name": "INVALID_CHAR", "code": 1,
+        "pos": 3, "message": "..."}}
+    -> {"id": 3, "op": "metrics"}
+
+Responses carry the request's id and may arrive out of order when a
+connection pipelines requests.
+
+Requests from all connections go into one bounded queue. A batcher task
+takes up to max_batch requests, waiting at most max_delay seconds after
+the first one, and compiles them together, either inline or in a process
+pool (workers > 0) so CPU work does not stall the event loop. The queue
+bound is the backpressure: when it is full, connection handlers stop
+reading, and the kernel socket buffers push back on clients.
+
+Usage:
+    python chem_server.py [--host 127.0.0.1] [--port 8765] [--unix PATH]
+                          [--workers N] [--max-batch 64] [--max-delay-ms 2]
+"""
+
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+
+from chem_parser import try_parse
+from chem_semantics import Semantics
+from chem_codegen import CodeGenerator
+
+_pipeline = None  # (Semantics, CodeGenerator), created once per process
+
+
+def _process_pipeline():
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = (Semantics(), CodeGenerator())
+    return _pipeline
+
+
+def load_warm_state(path):
+    """
+    Restore a chem_warmstate snapshot into this process's caches (also the
+    worker pool initializer). An unusable snapshot is reported and the
+    process starts cold.
+    """
+    from chem_warmstate import restore, WarmStateError
+    try:
+        return restore(path, _process_pipeline()[0])
+    except (WarmStateError, OSError) as e:
+        print(f"warm state not loaded: {e}", file=sys.stderr)
+        return None
+
+
+def compile_reaction(text, codegen=False):
+    """Run one reaction through the full pipeline; returns a JSON-ready dict"""
+    semantics, generator = _process_pipeline()
+
+    reaction, error = try_parse(text)
+    if error is not None:
+        return {'ok': False, 'error': {'name': error.name, 'code': error.code,
+                                       'pos': error.pos, 'message': error.message}}
+    result = {'ok': True, 'predicted': False, 'rule': None}
+    if not reaction.products:
+        products, rule = semantics.predict_products(reaction.reactants)
+        if products:
+            reaction.products = products
+            result['predicted'] = True
+            result['rule'] = rule
+        else:
+            result['message'] = rule
+    is_valid, msg = semantics.validate_reaction(reaction)
+    result['reaction'] = str(reaction)
+    result['valid'] = is_valid and bool(reaction.products)
+    result.setdefault('message', msg)
+    if codegen and result['valid']:
+        result['outputs'] = generator.generate(reaction)
+    return result
+
+
+def compile_batch(requests):
+    """Compile a list of (text, codegen) pairs; the unit of work sent to workers"""
+    return [compile_reaction(text, codegen) for text, codegen in requests]
+
+
+class ServerMetrics:
+    """Request/batch counters and a window of recent latencies"""
+
+    def __init__(self, window=10000):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.errors = 0      # Malformed requests and compile failures
+        self.batches = 0
+        self.batched = 0     # Requests compiled in batches
+        self.latencies = deque(maxlen=window)  # Seconds, enqueue -> result
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.batched += size
+
+    def snapshot(self, queued=0):
+        uptime = time.perf_counter() - self.started
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3)
+
+        return {
+            'uptime_s': round(uptime, 3),
+            'requests': self.requests,
+            'errors': self.errors,
+            'batches': self.batches,
+            'mean_batch_size': round(self.batched / self.batches, 2) if self.batches else 0,
+            'queued': queued,
+            'throughput_rps': round(self.batched / uptime, 1) if uptime else 0,
+            'latency_ms': {'p50': percentile(0.50), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+        }
+
+
+class CompileServer:
+    """NDJSON compile server with request micro-batching"""
+
+    def __init__(self, host='127.0.0.1', port=8765, unix_path=None, workers=0,
+                 max_batch=64, max_delay=0.002, max_pending=1024, max_line=64 * 1024,
+                 warm_state=None):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.max_line = max_line
+        self.warm_state = warm_state  # chem_warmstate snapshot restored in every process
+        self.metrics = ServerMetrics()
+        self.queue = None
+        self.server = None
+        self._batcher = None
+        self._executor = None
+        self._connections = set()
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        if self.warm_state:
+            load_warm_state(self.warm_state)
+        if self.workers > 0:
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 initializer=load_warm_state if self.warm_state else None,
+                                                 initargs=(self.warm_state,))
+        self._batcher = asyncio.ensure_future(self._run_batcher())
+        if self.unix_path:
+            self.server = await asyncio.start_unix_server(self._handle, self.unix_path, limit=self.max_line)
+        else:
+            self.server = await asyncio.start_server(self._handle, self.host, self.port, limit=self.max_line)
+            self.port = self.server.sockets[0].getsockname()[1]  # Resolves port=0
+        return self
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        self.server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self.server.wait_closed()
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    # --- Connections ---
+
+    async def _handle(self, reader, writer):
+        pending = set()
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # Line longer than max_line
+                    self._send(writer, {'id': None, 'ok': False, 'error': {'message': 'request too long'}})
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                self.metrics.requests += 1
+                try:
+                    request = json.loads(line)
+                    req_id = request.get('id')
+                except (ValueError, AttributeError):
+                    self.metrics.errors += 1
+                    self._send(writer, {'id': None, 'ok': False, 'error': {'message': 'invalid JSON request'}})
+                    continue
+
+                if request.get('op') == 'metrics':
+                    self._send(writer, {'id': req_id, 'ok': True,
+                                        'metrics': self.metrics.snapshot(self.queue.qsize())})
+                    continue
+                text = request.get('reaction')
+                if not isinstance(text, str):
+                    self.metrics.errors += 1
+                    self._send(writer, {'id': req_id, 'ok': False,
+                                        'error': {'message': "missing 'reaction' string"}})
+                    continue
+
+                future = asyncio.get_running_loop().create_future()
+                # Blocks (and so stops reading this socket) while the queue is full
+                await self.queue.put(((text, bool(request.get('codegen'))), future, time.perf_counter()))
+                task = asyncio.ensure_future(self._respond(writer, req_id, future))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                if writer.transport.get_write_buffer_size() > self.max_line:
+                    await writer.drain()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except (asyncio.CancelledError, ConnectionError):
+            pass  # Server shutting down, or the client went away
+        finally:
+            self._connections.discard(connection)
+            writer.close()
+
+    async def _respond(self, writer, req_id, future):
+        result = await future
+        result = dict(result, id=req_id)
+        if not result['ok']:
+            self.metrics.errors += 1
+        if not writer.is_closing():
+            self._send(writer, result)
+
+    def _send(self, writer, payload):
+        writer.write(json.dumps(payload).encode('utf-8') + b'\n')
+
+    # --- Batching ---
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run_batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            requests = [item[0] for item in batch]
+            try:
+                if self._executor is not None:
+                    results = await loop.run_in_executor(self._executor, compile_batch, requests)
+                else:
+                    results = compile_batch(requests)
+            except Exception as e:  # Keep serving; fail just this batch
+                results = [{'ok': False, 'error': {'message': f"internal error: {e}"}}] * len(batch)
+            self.metrics.record_batch(len(batch))
+            now = time.perf_counter()
+            for (_, future, enqueued), result in zip(batch, results):
+                self.metrics.latencies.append(now - enqueued)
+                if not future.done():
+                    future.set_result(result)
+
+
+class CompileClient:
+    """Minimal asyncio client; one request at a time per client"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._next_id = 0
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765, unix_path=None):
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def call(self, payload):
+        self._next_id += 1
+        payload = dict(payload, id=self._next_id)
+        self.writer.write(json.dumps(payload).encode('utf-8') + b'\n')
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def compile(self, reaction, codegen=False):
+        return await self.call({'reaction': reaction, 'codegen': codegen})
+
+    async def metrics(self):
+        return (await self.call({'op': 'metrics'}))['metrics']
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def main(argv=None):
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="Serve the reaction compiler over NDJSON.")
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8765)
+    arg_parser.add_argument('--unix', metavar='PATH', help="listen on a Unix socket instead of TCP")
+    arg_parser.add_argument('--workers', type=int, default=0,
+                            help="compile in a pool of this many processes (0 = in the event loop)")
+    arg_parser.add_argument('--max-batch', type=int, default=64)
+    arg_parser.add_argument('--max-delay-ms', type=float, default=2.0)
+    arg_parser.add_argument('--max-pending', type=int, default=1024,
+                            help="queued requests before clients are pushed back")
+    arg_parser.add_argument('--warm-state', metavar='FILE',
+                            help="restore compiler caches from a chem_warmstate snapshot at startup")
+    args = arg_parser.parse_args(argv)
+
+    async def run():
+        server = CompileServer(args.host, args.port, args.unix, args.workers, args.max_batch,
+                               args.max_delay_ms / 1000, args.max_pending,
+                               warm_state=args.warm_state)
+        await server.start()
+        where = args.unix or f"{args.host}:{server.port}"
+        print(f"Compile server listening on {where}", file=sys.stderr)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
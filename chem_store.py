@@ -0,0 +1,243 @@
+# chem_store.py - Columnar in-memory reaction store
+"""
+Columnar storage for large reaction corpora.
+
+Instead of one Reaction object per line (each a list of Molecules holding
+lists of tuples), the store keeps a handful of flat integer arrays:
+
+    species (deduplicated by canonical formula), CSR-encoded:
+        species_offsets[s] .. species_offsets[s+1] index into
+        species_elements (element IDs) and species_counts
+    reactions, per side:
+        reactant_offsets[r] .. reactant_offsets[r+1] index into reactant_species
+        product_offsets[r]  .. product_offsets[r+1]  index into product_species
+
+Reaction and Molecule objects are only built when asked for
+(store.reaction(i), store.molecule(s)). numpy() returns zero-copy NumPy
+views of the arrays, and save()/load() use a file layout that load() can
+memory-map, so a saved corpus opens without reading it into memory.
+
+Example:
+    store = ReactionStore()
+    store.extend(open("reactions.txt"))
+    store.save("reactions.store")
+    store = ReactionStore.load("reactions.store")   # mmap, read-only
+"""
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from chem_parser import Reaction, intern_molecule, try_parse
+
+STORE_MAGIC = b'CHEMSTR1'
+STORE_VERSION = 1
+
+# (attribute, array typecode) for every column, in file order
+COLUMNS = (
+    ('species_offsets', 'q'),
+    ('species_elements', 'i'),
+    ('species_counts', 'q'),
+    ('reactant_offsets', 'q'),
+    ('reactant_species', 'i'),
+    ('product_offsets', 'q'),
+    ('product_species', 'i'),
+)
+
+NUMPY_DTYPES = {'q': 'int64', 'i': 'int32'}
+
+
+class ReactionStore:
+    """Deduplicated species table + per-side offset arrays"""
+
+    def __init__(self):
+        self.elements = []        # element ID -> symbol
+        self.element_ids = {}     # symbol -> element ID
+        self._species_ids = {}    # canonical formula -> species ID
+        self._molecules = {}      # species ID -> Molecule, built lazily
+        self.readonly = False
+        self._mmap = None
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+        self.species_offsets.append(0)
+        self.reactant_offsets.append(0)
+        self.product_offsets.append(0)
+
+    def __len__(self):
+        return len(self.reactant_offsets) - 1
+
+    @property
+    def n_species(self):
+        return len(self.species_offsets) - 1
+
+    # --- Loading ---
+
+    @property
+    def species_ids(self):
+        if self._species_ids is None:
+            self._species_ids = {self.molecule(s).canonical(): s for s in range(self.n_species)}
+        return self._species_ids
+
+    def add_species(self, molecule):
+        key = molecule.canonical()
+        sid = self.species_ids.get(key)
+        if sid is None:
+            sid = self.n_species
+            self.species_ids[key] = sid
+            for sym, count in molecule.elements:
+                eid = self.element_ids.get(sym)
+                if eid is None:
+                    eid = self.element_ids[sym] = len(self.elements)
+                    self.elements.append(sym)
+                self.species_elements.append(eid)
+                self.species_counts.append(count)
+            self.species_offsets.append(len(self.species_elements))
+        return sid
+
+    def add(self, reaction):
+        """Append a parsed Reaction and return its ID"""
+        if self.readonly:
+            raise ValueError("ReactionStore is read-only (memory-mapped); load with mmap_file=False to append")
+        for molecule in reaction.reactants:
+            self.reactant_species.append(self.add_species(molecule))
+        for molecule in reaction.products:
+            self.product_species.append(self.add_species(molecule))
+        self.reactant_offsets.append(len(self.reactant_species))
+        self.product_offsets.append(len(self.product_species))
+        return len(self) - 1
+
+    def add_text(self, text):
+        """Parse and append one reaction; returns its ID, or None if invalid"""
+        reaction, error = try_parse(text)
+        if error is not None:
+            return None
+        return self.add(reaction)
+
+    def extend(self, lines):
+        """Append every non-blank line; returns the number of invalid lines"""
+        invalid = 0
+        for line in lines:
+            line = line.strip()
+            if line and self.add_text(line) is None:
+                invalid += 1
+        return invalid
+
+    # --- Lazy object views ---
+
+    def molecule(self, sid):
+        molecule = self._molecules.get(sid)
+        if molecule is None:
+            start, end = self.species_offsets[sid], self.species_offsets[sid + 1]
+            elements = [(self.elements[self.species_elements[i]], self.species_counts[i])
+                        for i in range(start, end)]
+            molecule = self._molecules[sid] = intern_molecule(elements)
+        return molecule
+
+    def reactant_ids(self, rid):
+        return self.reactant_species[self.reactant_offsets[rid]:self.reactant_offsets[rid + 1]]
+
+    def product_ids(self, rid):
+        return self.product_species[self.product_offsets[rid]:self.product_offsets[rid + 1]]
+
+    def reaction(self, rid):
+        if not 0 <= rid < len(self):
+            raise IndexError(f"reaction {rid} out of range")
+        return Reaction([self.molecule(s) for s in self.reactant_ids(rid)],
+                        [self.molecule(s) for s in self.product_ids(rid)])
+
+    def __iter__(self):
+        for rid in range(len(self)):
+            yield self.reaction(rid)
+
+    def numpy(self):
+        """
+        Zero-copy NumPy views of every column. While a view of an in-memory
+        store is alive the underlying array cannot grow, so finish loading
+        before taking views.
+        """
+        import numpy as np
+        return {name: np.frombuffer(getattr(self, name), dtype=NUMPY_DTYPES[typecode])
+                for name, typecode in COLUMNS}
+
+    # --- Persistence ---
+
+    def save(self, path):
+        """
+        Layout: magic, u64 header length, JSON header, then each column's
+        raw little-endian bytes at an 8-byte aligned offset.
+        """
+        header = {'version': STORE_VERSION, 'elements': self.elements, 'columns': []}
+        offset = 0
+        for name, typecode in COLUMNS:
+            column = getattr(self, name)
+            nbytes = len(column) * column.itemsize
+            header['columns'].append([name, typecode, offset, len(column)])
+            offset += (nbytes + 7) // 8 * 8
+        encoded = json.dumps(header).encode('utf-8')
+        data_start = (len(STORE_MAGIC) + 8 + len(encoded) + 7) // 8 * 8
+
+        with open(path, 'wb') as f:
+            f.write(STORE_MAGIC)
+            f.write(struct.pack('<Q', len(encoded)))
+            f.write(encoded)
+            f.write(b'\0' * (data_start - f.tell()))
+            for name, typecode in COLUMNS:
+                column = getattr(self, name)
+                if sys.byteorder == 'big':
+                    column = array(typecode, column)
+                    column.byteswap()
+                raw = column.tobytes()
+                f.write(raw)
+                f.write(b'\0' * ((len(raw) + 7) // 8 * 8 - len(raw)))
+
+    @classmethod
+    def load(cls, path, mmap_file=True):
+        """
+        Open a saved store. With mmap_file=True (default) the columns are
+        read-only memoryviews over the mapped file; otherwise they are
+        copied into arrays and the store can be appended to.
+        """
+        store = cls()
+        with open(path, 'rb') as f:
+            if mmap_file and sys.byteorder == 'little':
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                store._mmap = buffer
+                store.readonly = True
+            else:
+                buffer = f.read()
+        view = memoryview(buffer)
+        if bytes(view[:len(STORE_MAGIC)]) != STORE_MAGIC:
+            raise ValueError(f"{path} is not a reaction store file")
+        (header_len,) = struct.unpack_from('<Q', buffer, len(STORE_MAGIC))
+        header_start = len(STORE_MAGIC) + 8
+        header = json.loads(bytes(view[header_start:header_start + header_len]).decode('utf-8'))
+        if header['version'] != STORE_VERSION:
+            raise ValueError(f"Unsupported reaction store version {header['version']}")
+        data_start = (header_start + header_len + 7) // 8 * 8
+
+        store.elements = header['elements']
+        store.element_ids = {sym: i for i, sym in enumerate(store.elements)}
+        for name, typecode, offset, length in header['columns']:
+            itemsize = array(typecode).itemsize
+            start = data_start + offset
+            raw = view[start:start + length * itemsize]
+            if store.readonly:
+                column = raw.cast(typecode)
+            else:
+                column = array(typecode)
+                column.frombytes(raw)
+                if sys.byteorder == 'big':
+                    column.byteswap()
+            setattr(store, name, column)
+        store._species_ids = None  # Rebuilt on first append/lookup
+        return store
+
+    def close(self):
+        """Release the memory map of a store opened with load()"""
+        if self._mmap is not None:
+            for name, typecode in COLUMNS:
+                getattr(self, name).release()
+            self._mmap.close()
+            self._mmap = None
@@ -1,44 +1,52 @@
 # chem_utils.py
 
 # A small subset of the periodic table for MVP purposes
-# Format: Symbol: (Name, Type, Common Charge)
+# Format: Symbol: (Name, Type, Common Charge, Standard Atomic Weight in g/mol)
 PERIODIC_TABLE = {
-    'H':  {'name': 'Hydrogen', 'type': 'Nonmetal', 'charge': 1},
-    'Li': {'name': 'Lithium', 'type': 'Metal', 'charge': 1},
-    'Na': {'name': 'Sodium', 'type': 'Metal', 'charge': 1},
-    'K':  {'name': 'Potassium', 'type': 'Metal', 'charge': 1},
-    'Rb': {'name': 'Rubidium', 'type': 'Metal', 'charge': 1},
-    'Cs': {'name': 'Cesium', 'type': 'Metal', 'charge': 1},
-    'Be': {'name': 'Beryllium', 'type': 'Metal', 'charge': 2},
-    'Mg': {'name': 'Magnesium', 'type': 'Metal', 'charge': 2},
-    'Ca': {'name': 'Calcium', 'type': 'Metal', 'charge': 2},
-    'Sr': {'name': 'Strontium', 'type': 'Metal', 'charge': 2},
-    'Ba': {'name': 'Barium', 'type': 'Metal', 'charge': 2},
-    'Al': {'name': 'Aluminum', 'type': 'Metal', 'charge': 3},
-    'Zn': {'name': 'Zinc', 'type': 'Metal', 'charge': 2},
-    'Fe': {'name': 'Iron', 'type': 'Metal', 'charge': 2}, # Variable 2/3
-    'Cu': {'name': 'Copper', 'type': 'Metal', 'charge': 2}, # Variable 1/2
-    'Ag': {'name': 'Silver', 'type': 'Metal', 'charge': 1},
-    'Pb': {'name': 'Lead', 'type': 'Metal', 'charge': 2},
-    'C':  {'name': 'Carbon', 'type': 'Nonmetal', 'charge': 4},
-    'N':  {'name': 'Nitrogen', 'type': 'Nonmetal', 'charge': -3},
-    'P':  {'name': 'Phosphorus', 'type': 'Nonmetal', 'charge': -3},
-    'O':  {'name': 'Oxygen', 'type': 'Nonmetal', 'charge': -2},
-    'S':  {'name': 'Sulfur', 'type': 'Nonmetal', 'charge': -2},
-    'F':  {'name': 'Fluorine', 'type': 'Nonmetal', 'charge': -1},
-    'Cl': {'name': 'Chlorine', 'type': 'Nonmetal', 'charge': -1},
-    'Br': {'name': 'Bromine', 'type': 'Nonmetal', 'charge': -1},
-    'I':  {'name': 'Iodine', 'type': 'Nonmetal', 'charge': -1},
+    'H':  {'name': 'Hydrogen', 'type': 'Nonmetal', 'charge': 1, 'mass': 1.008},
+    'Li': {'name': 'Lithium', 'type': 'Metal', 'charge': 1, 'mass': 6.94},
+    'Na': {'name': 'Sodium', 'type': 'Metal', 'charge': 1, 'mass': 22.99},
+    'K':  {'name': 'Potassium', 'type': 'Metal', 'charge': 1, 'mass': 39.098},
+    'Rb': {'name': 'Rubidium', 'type': 'Metal', 'charge': 1, 'mass': 85.468},
+    'Cs': {'name': 'Cesium', 'type': 'Metal', 'charge': 1, 'mass': 132.91},
+    'Be': {'name': 'Beryllium', 'type': 'Metal', 'charge': 2, 'mass': 9.0122},
+    'Mg': {'name': 'Magnesium', 'type': 'Metal', 'charge': 2, 'mass': 24.305},
+    'Ca': {'name': 'Calcium', 'type': 'Metal', 'charge': 2, 'mass': 40.078},
+    'Sr': {'name': 'Strontium', 'type': 'Metal', 'charge': 2, 'mass': 87.62},
+    'Ba': {'name': 'Barium', 'type': 'Metal', 'charge': 2, 'mass': 137.33},
+    'Al': {'name': 'Aluminum', 'type': 'Metal', 'charge': 3, 'mass': 26.982},
+    'Zn': {'name': 'Zinc', 'type': 'Metal', 'charge': 2, 'mass': 65.38},
+    'Fe': {'name': 'Iron', 'type': 'Metal', 'charge': 2, 'mass': 55.845}, # Variable 2/3
+    'Cu': {'name': 'Copper', 'type': 'Metal', 'charge': 2, 'mass': 63.546}, # Variable 1/2
+    'Ag': {'name': 'Silver', 'type': 'Metal', 'charge': 1, 'mass': 107.87},
+    'Pb': {'name': 'Lead', 'type': 'Metal', 'charge': 2, 'mass': 207.2},
+    'C':  {'name': 'Carbon', 'type': 'Nonmetal', 'charge': 4, 'mass': 12.011},
+    'N':  {'name': 'Nitrogen', 'type': 'Nonmetal', 'charge': -3, 'mass': 14.007},
+    'P':  {'name': 'Phosphorus', 'type': 'Nonmetal', 'charge': -3, 'mass': 30.974},
+    'O':  {'name': 'Oxygen', 'type': 'Nonmetal', 'charge': -2, 'mass': 15.999},
+    'S':  {'name': 'Sulfur', 'type': 'Nonmetal', 'charge': -2, 'mass': 32.06},
+    'F':  {'name': 'Fluorine', 'type': 'Nonmetal', 'charge': -1, 'mass': 18.998},
+    'Cl': {'name': 'Chlorine', 'type': 'Nonmetal', 'charge': -1, 'mass': 35.45},
+    'Br': {'name': 'Bromine', 'type': 'Nonmetal', 'charge': -1, 'mass': 79.904},
+    'I':  {'name': 'Iodine', 'type': 'Nonmetal', 'charge': -1, 'mass': 126.9},
 }
 
+# Frozen lookup sets for the predicates every rule calls per element
+METALS = frozenset(s for s, info in PERIODIC_TABLE.items() if info['type'] == 'Metal')
+NONMETALS = frozenset(s for s, info in PERIODIC_TABLE.items() if info['type'] == 'Nonmetal')
+
 def is_metal(symbol):
-    return PERIODIC_TABLE.get(symbol, {}).get('type') == 'Metal'
+    return symbol in METALS
 
 def is_nonmetal(symbol):
-    return PERIODIC_TABLE.get(symbol, {}).get('type') == 'Nonmetal'
+    return symbol in NONMETALS
 
 def get_charge(symbol):
     return PERIODIC_TABLE.get(symbol, {}).get('charge', 0)
 
 def get_name(symbol):
     return PERIODIC_TABLE.get(symbol, {}).get('name', 'Unknown')
+
+def get_mass(symbol):
+    # NaN for symbols outside the table, so unknown masses can't pass as real ones
+    return PERIODIC_TABLE.get(symbol, {}).get('mass', float('nan'))
@@ -0,0 +1,178 @@
+# chem_warmstate.py - Snapshot and restore of the compiler's warm caches
+"""
+Saves the caches a long-running compiler builds up, so a new worker process
+can start warm instead of re-deriving them from traffic:
+
+    interned molecules   INTERNED_MOLECULES (chem_parser), with each
+                         molecule's counts, canonical formula and molar mass
+    classifications      a Semantics instance's classification memo
+
+(Balancing is currently a constant-time 1:1 pass and no generated code is
+compiled, so there are no balancer results or code objects to keep.)
+
+File layout: magic, u32 format version, the 32-byte rules fingerprint,
+the 32-byte SHA-256 of the payload, u64 payload length, then the payload
+as one marshal blob. restore() maps the file and checks the header and
+digest on the mapped bytes before unmarshalling straight from the mapping.
+
+The fingerprint is a SHA-256 over the format version, the interpreter's
+cache tag (marshal is interpreter-specific) and the source of the modules
+whose logic produced the cached values (chem_utils, chem_parser,
+chem_semantics). Any change to the rules or the element table therefore
+makes old snapshots stale; restore() rejects them with WarmStateError,
+as it does truncated or corrupt files, and callers simply start cold.
+
+Usage:
+    python chem_warmstate.py save warm.bin corpus.txt [--lines N]
+    python chem_warmstate.py info warm.bin
+"""
+
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import sys
+
+import chem_parser
+import chem_semantics
+import chem_utils
+from chem_parser import Molecule, INTERNED_MOLECULES, INTERN_LIMIT
+from chem_semantics import CLASSIFY_CACHE_LIMIT
+
+WARM_MAGIC = b'CHEMWRM1'
+WARM_VERSION = 1
+HEADER = struct.Struct('<8sI32s32sQ')  # magic, version, fingerprint, payload SHA-256, payload length
+RULE_MODULES = (chem_utils, chem_parser, chem_semantics)
+
+_fingerprint = None
+
+
+class WarmStateError(ValueError):
+    """The file is not a usable snapshot: wrong format, stale rules or corrupt"""
+
+
+def rules_fingerprint():
+    """SHA-256 identifying the format, interpreter and rule sources (computed once)"""
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha256(f"{WARM_VERSION}:{sys.implementation.cache_tag}".encode('utf-8'))
+        for module in RULE_MODULES:
+            with open(module.__file__, 'rb') as f:
+                digest.update(f.read())
+        _fingerprint = digest.digest()
+    return _fingerprint
+
+
+def snapshot(path, semantics=None):
+    """
+    Write the interned molecules, and the classification memo of semantics
+    if given, to path (atomically, via a temporary file). Returns the
+    entry counts and file size.
+    """
+    molecules = tuple((key, molecule.counts, molecule._canonical, molecule._molar_mass)
+                      for key, molecule in list(INTERNED_MOLECULES.items()))
+    classifications = dict(semantics._classifications) if semantics is not None else {}
+    payload = marshal.dumps({'molecules': molecules, 'classifications': classifications})
+    header = HEADER.pack(WARM_MAGIC, WARM_VERSION, rules_fingerprint(),
+                         hashlib.sha256(payload).digest(), len(payload))
+    temp = f"{path}.tmp"
+    with open(temp, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(temp, path)
+    return {'molecules': len(molecules), 'classifications': len(classifications),
+            'bytes': len(header) + len(payload)}
+
+
+def _load(path):
+    """Validated payload of a snapshot file"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise WarmStateError(f"{path} is not a warm-state file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            magic, version, fingerprint, digest, length = HEADER.unpack_from(buffer)
+            if magic != WARM_MAGIC:
+                raise WarmStateError(f"{path} is not a warm-state file")
+            if version != WARM_VERSION:
+                raise WarmStateError(f"Unsupported warm-state version {version}")
+            if fingerprint != rules_fingerprint():
+                raise WarmStateError(f"{path} was saved by a different compiler or rule set")
+            if len(buffer) != HEADER.size + length:
+                raise WarmStateError(f"{path} is truncated")
+            with memoryview(buffer)[HEADER.size:] as payload:
+                if hashlib.sha256(payload).digest() != digest:
+                    raise WarmStateError(f"{path} failed its integrity check")
+                return marshal.loads(payload)
+
+
+def restore(path, semantics=None):
+    """
+    Load a snapshot into INTERNED_MOLECULES and, if given, the
+    classification memo of semantics. Entries already present are kept,
+    and the caches' size limits are respected. Returns the entry counts
+    added; raises WarmStateError if the file can't be used.
+    """
+    state = _load(path)
+    added = {'molecules': 0, 'classifications': 0}
+    interned = INTERNED_MOLECULES
+    for key, counts, canonical, molar_mass in state['molecules']:
+        if len(interned) >= INTERN_LIMIT:
+            break
+        if key in interned:
+            continue
+        molecule = Molecule(list(key), counts)
+        molecule._canonical = canonical
+        molecule._molar_mass = molar_mass
+        if interned.setdefault(key, molecule) is molecule:
+            added['molecules'] += 1
+    if semantics is not None:
+        memo = semantics._classifications
+        for key, name in state['classifications'].items():
+            if len(memo) >= CLASSIFY_CACHE_LIMIT:
+                break
+            if memo.setdefault(key, name) is name:
+                added['classifications'] += 1
+    return added
+
+
+def main(argv=None):
+    import argparse
+    import time
+    arg_parser = argparse.ArgumentParser(description="Save or inspect compiler warm-state snapshots.")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    save = commands.add_parser('save', help="compile a corpus to warm the caches, then snapshot them")
+    save.add_argument('output')
+    save.add_argument('corpus', help="reaction file, one per line")
+    save.add_argument('--lines', type=int, default=None, help="compile at most this many lines")
+    info = commands.add_parser('info', help="verify a snapshot and time restoring it")
+    info.add_argument('path')
+    args = arg_parser.parse_args(argv)
+
+    if args.command == 'save':
+        from itertools import islice
+        from chem_pipeline import Pipeline
+        pipeline = Pipeline(generate_code=False, raise_errors=False)
+        with open(args.corpus, encoding='utf-8') as f:
+            for line in islice(f, args.lines):
+                if line.strip():
+                    pipeline.compile(line)
+        saved = snapshot(args.output, pipeline.semantics)
+        print(f"{args.output}: {saved['molecules']} molecules, {saved['classifications']} "
+              f"classifications, {saved['bytes'] / 1024:.1f} KiB")
+        return 0
+
+    start = time.perf_counter()
+    try:
+        added = restore(args.path, chem_semantics.Semantics())
+    except WarmStateError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+    print(f"{args.path}: {added['molecules']} molecules, {added['classifications']} "
+          f"classifications, restored in {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,22 +6,66 @@ Beautiful Pygame GUI that visualizes all 5 compilation stages:
 3. Semantic Analysis
 4. Validation
 5. Code Generation
+
+Results update as you type; Enter or the Compile button compiles the input
+too. Either way the reaction compiles in a background process, incrementally
+(see chem_incremental), so a large paste never stalls the window.
+
+Batch mode: drop a reaction file (one per line) on the window, or pass it
+on the command line (python gui_compiler.py reactions.txt). It compiles in
+a background process into a list that replaces the code output panel;
+filter it by status or rule with the header buttons, and click a row (or
+use the arrow keys) to see its stages. Clear leaves batch mode.
 """
 
+import copy
+import mmap
+import multiprocessing
+import os
 import pygame
 import sys
-from chem_lexer import Lexer
-from chem_parser import Parser
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from chem_lexer import Token
 from chem_semantics import Semantics
 from chem_codegen import CodeGenerator
-
-# Initialize Pygame
-pygame.init()
+from chem_pipeline import Pipeline, Collector
+from chem_incremental import IncrementalCompiler
 
 # Constants - RELEASE v2 (Compact Size)
 WINDOW_WIDTH = 1000
 WINDOW_HEIGHT = 700
-FPS = 60
+FPS = 60                # Frame-rate cap while events are arriving
+CURSOR_BLINK_MS = 500   # Caret blink period; the only redraw an idle window needs
+PROGRESS_DELAY_MS = 100 # Compiles finishing sooner never show the progress indicator
+SPINNER_MS = 120        # Progress indicator animation period
+SPINNER = "|/-\\"
+# Live compile delay after the last edit. 0 compiles in the keystroke's own
+# frame; edits arriving within one frame (key repeat, bursts) still
+# coalesce into one compile, since update() runs once per frame.
+LIVE_DEBOUNCE_MS = 0
+# The compile process runs at lower CPU priority (POSIX), so on a machine
+# with few cores the event loop still gets the CPU each frame
+COMPILE_NICENESS = 10
+
+# Posted by CompileWorker: COMPILE_PROGRESS(generation, stage) after each
+# pipeline stage, COMPILE_DONE(generation, text, result, error) at the end
+COMPILE_PROGRESS = pygame.event.custom_type()
+COMPILE_DONE = pygame.event.custom_type()
+STAGES = ('lex', 'parse', 'predict', 'validate', 'codegen')
+
+# Batch mode. BatchJob posts BATCH_PROGRESS(job) as rows arrive, at most
+# every BATCH_NOTIFY_MS while compiling, and BATCH_DONE(job) at the end.
+BATCH_PROGRESS = pygame.event.custom_type()
+BATCH_DONE = pygame.event.custom_type()
+BATCH_NOTIFY_MS = 50
+ROW_VALID, ROW_INVALID, ROW_SYNTAX_ERROR = 0, 1, 2  # Row statuses
+STATUS_FILTERS = (None, ROW_VALID, ROW_INVALID, ROW_SYNTAX_ERROR)
+STATUS_NAMES = {None: "All", ROW_VALID: "Valid", ROW_INVALID: "Invalid", ROW_SYNTAX_ERROR: "Syntax error"}
 
 # Modern Color Palette
 COLORS = {
@@ -68,6 +112,7 @@ class Button:
         self.color = color
         self.hover_color = hover_color
         self.is_hovered = False
+        self.dirty = True
         
     def draw(self, screen):
         color = self.hover_color if self.is_hovered else self.color
@@ -79,7 +124,10 @@ class Button:
         
     def handle_event(self, event):
         if event.type == pygame.MOUSEMOTION:
-            self.is_hovered = self.rect.collidepoint(event.pos)
+            hovered = self.rect.collidepoint(event.pos)
+            if hovered != self.is_hovered:
+                self.is_hovered = hovered
+                self.dirty = True
         elif event.type == pygame.MOUSEBUTTONDOWN:
             if self.is_hovered:
                 return True
@@ -89,15 +137,31 @@ class InputBox:
     """Modern input box with cursor"""
     def __init__(self, x, y, width, height, placeholder=""):
         self.rect = pygame.Rect(x, y, width, height)
-        self.text = ""
+        self._text = ""
         self.placeholder = placeholder
         self.active = False
         self.cursor_visible = True
-        self.cursor_timer = 0
+        self.cursor_toggled_at = 0  # pygame.time.get_ticks() of the last blink
+        self.dirty = True
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        if value != self._text:
+            self._text = value
+            self.dirty = True
         
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN:
-            self.active = self.rect.collidepoint(event.pos)
+            active = self.rect.collidepoint(event.pos)
+            if active != self.active:
+                self.active = active
+                self.cursor_visible = True
+                self.cursor_toggled_at = pygame.time.get_ticks()
+                self.dirty = True
         elif event.type == pygame.KEYDOWN and self.active:
             if event.key == pygame.K_BACKSPACE:
                 self.text = self.text[:-1]
@@ -107,11 +171,31 @@ class InputBox:
                 self.text += event.unicode
         return False
         
-    def update(self):
-        self.cursor_timer += 1
-        if self.cursor_timer >= 30:
+    def update(self, now):
+        """Blink the caret (only while focused); now is pygame.time.get_ticks()"""
+        if self.active and now - self.cursor_toggled_at >= CURSOR_BLINK_MS:
             self.cursor_visible = not self.cursor_visible
-            self.cursor_timer = 0
+            self.cursor_toggled_at = now
+            self.dirty = True
+
+    def next_blink(self, now):
+        """Milliseconds until the caret next needs redrawing, or None when unfocused"""
+        if not self.active:
+            return None
+        return max(1, self.cursor_toggled_at + CURSOR_BLINK_MS - now)
+            
+    def visible_text(self):
+        """The end of the text that fits in the box; a paste can be far longer"""
+        width = self.rect.width - 20
+        text = self.text[-width:]  # No glyph is narrower than a pixel
+        low, high = 0, len(text)
+        while low < high:  # Shortest cut whose rest fits
+            mid = (low + high) // 2
+            if FONT_BODY.size(text[mid:])[0] <= width:
+                high = mid
+            else:
+                low = mid + 1
+        return text[low:]
             
     def draw(self, screen):
         # Border color based on active state
@@ -123,7 +207,7 @@ class InputBox:
         
         # Draw text or placeholder
         if self.text:
-            text_surf = FONT_BODY.render(self.text, True, COLORS['text'])
+            text_surf = FONT_BODY.render(self.visible_text(), True, COLORS['text'])
         else:
             text_surf = FONT_BODY.render(self.placeholder, True, COLORS['text_dim'])
             
@@ -138,75 +222,571 @@ class InputBox:
                            (cursor_x, cursor_y), 
                            (cursor_x, cursor_y + self.rect.height - 16), 2)
 
+class LazyLines:
+    """
+    Read-only sequence of (text, color) lines that formats each line only
+    when it is drawn, so a result with 100k tokens costs nothing until it
+    is scrolled to. Built from segments, each a list of (text, color)
+    lines or an (items, format, color) triple giving one line
+    format(index, item) per item.
+    """
+    def __init__(self, *segments):
+        self.segments = []
+        self.starts = []
+        self.length = 0
+        for segment in segments:
+            if isinstance(segment, list):
+                segment = (segment, None, None)
+            self.starts.append(self.length)
+            self.segments.append(segment)
+            self.length += len(segment[0])
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        k = bisect_right(self.starts, index) - 1
+        items, format, color = self.segments[k]
+        index -= self.starts[k]
+        return items[index] if format is None else (format(index, items[index]), color)
+
 class ScrollableTextArea:
-    """Scrollable text area for displaying output"""
+    """
+    Scrollable text area for displaying output. Each line is rendered at
+    most once per content change (on first becoming visible) and kept as
+    a surface, so drawing only blits the lines in view.
+    """
+    LINE_HEIGHT = 18
+
     def __init__(self, x, y, width, height, title=""):
         self.rect = pygame.Rect(x, y, width, height)
         self.title = title
         self.lines = []
+        self.surfaces = []  # Rendered line surfaces, None until first drawn
+        self.title_surf = None
         self.scroll_offset = 0
         self.max_scroll = 0
-        
+        self.dirty = True
+        content_y = self.rect.y + (40 if title else 10)
+        self.clip_rect = pygame.Rect(self.rect.x + 6, content_y,
+                                     self.rect.width - 12, self.rect.bottom - content_y - 6)
+
     def set_content(self, text, color=None):
         """Set content with optional color"""
         if color is None:
             color = COLORS['text']
-        self.lines = []
-        for line in text.split('\n'):
-            self.lines.append((line, color))
-        self.scroll_offset = 0
-        
+        self.add_colored_lines([(line, color) for line in text.split('\n')])
+
     def add_colored_lines(self, lines_with_colors):
         """Add lines with specific colors: [(text, color), ...]"""
         self.lines = lines_with_colors
+        self.surfaces = [None] * len(lines_with_colors)
         self.scroll_offset = 0
-        
+        self.dirty = True
+        content_height = len(self.lines) * self.LINE_HEIGHT
+        self.max_scroll = max(0, self.clip_rect.y + content_height - self.rect.bottom + 20)
+
+    def visible_range(self):
+        """(first, last) indices of the lines that intersect the clip rect, last exclusive"""
+        first = self.scroll_offset // self.LINE_HEIGHT
+        last = (self.scroll_offset + self.clip_rect.height) // self.LINE_HEIGHT + 1
+        return first, min(last, len(self.lines))
+
     def handle_event(self, event):
         if event.type == pygame.MOUSEWHEEL:
             if self.rect.collidepoint(pygame.mouse.get_pos()):
-                self.scroll_offset -= event.y * 20
-                self.scroll_offset = max(0, min(self.scroll_offset, self.max_scroll))
-                
+                offset = max(0, min(self.scroll_offset - event.y * 20, self.max_scroll))
+                if offset != self.scroll_offset:
+                    self.scroll_offset = offset
+                    self.dirty = True
+
     def draw(self, screen):
         # Draw background
         pygame.draw.rect(screen, COLORS['surface'], self.rect, border_radius=6)
         pygame.draw.rect(screen, COLORS['border'], self.rect, 2, border_radius=6)
-        
+
         # Draw title
         if self.title:
-            title_surf = FONT_HEADING.render(self.title, True, COLORS['text'])
-            screen.blit(title_surf, (self.rect.x + 10, self.rect.y + 10))
-            content_y = self.rect.y + 40
-        else:
-            content_y = self.rect.y + 10
-            
-        # Create clipping rect for scrolling
-        clip_rect = pygame.Rect(self.rect.x + 6, content_y, 
-                               self.rect.width - 12, self.rect.height - (content_y - self.rect.y) - 6)
-        screen.set_clip(clip_rect)
-        
-        # Draw lines
-        y = content_y - self.scroll_offset
-        line_height = 18
-        
-        for line_text, line_color in self.lines:
-            if y > self.rect.y and y < self.rect.bottom:
-                text_surf = FONT_CODE.render(line_text, True, line_color)
-                screen.blit(text_surf, (self.rect.x + 10, y))
-            y += line_height
-            
-        self.max_scroll = max(0, y - self.rect.bottom + 20)
-        
-        # Reset clip
+            if self.title_surf is None:
+                self.title_surf = FONT_HEADING.render(self.title, True, COLORS['text'])
+            screen.blit(self.title_surf, (self.rect.x + 10, self.rect.y + 10))
+
+        # Draw the visible lines, clipped for partial ones at the edges
+        screen.set_clip(self.clip_rect)
+        first, last = self.visible_range()
+        y = self.clip_rect.y - self.scroll_offset + first * self.LINE_HEIGHT
+        for i in range(first, last):
+            surface = self.surfaces[i]
+            if surface is None:
+                line_text, line_color = self.lines[i]
+                surface = self.surfaces[i] = FONT_CODE.render(line_text, True, line_color)
+            screen.blit(surface, (self.rect.x + 10, y))
+            y += self.LINE_HEIGHT
         screen.set_clip(None)
-        
+
         # Draw scrollbar if needed
         if self.max_scroll > 0:
-            scrollbar_height = max(20, (self.rect.height / (y - content_y)) * self.rect.height)
+            content_height = len(self.lines) * self.LINE_HEIGHT
+            scrollbar_height = max(20, (self.rect.height / content_height) * self.rect.height)
             scrollbar_y = self.rect.y + (self.scroll_offset / self.max_scroll) * (self.rect.height - scrollbar_height)
             scrollbar_rect = pygame.Rect(self.rect.right - 6, scrollbar_y, 4, scrollbar_height)
             pygame.draw.rect(screen, COLORS['text_dim'], scrollbar_rect, border_radius=2)
 
+class CompileCancelled(Exception):
+    """Raised inside the compile process when a newer request supersedes the running one"""
+
+class _StageProgress(Collector):
+    """Pipeline collector that reports finished stages and stops superseded compiles"""
+    def __init__(self, current, progress):
+        self.current = current  # Shared generation counter
+        self.progress = progress
+        self.generation = None  # Of the compile running
+
+    def before(self, stage, result):
+        if self.current.value != self.generation:
+            raise CompileCancelled()
+
+    def after(self, stage, result, elapsed_ns):
+        self.progress.put((self.generation, stage))
+
+class TokenColumns:
+    """
+    A token list kept as parallel type, value and position lists; indexing
+    builds the Token. Compile results cross from the compile process with
+    their tokens in this form, since unpickling 100k Token objects would
+    hold the GIL for a few frames' time while 3 lists take milliseconds.
+    """
+    def __init__(self, types, values, positions):
+        self.types = types
+        self.values = values
+        self.positions = positions
+
+    @classmethod
+    def of(cls, tokens):
+        return cls([t.type for t in tokens], [t.value for t in tokens], [t.pos for t in tokens])
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TokenColumns(self.types[index], self.values[index], self.positions[index])
+        return Token(self.types[index], self.values[index], self.positions[index])
+
+_compile_process = None  # (_StageProgress, IncrementalCompiler) in the compile process
+
+def _init_compile_process(current, progress):
+    global _compile_process
+    if hasattr(os, 'nice'):
+        os.nice(COMPILE_NICENESS)
+    stage_progress = _StageProgress(current, progress)
+    pipeline = Pipeline(Semantics(), CodeGenerator(), collectors=[stage_progress], raise_errors=False)
+    _compile_process = (stage_progress, IncrementalCompiler(pipeline))
+
+def _compile_in_process(generation, text):
+    """(result, error) for text, or None if a newer request superseded it"""
+    stage_progress, compiler = _compile_process
+    stage_progress.generation = generation
+    try:
+        result = compiler.compile(text)
+    except CompileCancelled:
+        return None
+    except Exception as e:
+        return None, e
+    error = result.error
+    if error is not None:
+        return None, SyntaxError(error.message)
+    result = copy.copy(result)  # The compiler's cache and token list keep the original
+    result.tokens = TokenColumns.of(result.tokens)
+    return result, None
+
+class CompileWorker:
+    """
+    Compiles in a separate process so the event loop never waits on the
+    pipeline, nor shares the GIL with it. Only the newest request matters:
+    submitting or cancelling bumps a generation counter shared with the
+    process, a running compile stops at its next stage boundary, and
+    results are posted only for the current generation. The process
+    compiles with an IncrementalCompiler, so each edit of the input reuses
+    the work done for the one before, and compiling a text again (Enter
+    after typing it) is a cache lookup.
+    """
+    def __init__(self):
+        self._current = multiprocessing.Value('q', 0)
+        self._progress = multiprocessing.SimpleQueue()
+        self._pool = None
+        self._future = None
+        self._start_pool()
+        self._thread = threading.Thread(target=self._forward_progress, name="compile-progress", daemon=True)
+        self._thread.start()
+
+    @property
+    def generation(self):
+        return self._current.value
+
+    def _start_pool(self):
+        self._pool = ProcessPoolExecutor(1, initializer=_init_compile_process,
+                                         initargs=(self._current, self._progress))
+        self._pool.submit(int)  # Starts the process now rather than on the first compile
+
+    def _bump(self):
+        with self._current.get_lock():
+            self._current.value += 1
+            return self._current.value
+
+    def submit(self, text):
+        """Compile text, superseding any earlier request; returns its generation"""
+        generation = self._bump()
+        if self._future is not None:
+            self._future.cancel()
+        try:
+            future = self._pool.submit(_compile_in_process, generation, text)
+        except BrokenProcessPool:  # The process died; start another
+            self._start_pool()
+            future = self._pool.submit(_compile_in_process, generation, text)
+        future.add_done_callback(lambda future: self._done(generation, text, future))
+        self._future = future
+        return generation
+
+    def cancel(self):
+        self._bump()
+        if self._future is not None:
+            self._future.cancel()
+
+    def stop(self):
+        self.cancel()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._progress.put(None)
+        self._thread.join()
+
+    def _done(self, generation, text, future):
+        # Runs on the pool's result thread, which unpickled the result
+        if future.cancelled() or generation != self.generation:
+            return
+        try:
+            outcome = future.result()
+        except Exception as e:  # The process died, or the error couldn't be sent back
+            outcome = (None, e)
+        if outcome is not None and generation == self.generation:
+            result, error = outcome
+            pygame.event.post(pygame.event.Event(COMPILE_DONE, generation=generation, text=text,
+                                                 result=result, error=error))
+
+    def _forward_progress(self):
+        while True:
+            message = self._progress.get()
+            if message is None:
+                return
+            generation, stage = message
+            if generation == self.generation:
+                pygame.event.post(pygame.event.Event(COMPILE_PROGRESS, generation=generation, stage=stage))
+
+def _compile_batch(path, connection, cancelled):
+    """
+    Batch process entry point: compile every non-blank line of path, and
+    every BATCH_NOTIFY_MS send the rows compiled since as (offsets, line
+    numbers, statuses, rule ids, new rule names, bytes compiled); then
+    None, or the exception that stopped the job.
+    """
+    if hasattr(os, 'nice'):
+        os.nice(COMPILE_NICENESS)
+    pipeline = Pipeline(generate_code=False, raise_errors=False)
+    rule_ids = {}
+    new_rows = lambda: (array('q'), array('I'), bytearray(), bytearray(), [])
+    rows = new_rows()
+    notify_at = time.perf_counter() + BATCH_NOTIFY_MS / 1000
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+            start = line_number = 0
+            while start < size and not cancelled.is_set():
+                end = buffer.find(b'\n', start)
+                if end < 0:
+                    end = size
+                line_number += 1
+                text = buffer[start:end].decode('utf-8', errors='replace').strip()
+                if text:
+                    result = pipeline.compile(text)
+                    if result.error is not None:
+                        status, rule = ROW_SYNTAX_ERROR, "(syntax error)"
+                    else:
+                        status = ROW_VALID if result.valid else ROW_INVALID
+                        rule = result.rule or "(products given)"
+                    offsets, line_numbers, statuses, ids, rules = rows
+                    rule_id = rule_ids.get(rule)
+                    if rule_id is None:
+                        rule_id = rule_ids[rule] = len(rule_ids)
+                        rules.append(rule)
+                    offsets.append(start)
+                    line_numbers.append(line_number)
+                    statuses.append(status)
+                    ids.append(rule_id)
+                start = end + 1
+                if time.perf_counter() >= notify_at or start >= size:
+                    connection.send(rows + (min(start, size),))
+                    rows = new_rows()
+                    notify_at = time.perf_counter() + BATCH_NOTIFY_MS / 1000
+            if size:
+                buffer.close()
+        connection.send(None)
+    except Exception as e:
+        connection.send(e)
+    connection.close()
+
+class BatchJob:
+    """
+    Compiles a reaction file in a separate process (niced like the compile
+    process), so the event loop neither waits on nor shares the GIL with
+    it. Each non-blank line becomes a row of about 14 bytes however long
+    the line is: its byte offset, line number, status and rule id, in flat
+    arrays. Row text is read back from the memory-mapped file only when a
+    row is drawn or selected.
+
+    The process streams rows back in chunks; a thread appends them offset
+    last, so len(job) never counts a row whose other fields aren't stored
+    yet and the UI thread can read while the job runs.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.offsets = array('q')
+        self.line_numbers = array('I')  # 1-based, counting blank lines
+        self.statuses = bytearray()
+        self.rule_ids = bytearray()
+        self.rules = []              # Rule names by id, in order of first appearance
+        self.counts = [0, 0, 0]      # Rows per status
+        self.position = 0            # Bytes compiled so far
+        self.done = False
+        self.error = None            # Exception that stopped the job
+        self._cancelled = multiprocessing.Event()
+        self._connection, child = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=_compile_batch, args=(path, child, self._cancelled),
+                                                name="batch", daemon=True)
+        self._process.start()
+        child.close()
+        self._thread = threading.Thread(target=self._receive, name="batch", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def line(self, row):
+        """Text of a row, from the mapped file"""
+        start = self.offsets[row]
+        end = self.buffer.find(b'\n', start)
+        return self.buffer[start:end if end >= 0 else self.size].decode('utf-8', errors='replace').strip()
+
+    def line_number(self, row):
+        return self.line_numbers[row]
+
+    def rule(self, row):
+        return self.rules[self.rule_ids[row]]
+
+    def close(self):
+        """Stop compiling and release the file"""
+        self._cancelled.set()
+        self._thread.join()
+        self._process.join()
+        if self.size:
+            self.buffer.close()
+        self._file.close()
+
+    def _receive(self):
+        try:
+            while True:
+                message = self._connection.recv()
+                if message is None or isinstance(message, Exception):
+                    self.error = message
+                    break
+                offsets, line_numbers, statuses, rule_ids, rules, position = message
+                self.rules.extend(rules)
+                self.line_numbers.extend(line_numbers)
+                self.statuses.extend(statuses)
+                self.rule_ids.extend(rule_ids)
+                for status in range(len(self.counts)):
+                    self.counts[status] += statuses.count(status)
+                self.offsets.extend(offsets)
+                self.position = position
+                pygame.event.post(pygame.event.Event(BATCH_PROGRESS, job=self))
+        except EOFError as e:  # The process died without reporting
+            self.error = e
+        self._connection.close()
+        self.done = True
+        if not self._cancelled.is_set():
+            pygame.event.post(pygame.event.Event(BATCH_DONE, job=self))
+
+class BatchList:
+    """
+    Virtualized list of a BatchJob's rows, filtered by status and rule.
+    The filtered view is an array of row indices, extended as rows stream
+    in; only rows in view are rendered, and only their surfaces are kept.
+    """
+    ROW_HEIGHT = 18
+    MARKS = {ROW_VALID: ("✓", 'success'), ROW_INVALID: ("✗", 'error'), ROW_SYNTAX_ERROR: ("!", 'warning')}
+
+    def __init__(self, x, y, width, height):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.clip_rect = pygame.Rect(x + 6, y + 40, width - 12, height - 46)
+        self.status_button = Button(self.rect.right - 400, y + 7, 150, 26, "",
+                                    COLORS['surface_light'], COLORS['border'])
+        self.rule_button = Button(self.rect.right - 240, y + 7, 230, 26, "",
+                                  COLORS['surface_light'], COLORS['border'])
+        self.set_job(None)
+
+    def set_job(self, job):
+        self.job = job
+        self.dirty = True
+        self.status_filter = None
+        self.rule_filter = None  # Rule id
+        self.selected = None     # Row index
+        self.reset_view()
+
+    def reset_view(self):
+        self.view = array('q')   # Indices of the rows passing the filters
+        self.scanned = 0         # Rows of the job checked against the filters
+        self.top = 0             # Index into view of the first row shown
+        self.surfaces = {}       # Row index -> rendered surface, rows in view only
+        self.status_button.text = f"Status: {STATUS_NAMES[self.status_filter]}"
+        rule = "All" if self.rule_filter is None else self.job.rules[self.rule_filter]
+        self.rule_button.text = f"Rule: {rule}"
+        self.status_button.dirty = self.rule_button.dirty = True
+        self.refresh()
+
+    def refresh(self):
+        """Take in rows compiled since the last call"""
+        job = self.job
+        if job is None:
+            return
+        rows = len(job)
+        status, rule = self.status_filter, self.rule_filter
+        statuses, rule_ids = job.statuses, job.rule_ids
+        self.view.extend(row for row in range(self.scanned, rows)
+                         if (status is None or statuses[row] == status)
+                         and (rule is None or rule_ids[row] == rule))
+        self.scanned = rows
+        self.dirty = True
+
+    @property
+    def page_rows(self):
+        return self.clip_rect.height // self.ROW_HEIGHT
+
+    def visible_range(self):
+        """(first, last) indices into view of the rows shown, last exclusive"""
+        return self.top, min(len(self.view), self.top + self.page_rows + 1)
+
+    def cycle_status(self):
+        self.status_filter = STATUS_FILTERS[(STATUS_FILTERS.index(self.status_filter) + 1) % len(STATUS_FILTERS)]
+        self.reset_view()
+
+    def cycle_rule(self):
+        """All rules, then each rule seen so far in turn"""
+        rules = len(self.job.rules)
+        rule = 0 if self.rule_filter is None else self.rule_filter + 1
+        self.rule_filter = rule if rule < rules else None
+        self.reset_view()
+
+    def scroll_to(self, top):
+        top = max(0, min(top, len(self.view) - self.page_rows))
+        if top != self.top:
+            self.top = top
+            self.dirty = True
+
+    def select(self, index):
+        """Select view[index] (clamped) and scroll it into view; returns the row"""
+        if not self.view:
+            return None
+        index = max(0, min(index, len(self.view) - 1))
+        if index < self.top:
+            self.scroll_to(index)
+        elif index >= self.top + self.page_rows:
+            self.scroll_to(index - self.page_rows + 1)
+        self.selected = self.view[index]
+        self.dirty = True
+        return self.selected
+
+    def handle_event(self, event):
+        """Returns the newly selected row index, if the event selected one"""
+        if self.job is None:
+            return None
+        if self.status_button.handle_event(event):
+            self.cycle_status()
+        if self.rule_button.handle_event(event):
+            self.cycle_rule()
+        if self.status_button.dirty or self.rule_button.dirty:
+            self.dirty = True
+        if event.type == pygame.MOUSEWHEEL:
+            if self.rect.collidepoint(pygame.mouse.get_pos()):
+                self.scroll_to(self.top - event.y * 3)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if self.clip_rect.collidepoint(event.pos):
+                index = self.top + (event.pos[1] - self.clip_rect.y) // self.ROW_HEIGHT
+                if index < len(self.view):
+                    return self.select(index)
+        elif event.type == pygame.KEYDOWN and event.key in (pygame.K_UP, pygame.K_DOWN):
+            if self.selected is None:
+                return self.select(self.top)
+            # The view is sorted; the selection may have been filtered out of it
+            index = bisect_left(self.view, self.selected)
+            listed = index < len(self.view) and self.view[index] == self.selected
+            if event.key == pygame.K_UP:
+                return self.select(index - 1) if index > 0 else None
+            return self.select(index + 1 if listed else index)
+        return None
+
+    def title(self):
+        job = self.job
+        progress = "done" if job.done else f"{job.position * 100 // max(1, job.size)}%"
+        valid, invalid, errors = job.counts
+        return (f"{os.path.basename(job.path)}: {len(job)} rows ({progress}) "
+                f"{valid} ✓ {invalid} ✗ {errors} !")
+
+    def label(self, row):
+        """A row's text in the list: its line number in the file, reaction and rule"""
+        job = self.job
+        return f"{job.line_number(row):>7}  {job.line(row)[:70]:<70}  {job.rule(row)}"
+
+    def draw(self, screen):
+        pygame.draw.rect(screen, COLORS['surface'], self.rect, border_radius=6)
+        pygame.draw.rect(screen, COLORS['border'], self.rect, 2, border_radius=6)
+        if self.job is None:
+            return
+        title_surf = FONT_HEADING.render(self.title(), True, COLORS['text'])
+        screen.blit(title_surf, (self.rect.x + 10, self.rect.y + 10))
+        for button in (self.status_button, self.rule_button):
+            button.draw(screen)
+            button.dirty = False
+
+        screen.set_clip(self.clip_rect)
+        first, last = self.visible_range()
+        surfaces = {}
+        y = self.clip_rect.y
+        for index in range(first, last):
+            row = self.view[index]
+            if row == self.selected:
+                pygame.draw.rect(screen, COLORS['surface_light'],
+                                 (self.clip_rect.x, y, self.clip_rect.width, self.ROW_HEIGHT))
+            surface = self.surfaces.get(row)
+            if surface is None:
+                mark, color = self.MARKS[self.job.statuses[row]]
+                surface = FONT_CODE.render(f"{mark} {self.label(row)}", True, COLORS[color])
+            surfaces[row] = surface
+            screen.blit(surface, (self.rect.x + 10, y))
+            y += self.ROW_HEIGHT
+        self.surfaces = surfaces
+        screen.set_clip(None)
+
+        if len(self.view) > self.page_rows:
+            bar_height = max(20, self.clip_rect.height * self.page_rows / len(self.view))
+            bar_y = self.clip_rect.y + (self.clip_rect.height - bar_height) * self.top / (len(self.view) - self.page_rows)
+            pygame.draw.rect(screen, COLORS['text_dim'], (self.rect.right - 6, bar_y, 4, bar_height), border_radius=2)
+
 class CompilerGUI:
     """Main GUI application"""
     def __init__(self):
@@ -219,8 +799,11 @@ class CompilerGUI:
         init_fonts()
         
         # Compiler components
-        self.semantics = Semantics()
-        self.codegen = CodeGenerator()
+        self.worker = CompileWorker()
+        self.compiling = None  # (generation, text, start ticks, finished stages) while in flight
+        self.spinner_step = 0
+        self.spinner_at = 0
+        self.live_due = None  # Ticks at which the pending compile-as-you-type runs
         
         # Layout Config
         MARGIN = 20
@@ -253,27 +836,82 @@ class CompilerGUI:
         
         # Row 3: Output Code
         self.output_area = ScrollableTextArea(MARGIN, ROW3_Y, FULL_W, ROW3_H, "Generated Code Output")
+        # Batch mode swaps it for the batch list
+        self.batch_list = BatchList(MARGIN, ROW3_Y, FULL_W, ROW3_H)
+        self.batch = None  # BatchJob
+
+        # Everything that redraws itself when marked dirty
+        self.widgets = [self.input_box, self.compile_button, self.clear_button,
+                        self.stage1_area, self.stage2_area, self.stage3_area,
+                        self.stage4_area, self.stage5_area, self.output_area]
+        self.full_redraw = True  # First frame, or the window was exposed
+        self.stage_areas = dict(zip(STAGES, (self.stage1_area, self.stage2_area, self.stage3_area,
+                                             self.stage4_area, self.stage5_area)))
         
     def run(self):
-        """Main game loop"""
+        """Main loop, then shut pygame down"""
+        self.loop()
+        self.close_batch()
+        self.worker.stop()
+        pygame.quit()
+        sys.exit()
+
+    def loop(self):
+        """
+        Event-driven loop: block until an event arrives or the caret is due
+        to blink, then redraw only the widgets that marked themselves dirty.
+        An idle window sleeps in pygame.event.wait instead of rendering FPS
+        frames per second.
+        """
         while self.running:
-            self.handle_events()
+            timeout = self.next_wakeup(pygame.time.get_ticks())
+            event = pygame.event.wait(timeout) if timeout else pygame.event.wait()
+            events = pygame.event.get()
+            if event.type != pygame.NOEVENT:
+                events.insert(0, event)
+            self.handle_events(events)
             self.update()
             self.draw()
-            self.clock.tick(FPS)
-            
-        pygame.quit()
-        sys.exit()
-        
-    def handle_events(self):
+            self.clock.tick(FPS)  # Caps the rate during bursts such as mouse motion
+
+    def next_wakeup(self, now):
+        """Milliseconds until a timed redraw (caret blink, progress spinner), or None"""
+        waits = [self.input_box.next_blink(now)]
+        if self.compiling is not None:
+            waits.append(max(1, self.spinner_at + SPINNER_MS - now))
+        if self.live_due is not None:
+            waits.append(max(1, self.live_due - now))
+        waits = [wait for wait in waits if wait is not None]
+        return min(waits) if waits else None
+
+    def handle_events(self, events=None):
         """Handle all events"""
-        for event in pygame.event.get():
+        for event in events if events is not None else pygame.event.get():
             if event.type == pygame.QUIT:
                 self.running = False
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.full_redraw = True
+            elif event.type == COMPILE_PROGRESS:
+                if self.compiling and event.generation == self.compiling['generation']:
+                    self.compiling['done'].add(event.stage)
+            elif event.type == COMPILE_DONE:
+                if self.compiling and event.generation == self.compiling['generation']:
+                    self.compiling = None
+                    self.show_result(event.result, event.error)
+            elif event.type in (BATCH_PROGRESS, BATCH_DONE):
+                if event.job is self.batch:
+                    self.batch_list.refresh()
+            elif event.type == pygame.DROPFILE:
+                self.open_batch(event.file)
                 
-            # Handle input box
+            # Handle input box; editing supersedes a compile in flight
+            text = self.input_box.text
             if self.input_box.handle_event(event):
                 self.compile_reaction()
+            elif self.input_box.text != text:
+                if self.compiling is not None:
+                    self.cancel_compile("Cancelled: input changed")
+                self.live_due = pygame.time.get_ticks() + LIVE_DEBOUNCE_MS
                 
             # Handle buttons
             if self.compile_button.handle_event(event):
@@ -287,13 +925,44 @@ class CompilerGUI:
             self.stage3_area.handle_event(event)
             self.stage4_area.handle_event(event)
             self.stage5_area.handle_event(event)
-            self.output_area.handle_event(event)
+            if self.batch is None:
+                self.output_area.handle_event(event)
+            elif event.type != pygame.KEYDOWN or not self.input_box.active:
+                row = self.batch_list.handle_event(event)
+                if row is not None:
+                    self.show_text(self.batch.line(row))
             
     def update(self):
         """Update animations"""
-        self.input_box.update()
+        now = pygame.time.get_ticks()
+        self.input_box.update(now)
+        if self.live_due is not None and now >= self.live_due:
+            self.live_due = None
+            self.live_compile()
+        compiling = self.compiling
+        if (compiling is not None and now - compiling['started'] >= PROGRESS_DELAY_MS
+                and now - self.spinner_at >= SPINNER_MS):
+            self.spinner_at = now
+            self.spinner_step += 1
+            self.show_progress()
         
     def draw(self):
+        """Redraw dirty widgets (everything after an expose); returns the updated rects"""
+        if self.full_redraw:
+            self.draw_all()
+            return [self.screen.get_rect()]
+        rects = []
+        for widget in self.widgets:
+            if widget.dirty:
+                self.screen.fill(COLORS['bg'], widget.rect)
+                widget.draw(self.screen)
+                widget.dirty = False
+                rects.append(widget.rect)
+        if rects:
+            pygame.display.update(rects)
+        return rects
+
+    def draw_all(self):
         """Draw everything"""
         self.screen.fill(COLORS['bg'])
         
@@ -301,151 +970,193 @@ class CompilerGUI:
         title_surf = FONT_TITLE.render("Chemical Reaction Compiler", True, COLORS['text'])
         self.screen.blit(title_surf, (20, 15))
         
-        # Draw UI components
-        self.input_box.draw(self.screen)
-        self.compile_button.draw(self.screen)
-        self.clear_button.draw(self.screen)
-        
-        # Draw output areas
-        self.stage1_area.draw(self.screen)
-        self.stage2_area.draw(self.screen)
-        self.stage3_area.draw(self.screen)
-        self.stage4_area.draw(self.screen)
-        self.stage5_area.draw(self.screen)
-        self.output_area.draw(self.screen)
+        # Draw UI components and output areas
+        for widget in self.widgets:
+            widget.draw(self.screen)
+            widget.dirty = False
         
         pygame.display.flip()
+        self.full_redraw = False
         
-    def compile_reaction(self):
-        """Compile the reaction and display results"""
-        text = self.input_box.text.strip()
+    def compile_reaction(self, text=None):
+        """
+        Start compiling text (default: the input) in the worker process;
+        show_result() displays it. Text already in flight isn't sent again,
+        and the process answers text it has compiled before (Enter after
+        compile-as-you-type) from its compile cache.
+        """
+        text = (self.input_box.text if text is None else text).strip()
         if not text:
             return
-            
+        if self.compiling is not None and self.compiling['text'] == text:
+            return
+        generation = self.worker.submit(text)
+        self.compiling = {'generation': generation, 'text': text, 'started': pygame.time.get_ticks(),
+                          'done': set(), 'shown': False}
+
+    def live_compile(self):
+        self.show_text(self.input_box.text.strip())
+
+    def show_text(self, text):
+        """Compile text in the worker process and show it when done (clears the panels if empty)"""
+        if text:
+            self.compile_reaction(text)
+            return
+        self.cancel_compile("")
+        self.clear_panels()
+
+    def clear_panels(self):
+        for area in self.stage_areas.values():
+            area.set_content("")
+        self.output_area.set_content("")
+
+    def open_batch(self, path):
+        """Start compiling a reaction file into the batch list; False if it can't be opened"""
+        self.close_batch()
         try:
-            # Stage 1: Lexical Analysis
-            lexer = Lexer(text)
-            tokens = lexer.tokenize()
-            
-            lines = []
-            for i, token in enumerate(tokens):
-                if token.type != 'EOF':
-                    lines.append((f"{i+1}. {token}", COLORS['text']))
-            self.stage1_area.add_colored_lines(lines)
-            
-            # Stage 2: Syntax Analysis
-            parser = Parser(tokens)
-            reaction = parser.parse()
-            
-            lines = [
-                (f"R: {len(reaction.reactants)} mols", COLORS['success']),
-            ]
-            for r in reaction.reactants:
-                lines.append((f" • {r}", COLORS['text']))
-            
-            lines.append((f"P: {len(reaction.products)} mols", 
-                         COLORS['success'] if reaction.products else COLORS['warning']))
-            if reaction.products:
-                for p in reaction.products:
-                    lines.append((f" • {p}", COLORS['text']))
-            else:
-                 lines.append((" (predicting...)", COLORS['text_dim']))
-            self.stage2_area.add_colored_lines(lines)
-            
-            # Stage 3: Semantic Analysis
-            lines = []
-            if not reaction.products:
-                predicted_products, rule = self.semantics.predict_products(reaction.reactants)
-                if predicted_products:
-                    reaction.products = predicted_products
-                    lines.append(("✓ Prediction OK", COLORS['success']))
-                    lines.append((f"Rule: {rule}", COLORS['text_dim']))
-                    lines.append(("Result:", COLORS['text']))
-                    for p in predicted_products:
-                        lines.append((f" • {p}", COLORS['text']))
-                else:
-                    lines.append(("✗ Low Confidence", COLORS['error']))
-                    lines.append((f"Reason: {rule}", COLORS['text_dim']))
-            else:
-                lines.append(("✓ Input Products OK", COLORS['success']))
-                
-            self.stage3_area.add_colored_lines(lines)
-            
-            # Stage 4: Validation
-            is_valid, msg = self.semantics.validate_reaction(reaction)
-            
-            lines = []
-            if is_valid:
-                lines.append(("✓ PASS", COLORS['success']))
-            else:
-                lines.append(("✗ FAIL", COLORS['error']))
-            lines.append((msg, COLORS['text']))
-            
-            self.stage4_area.add_colored_lines(lines)
-            
-            # Stage 5: Code Generation
-            if is_valid and reaction.products:
-                generated_code = self.codegen.generate(reaction)
-                
-                lines = [
-                    ("Generation Complete!", COLORS['success']),
-                    ("Outputs:", COLORS['text_dim']),
-                    (" • Python Code", COLORS['text']),
-                    (" • Balanced Eq", COLORS['text']),
-                ]
-                self.stage5_area.add_colored_lines(lines)
-                
-                # Display generated code
-                output_lines = [
-                    ("--- PYTHON CODE ---", COLORS['primary']),
-                ]
-                
-                for line in generated_code['python'].split('\n'):
-                    output_lines.append((line, COLORS['text']))
-                
-                output_lines.extend([
-                    ("", COLORS['text']),
-                    ("--- BALANCED EQUATION ---", COLORS['primary']),
-                ])
-                
-                for line in generated_code['balanced'].split('\n'):
-                    output_lines.append((line, COLORS['success']))
-                
+            job = BatchJob(path)
+        except OSError as e:
+            self.output_area.set_content(f"Cannot open {path}: {e}", COLORS['error'])
+            return False
+        self.batch = job
+        self.batch_list.set_job(job)
+        self.widgets[self.widgets.index(self.output_area)] = self.batch_list
+        self.full_redraw = True
+        return True
+
+    def close_batch(self):
+        if self.batch is None:
+            return
+        self.batch.close()
+        self.batch = None
+        self.batch_list.set_job(None)
+        self.widgets[self.widgets.index(self.batch_list)] = self.output_area
+        self.full_redraw = True
 
-                self.output_area.add_colored_lines(output_lines)
+    def cancel_compile(self, reason):
+        """Drop the compile in flight; panels showing its progress say why"""
+        self.worker.cancel()
+        shown = self.compiling is not None and self.compiling['shown']
+        self.compiling = None
+        if shown:
+            for area in self.stage_areas.values():
+                area.set_content(reason, COLORS['text_dim'])
+            self.output_area.set_content(reason, COLORS['text_dim'])
+
+    def show_progress(self):
+        """Spinner in the panels of stages still running (compiles slower than PROGRESS_DELAY_MS)"""
+        self.compiling['shown'] = True
+        spin = SPINNER[self.spinner_step % len(SPINNER)]
+        for stage, area in self.stage_areas.items():
+            if stage in self.compiling['done']:
+                area.add_colored_lines([("✓ Done", COLORS['success'])])
             else:
-                lines = [
-                    ("Skipped", COLORS['warning']),
-                    ("Fix validation errors first", COLORS['text_dim']),
-                ]
-                self.stage5_area.add_colored_lines(lines)
-                self.output_area.set_content("No code generated.", COLORS['error'])
-                
-        except SyntaxError as e:
-            error_msg = f"Syntax Error: {str(e)}"
+                area.add_colored_lines([(f"{spin} Compiling...", COLORS['text_dim'])])
+        self.output_area.add_colored_lines([(f"{spin} Compiling...", COLORS['text_dim'])])
+
+    def show_result(self, result, error):
+        """Display a finished compile (a chem_pipeline CompileResult, or the exception it raised)"""
+        if isinstance(error, SyntaxError):
+            error_msg = f"Syntax Error: {str(error)}"
             self.stage1_area.set_content(error_msg, COLORS['error'])
             self.stage2_area.set_content("Parsing failed", COLORS['error'])
             self.stage3_area.set_content("-", COLORS['text_dim'])
             self.stage4_area.set_content("-", COLORS['text_dim'])
             self.stage5_area.set_content("-", COLORS['text_dim'])
             self.output_area.set_content("Compilation failed.", COLORS['error'])
-        except Exception as e:
-            error_msg = f"Error: {str(e)}"
-            self.output_area.set_content(error_msg, COLORS['error'])
+            return
+        if error is not None:
+            self.output_area.set_content(f"Error: {str(error)}", COLORS['error'])
+            return
+
+        # Panel lines are formatted lazily (LazyLines): one per token or molecule
+        numbered = lambda i, token: f"{i+1}. {token}"
+        bullet = lambda i, molecule: f" • {molecule}"
+
+        # Stage 1: Lexical Analysis
+        tokens = result.tokens
+        if tokens and tokens[-1].type == 'EOF':
+            tokens = tokens[:-1]
+        self.stage1_area.add_colored_lines(LazyLines((tokens, numbered, COLORS['text'])))
+
+        # Stage 2: Syntax Analysis (as parsed, before any prediction)
+        reaction = result.reaction
+        given_products = [] if result.predicted else reaction.products
+        lines = LazyLines(
+            [(f"R: {len(reaction.reactants)} mols", COLORS['success'])],
+            (reaction.reactants, bullet, COLORS['text']),
+            [(f"P: {len(given_products)} mols", COLORS['success'] if given_products else COLORS['warning'])],
+            (given_products, bullet, COLORS['text']) if given_products
+            else [(" (predicting...)", COLORS['text_dim'])],
+        )
+        self.stage2_area.add_colored_lines(lines)
+
+        # Stage 3: Semantic Analysis
+        if result.predicted:
+            lines = LazyLines([("✓ Prediction OK", COLORS['success']),
+                               (f"Rule: {result.rule}", COLORS['text_dim']),
+                               ("Result:", COLORS['text'])],
+                              (reaction.products, bullet, COLORS['text']))
+        elif not given_products:
+            lines = [("✗ Low Confidence", COLORS['error']),
+                     (f"Reason: {result.rule}", COLORS['text_dim'])]
+        else:
+            lines = [("✓ Input Products OK", COLORS['success'])]
+        self.stage3_area.add_colored_lines(lines)
+
+        # Stage 4: Validation
+        lines = []
+        if result.valid:
+            lines.append(("✓ PASS", COLORS['success']))
+        else:
+            lines.append(("✗ FAIL", COLORS['error']))
+        lines.append((result.message, COLORS['text']))
+        self.stage4_area.add_colored_lines(lines)
+
+        # Stage 5: Code Generation
+        if result.outputs is not None:
+            generated_code = result.outputs
+            lines = [
+                ("Generation Complete!", COLORS['success']),
+                ("Outputs:", COLORS['text_dim']),
+                (" • Python Code", COLORS['text']),
+                (" • Balanced Eq", COLORS['text']),
+            ]
+            self.stage5_area.add_colored_lines(lines)
+
+            # Display generated code
+            same = lambda i, line: line
+            output_lines = LazyLines(
+                [("--- PYTHON CODE ---", COLORS['primary'])],
+                (generated_code['python'].split('\n'), same, COLORS['text']),
+                [("", COLORS['text']),
+                 ("--- BALANCED EQUATION ---", COLORS['primary'])],
+                (generated_code['balanced'].split('\n'), same, COLORS['success']),
+            )
+            self.output_area.add_colored_lines(output_lines)
+        else:
+            lines = [
+                ("Skipped", COLORS['warning']),
+                ("Fix validation errors first", COLORS['text_dim']),
+            ]
+            self.stage5_area.add_colored_lines(lines)
+            self.output_area.set_content("No code generated.", COLORS['error'])
             
     def clear_all(self):
         """Clear all outputs"""
+        self.cancel_compile("")
+        self.close_batch()
+        self.live_due = None
         self.input_box.text = ""
-        self.stage1_area.set_content("")
-        self.stage2_area.set_content("")
-        self.stage3_area.set_content("")
-        self.stage4_area.set_content("")
-        self.stage5_area.set_content("")
-        self.output_area.set_content("")
+        self.clear_panels()
 
-def main():
-    """Main entry point"""
+def main(argv=None):
+    """Main entry point; an optional argument is a reaction file to open in batch mode"""
+    argv = sys.argv[1:] if argv is None else argv
+    pygame.init()  # Here rather than at import, so importing the module stays cheap
     app = CompilerGUI()
+    if argv:
+        app.open_batch(argv[0])
     app.run()
 
 if __name__ == "__main__":
@@ -1,11 +1,68 @@
 # main.py
 import sys
-from chem_lexer import Lexer
-from chem_parser import Parser
-from chem_semantics import Semantics
-from chem_codegen import CodeGenerator
+from chem_pipeline import Pipeline, Collector, StatsCollector
 
-def main():
+class StageBanner(Collector):
+    """Prints each stage's output as the interactive driver always has"""
+
+    def before(self, stage, result):
+        if stage == 'predict':
+            print("[STAGE 3: SEMANTICS] Predicting products...")
+        elif stage == 'codegen':
+            print(f"\n[STAGE 5: CODE GENERATION] Generating executable code...")
+
+    def after(self, stage, result, elapsed_ns):
+        if result.error is not None:
+            return
+        if stage == 'lex':
+            print(f"[STAGE 1: LEXER] Tokens: {result.tokens}")
+        elif stage == 'parse':
+            print(f"[STAGE 2: PARSER] Parsed Structure: {result.reaction}")
+            if result.reaction.products:
+                print(f"[STAGE 3: SEMANTICS] Products provided: {' + '.join(str(p) for p in result.reaction.products)}")
+        elif stage == 'predict':
+            if result.predicted:
+                print(f"[STAGE 3: SEMANTICS] Matched Rule: {result.rule}")
+                print(f"[STAGE 3: SEMANTICS] Predicted Reaction: {result.reaction}")
+            else:
+                print(f"[STAGE 3: SEMANTICS] No prediction rule matched.")
+                print(f"[STAGE 3: SEMANTICS] Reason: {result.rule}")
+        elif stage == 'validate':
+            status = "✓ PASS" if result.valid else "✗ FAIL"
+            print(f"[STAGE 4: VALIDATOR] {status} - {result.message}")
+        elif stage == 'codegen':
+            generated_code = result.outputs
+            print(f"\n[RESULT] Final Balanced Reaction: {result.reaction}")
+            print("\n" + "=" * 60)
+            print("GENERATED CODE OUTPUTS:")
+            print("=" * 60)
+
+            # Show Python Code
+            print("\n📄 Python Code:")
+            print("-" * 60)
+            print(generated_code['python'])
+
+            # Show Balanced Equation
+            print("\n⚖️  Balanced Equation:")
+            print("-" * 60)
+            print(generated_code['balanced'])
+
+            # Show IR Code
+            print("\n🔧 Intermediate Representation (IR):")
+            print("-" * 60)
+            print(generated_code['ir'])
+
+            # Optionally show assembly (commented out by default)
+            # print("\n⚙️  Assembly Code:")
+            # print("-" * 60)
+            # print(generated_code['assembly'])
+
+            print("\n" + "=" * 60)
+            print("✓ Compilation Complete!")
+            print("=" * 60)
+
+
+def main(stats=None, memprofile=None):
     print("=" * 60)
     print("Chemical Reaction Compiler (Full Pipeline)")
     print("=" * 60)
@@ -15,9 +72,12 @@ def main():
     print("\nType a reaction (e.g., 'HCl + NaOH') or 'exit' to quit.")
     print("Examples: Na + Cl | CH4 + O2 | HCl + NaOH -> NaCl + H2O")
     print("=" * 60)
-    
-    semantics = Semantics()
-    codegen = CodeGenerator()
+
+    pipeline = Pipeline(collectors=[StageBanner()])
+    if stats is not None:
+        pipeline.add_collector(stats)
+    if memprofile is not None:
+        pipeline.add_collector(memprofile)
 
     while True:
         try:
@@ -30,73 +90,11 @@ def main():
                 continue
 
             print("\n" + "-" * 60)
-            
-            # 1. Lexical Analysis
-            lexer = Lexer(text)
-            tokens = lexer.tokenize()
-            print(f"[STAGE 1: LEXER] Tokens: {tokens}")
-
-            # 2. Syntax Analysis
-            parser = Parser(tokens)
-            reaction = parser.parse()
-            print(f"[STAGE 2: PARSER] Parsed Structure: {reaction}")
-
-            # 3. Semantic Analysis & Prediction
-            # If products are missing, try to predict them
-            if not reaction.products:
-                print("[STAGE 3: SEMANTICS] Predicting products...")
-                predicted_products, rule = semantics.predict_products(reaction.reactants)
-                if predicted_products:
-                    reaction.products = predicted_products
-                    print(f"[STAGE 3: SEMANTICS] Matched Rule: {rule}")
-                    print(f"[STAGE 3: SEMANTICS] Predicted Reaction: {reaction}")
-                else:
-                    print(f"[STAGE 3: SEMANTICS] No prediction rule matched.")
-                    print(f"[STAGE 3: SEMANTICS] Reason: {rule}")
-            else:
-                print(f"[STAGE 3: SEMANTICS] Products provided: {' + '.join(str(p) for p in reaction.products)}")
-            
-            # 4. Validation
-            is_valid, msg = semantics.validate_reaction(reaction)
-            status = "✓ PASS" if is_valid else "✗ FAIL"
-            print(f"[STAGE 4: VALIDATOR] {status} - {msg}")
-            
-            # 5. Code Generation (NEW!)
-            if is_valid and reaction.products:
-                print(f"\n[STAGE 5: CODE GENERATION] Generating executable code...")
-                generated_code = codegen.generate(reaction)
-                
-                print(f"\n[RESULT] Final Balanced Reaction: {reaction}")
-                print("\n" + "=" * 60)
-                print("GENERATED CODE OUTPUTS:")
-                print("=" * 60)
-                
-                # Show Python Code
-                print("\n📄 Python Code:")
-                print("-" * 60)
-                print(generated_code['python'])
-                
-                # Show Balanced Equation
-                print("\n⚖️  Balanced Equation:")
-                print("-" * 60)
-                print(generated_code['balanced'])
-                
-                # Show IR Code
-                print("\n🔧 Intermediate Representation (IR):")
-                print("-" * 60)
-                print(generated_code['ir'])
-                
-                # Optionally show assembly (commented out by default)
-                # print("\n⚙️  Assembly Code:")
-                # print("-" * 60)
-                # print(generated_code['assembly'])
-                
-                print("\n" + "=" * 60)
-                print("✓ Compilation Complete!")
-                print("=" * 60)
-            
+            pipeline.compile(text)
             print("-" * 60)
 
+        except EOFError:
+            break
         except SyntaxError as e:
             print(f"\n[SYNTAX ERROR] {e}")
             print("Please check your input format.")
@@ -105,5 +103,94 @@ def main():
             import traceback
             traceback.print_exc()
 
+    if stats is not None:
+        print("\n" + stats.format())
+    if memprofile is not None:
+        print("\n" + memprofile.finish().format())
+
+STATS_STYLES = ('text', 'json', 'prometheus')
+
+# The command-line options, as argparse.add_argument keyword arguments.
+# parse_args reads the same table, so the two parsers can't drift apart.
+OPTIONS = {
+    '--batch': dict(metavar='FILE', help="compile every line of FILE instead of prompting"),
+    '--workers': dict(type=int, default=1, help="worker processes for --batch"),
+    '--stats': dict(choices=STATS_STYLES, nargs='?', const='text',
+                    help="print per-stage timings and counters"),
+    '--memprofile': dict(action='store_true',
+                         help="report per-stage peak memory and allocation sites (tracemalloc)"),
+    '--warm-state': dict(metavar='FILE',
+                         help="with --batch, restore compiler caches from a chem_warmstate snapshot"),
+}
+
+
+def parse_args(argv):
+    """
+    Command-line options as a dict. Well-formed command lines are parsed
+    by hand from OPTIONS, since importing argparse (and with it re and
+    gettext) costs more than the rest of startup; anything else (--help,
+    abbreviations, a bad value) goes to argparse for its usage and error
+    messages.
+    """
+    args = {}
+    for flag, spec in OPTIONS.items():
+        store_true = spec.get('action') == 'store_true'
+        args[flag[2:].replace('-', '_')] = spec.get('default', False if store_true else None)
+    i = 0
+    while i < len(argv):
+        spec = OPTIONS.get(argv[i])
+        if spec is None:
+            return _parse_args_full(argv)
+        dest = argv[i][2:].replace('-', '_')
+        following = argv[i + 1] if i + 1 < len(argv) else None
+        if spec.get('action') == 'store_true':
+            value = True
+        elif spec.get('nargs') == '?' and following not in spec.get('choices', (following,)):
+            value = spec['const']
+        elif following is None or following.startswith('-'):
+            return _parse_args_full(argv)
+        else:
+            i += 1
+            try:
+                value = spec.get('type', str)(following)
+            except ValueError:
+                return _parse_args_full(argv)
+            if value not in spec.get('choices', (value,)):
+                return _parse_args_full(argv)
+        args[dest] = value
+        i += 1
+    if _check_args(args) is not None:
+        return _parse_args_full(argv)
+    return args
+
+
+def _check_args(args):
+    """Error message for option combinations argparse can't express, or None"""
+    if args['stats'] in ('json', 'prometheus') and not args['batch']:
+        return "--stats json/prometheus is only available with --batch"
+    return None
+
+
+def _parse_args_full(argv):
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="Chemical Reaction Compiler")
+    for flag, spec in OPTIONS.items():
+        arg_parser.add_argument(flag, **spec)
+    args = vars(arg_parser.parse_args(argv))
+    error = _check_args(args)
+    if error is not None:
+        arg_parser.error(error)
+    return args
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args(sys.argv[1:])
+    if args['batch']:
+        from chem_batch import run as batch_run
+        sys.exit(batch_run(args['batch'], args['workers'], args['stats'], args['memprofile'],
+                           args['warm_state']))
+    memprofile = None
+    if args['memprofile']:
+        from chem_memprofile import MemoryProfiler  # tracemalloc is only loaded when asked for
+        memprofile = MemoryProfiler(sample_every=1)
+    main(StatsCollector() if args['stats'] else None, memprofile)
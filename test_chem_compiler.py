@@ -5,9 +5,37 @@ Tests lexer, parser, and semantic analysis components
 """
 
 import unittest
+from unittest import mock
 from chem_lexer import Lexer, TOKEN_ELEMENT, TOKEN_NUMBER, TOKEN_PLUS, TOKEN_ARROW, TOKEN_EOF
-from chem_parser import Parser, Molecule, Reaction
+from chem_parser import Parser, Molecule, Reaction, check, try_parse
+from chem_errors import ERR_INVALID_CHAR, ERR_UNEXPECTED_TOKEN
 from chem_semantics import Semantics
+from chem_dedup import ReactionDeduplicator
+from chem_index import ReactionIndex, intersect_sorted
+from chem_network import NetworkExpander
+from chem_semantics import PAIR_RULE_TAGS, SINGLE_RULE_TAGS
+from chem_retro import RetroSearch, CostModel
+from chem_mass import mass_balance, moles_to_grams
+from chem_store import ReactionStore
+from chem_matrix import export_matrices, read_npy
+from chem_bulk_lexer import tokenize_buffer
+import chem_batch
+from chem_batch import compile_buffer, compile_file, split_ranges
+from chem_server import CompileServer, CompileClient
+from chem_codegen import CodeGenerator
+from chem_pipeline import Pipeline, Collector, StatsCollector, STAGES
+from chem_memprofile import MemoryProfiler
+import bench_suite
+from chem_corpus import CorpusGenerator, write_corpus
+import bench_startup
+import chem_warmstate
+from chem_parser import INTERNED_MOLECULES
+from chem_incremental import IncrementalCompiler
+from chem_lsp import Document, LineAnalyzer, LspClient
+try:
+    import gui_compiler  # Needs pygame, which is optional
+except ImportError:
+    gui_compiler = None
 
 
 class TestLexer(unittest.TestCase):
@@ -93,6 +121,1182 @@ class TestParser(unittest.TestCase):
         self.assertIn('O', element_symbols)
         self.assertIn('H', element_symbols)
 
+    def test_parse_nested_groups(self):
+        """Test parsing nested parentheses and brackets"""
+        lexer = Lexer("K4[Fe(CN)6]")
+        molecule = Parser(lexer.tokenize()).parse().reactants[0]
+        self.assertEqual(molecule.get_counts(), {'K': 4, 'Fe': 1, 'C': 6, 'N': 6})
+
+        lexer = Lexer("(NH4)2(Fe(SO4)2)")
+        molecule = Parser(lexer.tokenize()).parse().reactants[0]
+        self.assertEqual(molecule.get_counts(), {'N': 2, 'H': 8, 'Fe': 1, 'S': 2, 'O': 8})
+
+    def test_parse_deep_nesting(self):
+        """Test that nesting deeper than the recursion limit parses"""
+        import sys
+        depth = sys.getrecursionlimit() * 2
+        lexer = Lexer("(" * depth + "H" + ")2" * depth)
+        molecule = Parser(lexer.tokenize()).parse().reactants[0]
+        self.assertEqual(molecule.get_counts(), {'H': 2 ** depth})
+
+    def test_parse_mismatched_group(self):
+        """Test that mismatched or unclosed groups raise errors"""
+        for text in ("Ca(OH]", "Ca(OH", "Ca()", "[Fe(CN)6"):
+            with self.assertRaises(SyntaxError):
+                Parser(Lexer(text).tokenize()).parse()
+
+
+class TestCheck(unittest.TestCase):
+    """Test the non-raising validation fast path"""
+
+    def test_valid_input(self):
+        """Test that well-formed reactions report no error"""
+        self.assertIsNone(check("HCl + NaOH -> NaCl + H2O"))
+        reaction, error = try_parse("K4[Fe(CN)6]")
+        self.assertIsNone(error)
+        self.assertEqual(len(reaction.reactants), 1)
+
+    def test_error_code_and_position(self):
+        """Test that errors carry a code and a character position"""
+        error = check("H2O@")
+        self.assertEqual(error.code, ERR_INVALID_CHAR)
+        self.assertEqual(error.pos, 3)
+        error = check("H₂O")  # Subscript digits are not numbers
+        self.assertEqual(error.code, ERR_INVALID_CHAR)
+        self.assertEqual(error.pos, 1)
+        error = check("Ca(OH -> CaO")
+        self.assertEqual(error.code, ERR_UNEXPECTED_TOKEN)
+        self.assertEqual(error.pos, 6)
+
+    def test_messages_match_raising_mode(self):
+        """Test that lazy messages equal the SyntaxError messages"""
+        for text in ("H2O@", "A - B", "Ca()", "Ca(OH", "H)2", "+", "HCl + -> "):
+            with self.assertRaises(SyntaxError) as context:
+                Parser(Lexer(text).tokenize()).parse()
+            self.assertEqual(check(text).message, str(context.exception))
+
+
+class TestCanonical(unittest.TestCase):
+    """Test canonical forms, hashing and deduplication"""
+
+    def parse(self, text):
+        return Parser(Lexer(text).tokenize()).parse()
+
+    def test_hill_order(self):
+        """Test Hill-order canonical formulas"""
+        self.assertEqual(self.parse("CH3COOH").reactants[0].canonical(), "C2H4O2")
+        self.assertEqual(self.parse("NaOH").reactants[0].canonical(), "HNaO")
+        self.assertEqual(self.parse("Ca(OH)2").reactants[0], self.parse("CaH2O2").reactants[0])
+
+    def test_reaction_order_insensitive(self):
+        """Test that species order and spacing don't affect equality"""
+        a = self.parse("HCl + NaOH -> NaCl + H2O")
+        b = self.parse("NaOH+HCl   ->  H2O + NaCl")
+        self.assertEqual(a, b)
+        self.assertEqual(a.canonical_hash(), b.canonical_hash())
+        self.assertEqual(len({a, b}), 1)
+        self.assertNotEqual(a, self.parse("HCl + NaOH"))
+        self.assertLess(a.canonical_hash(bits=128), 2 ** 128)
+
+    def test_dedup_in_memory_and_spilled(self):
+        """Test that spilling to disk gives the same counts"""
+        lines = ["HCl + NaOH", "NaOH + HCl", "Na + Cl", "bad@", "", "CH4 + O2",
+                 "O2 + CH4", "Cl + Na", "HCl+NaOH"] * 3
+        expected = {"HCl + NaOH": 9, "Na + Cl": 6, "CH4 + O2": 6}
+        for max_in_memory in (100, 1):
+            dedup = ReactionDeduplicator(max_in_memory=max_in_memory, partitions=4)
+            dedup.add_lines(lines)
+            self.assertEqual(dedup.spilled, max_in_memory == 1)
+            self.assertEqual(dict(dedup.results()), expected)
+            self.assertEqual(dedup.invalid, 3)
+
+
+class TestReactionIndex(unittest.TestCase):
+    """Test the inverted species/element index"""
+
+    def setUp(self):
+        self.index = ReactionIndex()
+        for text in ("CH4 + O2 -> CO2 + H2O", "Fe + O2 -> Fe2O3", "C + O2 -> CO2",
+                     "FeS + HCl -> FeCl2 + H2S", "Na + Cl"):
+            self.index.add_text(text)
+
+    def test_species_and_element_queries(self):
+        """Test queries by species, element and side"""
+        self.assertEqual(self.index.query(produces=["CO2"]), [0, 2])
+        self.assertEqual(self.index.query(consumes_elements=["Fe"]), [1, 3])
+        self.assertEqual(self.index.query(produces=["CO2"], consumes=["CH4"]), [0])
+        self.assertEqual(self.index.query(produces=["CO2"], consumes_elements=["Fe"]), [])
+        self.assertEqual(self.index.query(consumes=["ClH"]), [3])
+
+    def test_incremental_ids_and_round_trip(self):
+        """Test explicit IDs and save/load"""
+        import os, tempfile
+        self.assertEqual(self.index.add_text("C + O2 -> CO2", reaction_id=10), 10)
+        with self.assertRaises(ValueError):
+            self.index.add_text("C + O2 -> CO2", reaction_id=3)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "reactions.idx")
+            self.index.save(path)
+            loaded = ReactionIndex.load(path)
+        self.assertEqual(len(self.index), 6)  # IDs 5-9 were skipped
+        self.assertEqual(len(loaded), 6)
+        self.assertEqual(loaded.query(), [0, 1, 2, 3, 4, 10])
+        self.assertEqual(loaded.query(produces=["CO2"]), [0, 2, 10])
+        self.assertEqual(loaded.add_text("Na + Cl"), 11)
+
+    def test_loads_version_1_files(self):
+        """Test loading an index saved before the ID list was stored"""
+        import os, struct, tempfile
+        import chem_index
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "reactions.idx")
+            self.index.save(path)
+            with open(path, 'rb') as f:
+                data = f.read()
+            header = len(chem_index.INDEX_MAGIC) + 16 + 5 * 8  # next_id, ID count, 5 IDs
+            with open(path, 'wb') as f:
+                f.write(chem_index.INDEX_MAGIC_V1 + struct.pack('<q', 5) + data[header:])
+            loaded = ReactionIndex.load(path)
+        self.assertEqual(loaded.query(), [0, 1, 2, 3, 4])
+        self.assertEqual(loaded.query(consumes_elements=["Fe"]), [1, 3])
+
+    def test_intersect_sorted(self):
+        """Test both intersection strategies"""
+        large = list(range(0, 1000, 3))
+        self.assertEqual(intersect_sorted([3, 4, 999], large), [3, 999])
+        self.assertEqual(intersect_sorted(list(range(0, 1000, 2)), large), list(range(0, 1000, 6)))
+
+
+class TestNetwork(unittest.TestCase):
+    """Test reaction network expansion"""
+
+    SPECIES = ["Na", "Mg", "Al", "Cl2", "H2", "O2", "CH4", "C2H6", "HCl", "NaOH",
+               "KClO3", "CaCO3", "H2O", "NaCl", "Fe", "S"]
+
+    def test_expansion(self):
+        """Test that products are fed back in and depth is tracked"""
+        network = NetworkExpander().expand(["Na", "Cl2", "H2", "O2"], max_depth=2)
+        self.assertIn("ClNa", network.species)
+        self.assertIn("H2O", network.species)
+        self.assertEqual(network.depth["Na"], 0)
+        self.assertEqual(network.depth["Na2O"], 1)
+        # Na2O decomposes at depth 2, giving Na2
+        self.assertEqual(network.depth["Na2"], 2)
+        rules = {rule for _, rule in network.reactions}
+        self.assertIn("Synthesis", rules)
+        self.assertIn("Combustion (Hydrogen)", rules)
+
+    def test_limits_and_memo(self):
+        """Test the species limit and memoization across runs"""
+        expander = NetworkExpander()
+        network = expander.expand(self.SPECIES, max_depth=3, max_species=20)
+        self.assertTrue(network.truncated)
+        self.assertEqual(len(network.species), 20)
+        predictions = expander.stats['predictions']
+        expander.expand(self.SPECIES, max_depth=3, max_species=20)
+        self.assertEqual(expander.stats['predictions'], predictions)
+
+    def test_signature_pruning_is_sound(self):
+        """Test that every set a rule matches passes the signature filter"""
+        semantics = Semantics()
+        molecules = [Parser(Lexer(s).tokenize()).parse_molecule() for s in self.SPECIES]
+        pairs = {frozenset(p) for p in PAIR_RULE_TAGS}
+        for a in molecules:
+            products, _ = semantics.predict_products([a])
+            if products:
+                self.assertTrue(semantics.signature(a) & set(SINGLE_RULE_TAGS))
+            for b in molecules:
+                products, _ = semantics.predict_products([a, b])
+                if products:
+                    self.assertTrue(any(frozenset((x, y)) in pairs
+                                        for x in semantics.signature(a)
+                                        for y in semantics.signature(b)), f"{a} + {b}")
+
+
+class TestRetroSearch(unittest.TestCase):
+    """Test reverse search from a target species"""
+
+    def test_single_step_synthesis(self):
+        """Test that Al2O3 comes from its elements"""
+        routes = RetroSearch().search("Al2O3")
+        self.assertEqual(len(routes), 1)
+        reaction, rule = routes[0].steps[0]
+        self.assertEqual(rule, "Synthesis")
+        self.assertEqual(str(reaction), "Al + O2 -> Al2O3")
+        self.assertEqual(routes[0].reagents, ["Al", "O2"])
+
+    def test_cost_model_prefers_available_reagents(self):
+        """Test that cheap reagents change the best route"""
+        search = RetroSearch(pool=["HCl", "NaOH"])
+        best = search.search("NaCl")[0]
+        self.assertEqual(best.steps[0][1], "Acid-Base Neutralization")
+        best = search.search("NaCl", CostModel(element_cost=0))[0]
+        self.assertEqual(best.steps[0][1], "Synthesis")
+
+    def test_multi_step_route_matches_forward_rules(self):
+        """Test that every step of a route is confirmed by predict_products"""
+        semantics = Semantics()
+        routes = RetroSearch(semantics).search("Na2", max_routes=2)
+        self.assertGreater(len(routes[0].steps), 1)
+        for route in routes:
+            for reaction, rule in route.steps:
+                products, predicted_rule = semantics.predict_products(reaction.reactants)
+                self.assertEqual(predicted_rule, rule)
+                self.assertEqual(products, reaction.products)
+
+    def test_node_budget(self):
+        """Test that unreachable targets stop within the budget"""
+        search = RetroSearch()
+        self.assertEqual(search.search("CaCO3", max_nodes=50), [])
+        self.assertLessEqual(search.stats['expanded'], 50)
+
+
+class TestMass(unittest.TestCase):
+    """Test molar masses and batch mass balance"""
+
+    def parse(self, text):
+        return Parser(Lexer(text).tokenize()).parse()
+
+    def test_molar_mass(self):
+        """Test cached molar masses and interning"""
+        water = self.parse("H2O").reactants[0]
+        self.assertAlmostEqual(water.molar_mass(), 18.015, places=3)
+        self.assertAlmostEqual(moles_to_grams(water, 2), 36.03, places=2)
+        # The same species parsed twice is one interned object
+        self.assertIs(self.parse("H2O + Na").reactants[0], water)
+        self.assertNotEqual(self.parse("Xx").reactants[0].molar_mass(),
+                            self.parse("Xx").reactants[0].molar_mass())  # NaN
+
+    def test_mass_balance(self):
+        """Test per-reaction totals, extents and conservation error"""
+        reactions = [self.parse("HCl + NaOH -> NaCl + H2O"), self.parse("H2 + O2 -> H2O"),
+                     self.parse("Na + Cl")]
+        balance = mass_balance(reactions, extents=[1.0, 2.0, 1.0], use_numpy=False)
+        self.assertEqual(len(balance), 3)
+        self.assertAlmostEqual(balance.reactants[0], 76.455, places=3)
+        self.assertAlmostEqual(balance.error[0], 0.0, places=9)
+        self.assertAlmostEqual(balance.error[1], -2 * 15.999, places=6)
+        self.assertEqual(balance.products[2], 0.0)
+
+    def test_calculator_code_uses_masses(self):
+        """Test that the stoichiometry calculator reports grams"""
+        from chem_codegen import CodeGenerator
+        namespace = {}
+        exec(CodeGenerator().generate_calculator_code(self.parse("HCl + NaOH -> NaCl + H2O")), namespace)
+        moles, grams = namespace['calculate_stoichiometry']({'HCl': 2.0})['NaCl']
+        self.assertEqual(moles, 2.0)
+        self.assertAlmostEqual(grams, 116.88, places=2)
+
+    def test_calculator_code_with_unknown_element(self):
+        """Test that the calculator runs when a mass is unknown"""
+        from chem_codegen import CodeGenerator
+        namespace = {}
+        exec(CodeGenerator().generate_calculator_code(self.parse("Xx + O2 -> XxO2")), namespace)
+        self.assertIsNone(namespace['MOLAR_MASSES']['XxO2'])
+        self.assertAlmostEqual(namespace['MOLAR_MASSES']['O2'], 31.998, places=3)
+        self.assertEqual(namespace['calculate_stoichiometry']({'Xx': 1.0}), {'XxO2': (1.0, None)})
+
+
+class TestReactionStore(unittest.TestCase):
+    """Test the columnar reaction store"""
+
+    LINES = ["HCl + NaOH -> NaCl + H2O", "NaOH + HCl", "bad@", "Ca(OH)2 + CO2", "K4[Fe(CN)6]"]
+
+    def test_columns_and_lazy_objects(self):
+        """Test species deduplication, CSR offsets and round-trip to Reaction"""
+        store = ReactionStore()
+        self.assertEqual(store.extend(self.LINES), 1)
+        self.assertEqual(len(store), 4)
+        self.assertEqual(store.n_species, 7)
+        self.assertEqual(list(store.reactant_offsets), [0, 2, 4, 6, 7])
+        self.assertEqual(list(store.product_offsets), [0, 2, 2, 2, 2])
+        self.assertEqual(store.reaction(0), Parser(Lexer(self.LINES[0]).tokenize()).parse())
+        self.assertEqual(str(store.reaction(3)), "K4FeC6N6 -> ?")
+
+    def test_save_and_mmap_load(self):
+        """Test that a saved store reopens memory-mapped and read-only"""
+        import os, tempfile
+        store = ReactionStore()
+        store.extend(self.LINES)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "corpus.store")
+            store.save(path)
+            loaded = ReactionStore.load(path)
+            self.assertTrue(loaded.readonly)
+            self.assertEqual([str(r) for r in loaded], [str(r) for r in store])
+            with self.assertRaises(ValueError):
+                loaded.add_text("H2")
+            loaded.close()
+
+            copy = ReactionStore.load(path, mmap_file=False)
+            copy.add_text("HCl + NaOH")
+            self.assertEqual(copy.n_species, 7)
+            self.assertEqual(len(copy), 5)
+
+
+class TestMatrixExport(unittest.TestCase):
+    """Test sparse element and stoichiometric matrices"""
+
+    def setUp(self):
+        self.matrices = export_matrices(["CH3COOH + NaOH -> NaCH3COO + H2O",
+                                         "HCl + HCl -> H2 + Cl2", "bad@"])
+
+    def test_id_maps_and_entries(self):
+        """Test stable IDs, merged element counts and signed coefficients"""
+        m = self.matrices
+        self.assertEqual(m.species, ['C2H4O2', 'HNaO', 'C2H3NaO2', 'H2O', 'ClH', 'H2', 'Cl2'])
+        self.assertEqual(m.elements, ['C', 'H', 'O', 'Na', 'Cl'])
+        dense = m.element_matrix.to_dense()
+        self.assertEqual([row[0] for row in dense], [2, 4, 2, 0, 0])  # C2H4O2
+        stoich = m.stoichiometry.to_dense()
+        self.assertEqual([row[1] for row in stoich], [0, 0, 0, 0, -2, 1, 1])
+
+    def test_csr_and_files(self):
+        """Test CSR conversion and .npy/.npz output"""
+        import os, tempfile, zipfile
+        csr = self.matrices.stoichiometry.to_csr()
+        self.assertEqual(list(csr.indptr), [0, 1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(csr.nnz, self.matrices.stoichiometry.nnz)
+        with tempfile.TemporaryDirectory() as tmp:
+            self.matrices.save_npy_dir(tmp)
+            data = read_npy(os.path.join(tmp, 'stoichiometry_data.npy'))
+            self.assertEqual(list(data), list(self.matrices.stoichiometry.data))
+            self.matrices.save_npz(os.path.join(tmp, 'corpus'))
+            with zipfile.ZipFile(os.path.join(tmp, 'corpus_elements.npz')) as zf:
+                self.assertEqual(sorted(zf.namelist()),
+                                 ['data.npy', 'format.npy', 'indices.npy', 'indptr.npy', 'shape.npy'])
+
+
+class TestBulkLexer(unittest.TestCase):
+    """Test tokenizing many reactions from one buffer"""
+
+    LINES = ["2H2 + O2 -> 2H2O", "Ca(OH)2 + H2SO4 → CaSO4 + H2O", "K4[Fe(CN)6] + HCl",
+             "bad@ + H", "A - B", "", "  Na  +  Cl2  "]
+
+    def tokens_tuple(self, tokens):
+        return [(t.type, t.value, t.pos) for t in tokens]
+
+    def test_matches_lexer(self):
+        """Test that every line gives the same tokens as Lexer"""
+        bulk = tokenize_buffer("\n".join(self.LINES))
+        self.assertEqual(len(bulk), len(self.LINES))
+        for i, line in enumerate(self.LINES):
+            expected = Lexer(line, raise_errors=False).tokenize()
+            self.assertEqual(self.tokens_tuple(bulk.tokens(i)), self.tokens_tuple(expected))
+            self.assertEqual(bulk.line_text(i), line)
+
+    def test_error_positions(self):
+        """Test per-line error lookup"""
+        bulk = tokenize_buffer("\n".join(self.LINES))
+        self.assertEqual([bulk.error_position(i) for i in range(len(bulk))],
+                         [None, None, None, 0, 3, None, None])
+
+    def test_bytes_and_mmap(self):
+        """Test bytes input, a trailing newline and a memory-mapped file"""
+        import mmap, tempfile
+        data = b"H2 + O2\nNaCl\n"
+        bulk = tokenize_buffer(data)
+        self.assertEqual(len(bulk), 2)
+        self.assertEqual(bulk.line_text(1), b"NaCl")
+        self.assertEqual([t.value for t in bulk.tokens(0)], ['H', 2, '+', 'O', 2, None])
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                mapped = tokenize_buffer(mm)
+                self.assertEqual(len(mapped), 2)
+                self.assertEqual(self.tokens_tuple(mapped.tokens(1)), self.tokens_tuple(bulk.tokens(1)))
+
+
+class TestBatch(unittest.TestCase):
+    """Test the memory-mapped batch compiler"""
+
+    DATA = ("H2 + O2\nHCl + NaOH\n\nbad@ + H\nNa + Cl2 → NaCl\nH₂ + O2\n"
+            "Xe + Xe\n").encode('utf-8')
+
+    def test_compile_buffer(self):
+        """Test counters, and that non-ASCII lines fall back to Lexer"""
+        result = compile_buffer(self.DATA)
+        self.assertEqual((result.lines, result.blank, result.syntax_errors), (7, 1, 2))
+        self.assertEqual(result.predicted, 2)
+        self.assertEqual(result.unpredicted, 1)
+        self.assertEqual(result.valid + result.invalid, 3)
+        messages = dict(result.errors)
+        self.assertIn('₂', messages[self.DATA.index('H₂'.encode('utf-8'))])
+
+    def test_split_ranges(self):
+        """Test that ranges cover the buffer and end on newlines"""
+        ranges = split_ranges(self.DATA, 3)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], len(self.DATA))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(self.DATA[end - 1:end], b'\n')
+
+    def test_workers_match_serial(self):
+        """Test that worker processes over byte ranges give the same result"""
+        import os, tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'reactions.txt')
+            with open(path, 'wb') as f:
+                f.write(self.DATA * 20)
+            serial = compile_file(path)
+            parallel = compile_file(path, workers=2)
+        for name in serial.COUNTERS:
+            self.assertEqual(getattr(parallel, name), getattr(serial, name))
+        self.assertEqual(parallel.errors, serial.errors)
+
+    def test_empty_file(self):
+        """Test reports for an empty file, with and without workers"""
+        import contextlib, io, os, tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'empty.txt')
+            open(path, 'w').close()
+            for workers in (1, 2):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    self.assertEqual(chem_batch.run(path, workers, stats='json'), 0)
+                self.assertTrue(output.getvalue().startswith("0 lines: 0 valid"), output.getvalue())
+                self.assertIn('"stages"', output.getvalue())
+
+
+class TestServer(unittest.TestCase):
+    """Test the NDJSON compile server on localhost"""
+
+    def run_with_server(self, scenario, **options):
+        import asyncio
+
+        async def run():
+            server = await CompileServer(port=0, **options).start()
+            try:
+                return await scenario(server)
+            finally:
+                await server.close()
+        return asyncio.run(run())
+
+    def test_concurrent_clients_are_batched(self):
+        """Test results and micro-batching across connections"""
+        import asyncio
+
+        async def scenario(server):
+            clients = [await CompileClient.connect(port=server.port) for _ in range(8)]
+            results = await asyncio.gather(*(c.compile("HCl + NaOH") for c in clients))
+            metrics = await clients[0].metrics()
+            for client in clients:
+                await client.close()
+            return results, metrics
+
+        results, metrics = self.run_with_server(scenario, max_delay=0.02)
+        for result in results:
+            self.assertTrue(result['ok'] and result['valid'] and result['predicted'])
+            self.assertEqual(result['reaction'], "HCl + NaOH -> NaCl + H2O")
+        self.assertEqual(metrics['requests'], 9)
+        self.assertLess(metrics['batches'], 8)
+        self.assertIsNotNone(metrics['latency_ms']['p50'])
+
+    def test_errors_and_codegen(self):
+        """Test syntax errors, malformed requests and generated code"""
+        async def scenario(server):
+            client = await CompileClient.connect(port=server.port)
+            results = [await client.compile("H2O@"), await client.call({'op': 'compile'}),
+                       await client.compile("HCl + NaOH -> NaCl + H2O", codegen=True)]
+            await client.close()
+            return results
+
+        syntax, malformed, compiled = self.run_with_server(scenario)
+        self.assertEqual(syntax['error']['name'], 'INVALID_CHAR')
+        self.assertEqual(syntax['error']['pos'], 3)
+        self.assertFalse(malformed['ok'])
+        self.assertIn('python', compiled['outputs'])
+
+    def test_pipelined_requests_with_small_queue(self):
+        """Test that a full queue delays requests instead of dropping them"""
+        import asyncio, json
+
+        async def scenario(server):
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            writer.write(b''.join(json.dumps({'id': i, 'reaction': 'Na + Cl'}).encode() + b'\n'
+                                  for i in range(200)))
+            await writer.drain()
+            replies = [json.loads(await reader.readline()) for _ in range(200)]
+            writer.close()
+            return replies
+
+        replies = self.run_with_server(scenario, max_pending=4, max_batch=8)
+        self.assertEqual(sorted(r['id'] for r in replies), list(range(200)))
+        self.assertTrue(all(r['ok'] for r in replies))
+
+
+class TestThreadSafety(unittest.TestCase):
+    """Test sharing one Semantics and CodeGenerator between threads"""
+
+    REACTIONS = ["HCl + NaOH", "CH4 + O2", "Na + Cl", "Al + O", "H2 + O2", "KClO3",
+                 "HNO3 + KOH", "HCl + NaOH -> NaCl + H2O", "K4[Fe(CN)6] + HCl"]
+
+    def compile_all(self, texts, semantics, codegen):
+        results = []
+        for text in texts:
+            reaction = Parser(Lexer(text).tokenize()).parse()
+            products, rule = semantics.predict_products(reaction.reactants)
+            reaction.products = reaction.products or products
+            is_valid, msg = semantics.validate_reaction(reaction)
+            code = codegen.generate(reaction) if is_valid and reaction.products else None
+            results.append((str(reaction), rule, is_valid, msg, code))
+        return results
+
+    def test_stateless_codegen(self):
+        """Test that CodeGenerator keeps no per-call state"""
+        self.assertEqual(vars(CodeGenerator()), {})
+
+    def test_concurrent_compilation(self):
+        """Test that 8 threads sharing instances match a serial run"""
+        import random, sys
+        from concurrent.futures import ThreadPoolExecutor
+        workload = self.REACTIONS * 40
+        expected = self.compile_all(workload, Semantics(), CodeGenerator())
+        semantics, codegen = Semantics(), CodeGenerator()
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # Force frequent thread switches
+        try:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                orders = []
+                for seed in range(8):
+                    order = list(range(len(workload)))
+                    random.Random(seed).shuffle(order)
+                    orders.append(order)
+                futures = [pool.submit(self.compile_all, [workload[i] for i in order], semantics, codegen)
+                           for order in orders]
+                for order, future in zip(orders, futures):
+                    self.assertEqual(future.result(), [expected[i] for i in order])
+        finally:
+            sys.setswitchinterval(interval)
+
+
+class TestPipeline(unittest.TestCase):
+    """Test the instrumented pipeline and its collectors"""
+
+    def test_hooks_run_around_each_stage(self):
+        """Test before/after order and stage skipping"""
+        calls = []
+
+        class Recorder(Collector):
+            def before(self, stage, result):
+                calls.append(('before', stage))
+
+            def after(self, stage, result, elapsed_ns):
+                calls.append(('after', stage))
+
+        pipeline = Pipeline(collectors=[Recorder()])
+        result = pipeline.compile("HCl + NaOH")
+        self.assertEqual([stage for kind, stage in calls if kind == 'after'], list(STAGES))
+        self.assertEqual(calls[:2], [('before', 'lex'), ('after', 'lex')])
+        self.assertTrue(result.predicted and result.valid)
+        self.assertIn('python', result.outputs)
+
+        calls.clear()
+        pipeline.compile("HCl + NaOH -> NaCl + H2O")
+        self.assertNotIn(('after', 'predict'), calls)
+
+    def test_errors(self):
+        """Test raising and non-raising syntax errors"""
+        with self.assertRaises(SyntaxError):
+            Pipeline().compile("H2O@")
+        stats = StatsCollector()
+        result = Pipeline(collectors=[stats], raise_errors=False).compile("H2O@")
+        self.assertEqual(result.error.code, ERR_INVALID_CHAR)
+        self.assertEqual(stats.errors['lex'], 1)
+        self.assertEqual(stats.stages['parse'].count, 0)
+
+    def test_stats_export(self):
+        """Test counters and the JSON/Prometheus exports"""
+        import json
+        stats = StatsCollector()
+        pipeline = Pipeline(collectors=[stats])
+        for text in ("HCl + NaOH", "HCl + NaOH", "Na + Cl", "Xe"):
+            pipeline.compile(text)
+        self.assertEqual(stats.reactions, 4)
+        self.assertEqual(stats.rules["Acid-Base Neutralization"], 2)
+        self.assertEqual(stats.tokens, 6 + 6 + 3 + 1)
+        self.assertGreater(stats.hit_rate('classify'), 0)
+        data = json.loads(stats.to_json())
+        self.assertEqual(data['stages']['lex']['count'], 4)
+        text = stats.to_prometheus()
+        self.assertIn('chem_stage_duration_seconds_count{stage="parse"} 4', text)
+        self.assertIn('chem_rule_hits_total{rule="Synthesis"} 1', text)
+        self.assertIn('lex', stats.format())
+
+    def test_batch_stats_across_workers(self):
+        """Test that worker collectors are merged"""
+        import os, tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'reactions.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("HCl + NaOH\nNa + Cl\nbad@\n" * 10)
+            serial = compile_file(path, stats=True).stats
+            parallel = compile_file(path, workers=2, stats=True).stats
+        self.assertEqual(serial.reactions, 20)
+        self.assertEqual(parallel.reactions, 20)
+        self.assertEqual(parallel.rules, serial.rules)
+        self.assertEqual(parallel.errors['lex'], 10)
+
+
+class TestMemoryProfiler(unittest.TestCase):
+    """Test per-stage tracemalloc profiling"""
+
+    def test_stage_memory_and_sites(self):
+        """Test peaks, sampled allocation sites and retained bytes"""
+        import tracemalloc
+        profiler = MemoryProfiler(sample_every=1, max_samples=3)
+        pipeline = Pipeline(collectors=[profiler])
+        self.assertTrue(tracemalloc.is_tracing())
+        for text in ("HCl + NaOH", "K4[Fe(CN)6] + HCl", "Na + Cl") * 5:
+            pipeline.compile(text)
+        profiler.finish()
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(profiler.reactions, 15)
+        codegen = profiler.stages['codegen']
+        self.assertGreater(codegen.peak_bytes, 0)
+        self.assertEqual(codegen.sampled, 3)
+        self.assertTrue(any(site.startswith('chem_codegen.py:') for site, _ in codegen.top_sites()))
+        self.assertIsNotNone(profiler.retained_per_reaction)
+        self.assertIn('retained after run', profiler.format())
+
+    def test_without_reset_peak(self):
+        """Test profiling where tracemalloc can't reset its peak (Python < 3.9)"""
+        import chem_memprofile
+        with mock.patch.object(chem_memprofile, 'RESET_PEAK', False), \
+             mock.patch.object(chem_memprofile.tracemalloc, 'reset_peak', side_effect=AssertionError):
+            profiler = MemoryProfiler(sample_every=100)
+            pipeline = Pipeline(collectors=[profiler])
+            for text in ("HCl + NaOH", "Na + Cl") * 5:
+                pipeline.compile(text)
+            profiler.finish()
+        self.assertEqual(profiler.reactions, 10)
+        self.assertGreater(profiler.stages['codegen'].peak_bytes, 0)
+
+    def test_batch_memprofile(self):
+        """Test memory profiles from batch workers"""
+        import os, tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'reactions.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("HCl + NaOH\nNa + Cl\n" * 20)
+            memory = compile_file(path, workers=2, memprofile=True).memory
+        self.assertEqual(memory.reactions, 40)
+        self.assertGreater(memory.stages['lex'].calls, 0)
+        self.assertEqual(memory.stages['parse'].calls, 40)
+
+    def test_batch_memprofile_empty_file(self):
+        """Test the memory report for an empty batch file"""
+        import contextlib, io, os, tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'empty.txt')
+            open(path, 'w').close()
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                self.assertEqual(chem_batch.run(path, memprofile=True), 0)
+        self.assertIn('retained after run', output.getvalue())
+
+
+class TestBenchSuite(unittest.TestCase):
+    """Test benchmark measurement and baseline comparison"""
+
+    def test_compare_flags_regressions(self):
+        """Test regression, improvement and new-benchmark flags"""
+        baseline = {'results': {'lex': {'ns_per_op': 100.0}, 'parse': {'ns_per_op': 100.0},
+                                'ir': {'ns_per_op': 100.0}}}
+        current = {'results': {'lex': {'ns_per_op': 125.0}, 'parse': {'ns_per_op': 105.0},
+                               'ir': {'ns_per_op': 50.0}, 'new': {'ns_per_op': 1.0}}}
+        status = {row[0]: row[4] for row in bench_suite.compare(current, baseline, threshold=0.2)}
+        self.assertEqual(status, {'lex': 'REGRESSION', 'parse': 'ok', 'ir': 'improved', 'new': 'new'})
+
+    def test_measure_reports_per_operation(self):
+        """Test the benchmark registry and per-operation timing"""
+        names = [name for name, _ in bench_suite.benchmarks()]
+        self.assertIn('codegen.generate_ir', names)
+        self.assertIn('pipeline.corpus', names)
+        fn, ops = dict(bench_suite.benchmarks())['lex']
+        result = bench_suite.measure(fn, ops, repeat=1, min_time=0)
+        self.assertEqual(result['ops_per_call'], len(bench_suite.SAMPLES))
+        self.assertGreater(result['ns_per_op'], 0)
+
+
+class TestCorpus(unittest.TestCase):
+    """Test the synthetic corpus generator"""
+
+    def test_same_seed_same_lines(self):
+        """Test that a seed reproduces the same corpus"""
+        first = list(CorpusGenerator(seed=7, max_depth=2).lines(500))
+        second = list(CorpusGenerator(seed=7, max_depth=2).lines(500))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, list(CorpusGenerator(seed=8, max_depth=2).lines(500)))
+
+    def test_invalid_rate_controls_syntax_errors(self):
+        """Test that invalid_rate controls syntax errors"""
+        clean = CorpusGenerator(seed=1, invalid_rate=0, max_depth=2, unicode_rate=0.5)
+        for line in clean.lines(300):
+            self.assertIsNone(try_parse(line)[1], line)
+        broken = CorpusGenerator(seed=1, invalid_rate=1, duplicate_rate=0)
+        for line in broken.lines(300):
+            self.assertIsNotNone(try_parse(line)[1], line)
+
+    def test_rule_lines_are_predicted(self):
+        """Test that rule-driven lines get predicted products"""
+        generator = CorpusGenerator(seed=2, invalid_rate=0, products_rate=0, random_rate=0)
+        semantics = Semantics()
+        for line in generator.lines(200):
+            reaction, _ = try_parse(line)
+            products, rule = semantics.predict_products(reaction.reactants)
+            self.assertTrue(products, line)
+
+    def test_write_corpus_streams_lines(self):
+        """Test writing a large corpus and compiling it"""
+        import os, tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'corpus.txt')
+            write_corpus(path, 20000, CorpusGenerator(seed=3))
+            result = compile_file(path)
+        self.assertEqual(result.lines, 20000)
+        self.assertGreater(result.syntax_errors, 0)
+        self.assertGreater(result.valid, 0)
+
+
+class TestStartup(unittest.TestCase):
+    """Test that CLI entry points leave optional modules unimported"""
+
+    def test_entry_points_import_only_what_they_use(self):
+        """Test that entry points skip unneeded imports"""
+        for entry_point, unwanted in bench_startup.UNWANTED.items():
+            imported = {row[0] for row in bench_startup.import_profile(entry_point)}
+            self.assertIn('chem_pipeline', imported)
+            self.assertEqual([name for name in unwanted if name in imported], [], entry_point)
+
+    def test_hand_parsed_arguments_match_argparse(self):
+        """Test main.py's fast argument parsing against argparse"""
+        import contextlib, io
+        import main
+        for argv in ([], ['--stats'], ['--stats', 'text', '--memprofile'],
+                     ['--batch', 'r.txt', '--workers', '4', '--stats', 'json'],
+                     ['--memprofile', '--batch', 'r.txt', '--warm-state', 'w.bin', '--stats'],
+                     ['--stats', '--batch', 'r.txt', '--workers', '0'], ['--mem']):
+            self.assertEqual(main.parse_args(argv), main._parse_args_full(argv), argv)
+        for argv in (['--stats', 'json'], ['--workers', 'x'], ['--batch'], ['--bogus']):
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                main.parse_args(argv)
+        # Both parsers are driven by the one OPTIONS table
+        extra = {'--level': dict(type=int, choices=(1, 2), default=1), '--quiet': dict(action='store_true')}
+        with mock.patch.dict(main.OPTIONS, extra):
+            argv = ['--quiet', '--level', '2']
+            self.assertEqual(main.parse_args(argv), main._parse_args_full(argv))
+            self.assertEqual(main.parse_args([])['level'], 1)
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                main.parse_args(['--level', '3'])
+
+
+class TestWarmState(unittest.TestCase):
+    """Test snapshotting and restoring the compiler caches"""
+
+    REACTIONS = ["Rb + I", "Sr(OH)2 + HBr", "C7H16 + O2", "CsClO3"]
+
+    def setUp(self):
+        # The tests evict and restore entries of the process-wide intern table
+        self.interned = dict(INTERNED_MOLECULES)
+
+    def tearDown(self):
+        INTERNED_MOLECULES.clear()
+        INTERNED_MOLECULES.update(self.interned)
+
+    def _warm(self):
+        semantics = Semantics()
+        molecules = []
+        for text in self.REACTIONS:
+            reaction, _ = try_parse(text)
+            for molecule in reaction.reactants:
+                molecule.canonical()
+                semantics.classify_compound(molecule)
+                molecules.append(molecule)
+        return semantics, molecules
+
+    def test_round_trip(self):
+        """Test snapshotting and restoring molecules and classifications"""
+        import os, tempfile
+        semantics, molecules = self._warm()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'warm.bin')
+            saved = chem_warmstate.snapshot(path, semantics)
+            self.assertEqual(saved['classifications'], len(semantics._classifications))
+            keys = [tuple(m.elements) for m in molecules]
+            for key in keys:
+                del INTERNED_MOLECULES[key]
+            restored = Semantics()
+            added = chem_warmstate.restore(path, restored)
+        self.assertEqual(added['molecules'], len(keys))
+        self.assertEqual(restored._classifications, semantics._classifications)
+        for key, molecule in zip(keys, molecules):
+            self.assertEqual(INTERNED_MOLECULES[key]._canonical, molecule.canonical())
+        reaction, _ = try_parse(self.REACTIONS[1])
+        self.assertIs(reaction.reactants[0], INTERNED_MOLECULES[keys[2]])  # Sr(OH)2
+
+    def test_rejects_corrupt_stale_and_foreign_files(self):
+        """Test that damaged or stale snapshots are rejected"""
+        import os, tempfile
+        semantics, _ = self._warm()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'warm.bin')
+            chem_warmstate.snapshot(path, semantics)
+            with open(path, 'rb') as f:
+                data = bytearray(f.read())
+
+            def check(content):
+                with open(path, 'wb') as f:
+                    f.write(content)
+                with self.assertRaises(chem_warmstate.WarmStateError):
+                    chem_warmstate.restore(path, Semantics())
+
+            corrupt = bytearray(data)
+            corrupt[-5] ^= 0xFF
+            check(corrupt)
+            check(data[:-10])
+            check(b'not a snapshot' * 10)
+            stale = bytearray(data)
+            stale[20] ^= 0xFF  # Inside the rules fingerprint
+            check(stale)
+
+    def test_batch_with_warm_state(self):
+        """Test batch compiling from a warm state"""
+        import os, tempfile
+        semantics, _ = self._warm()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'reactions.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(self.REACTIONS * 5) + "\n")
+            warm = os.path.join(tmp, 'warm.bin')
+            chem_warmstate.snapshot(warm, semantics)
+            warmed = set(semantics._classifications)
+            classify = Semantics._classify
+            with mock.patch.object(Semantics, '_classify', autospec=True, side_effect=classify) as cold_calls:
+                cold = compile_file(path)
+            # The batch run restores the snapshot once, before its first compile
+            restored = chem_batch.warm_semantics(warm)
+            try:
+                self.assertEqual(restored._classifications, semantics._classifications)
+                with mock.patch.object(Semantics, '_classify', autospec=True, side_effect=classify) as warm_calls:
+                    result = compile_file(path, warm_state=warm)
+            finally:
+                del chem_batch._warm_semantics[warm]
+        self.assertEqual(result.summary(), cold.summary())
+        classified = lambda calls: {tuple(call.args[1].elements) for call in calls.call_args_list}
+        self.assertEqual(classified(cold_calls) & warmed, warmed)
+        self.assertEqual(classified(warm_calls) & warmed, set())  # Memo hits only
+
+
+@unittest.skipIf(gui_compiler is None, "pygame is not installed")
+class TestGUI(unittest.TestCase):
+    """Test the GUI headless (SDL dummy video driver)"""
+
+    @classmethod
+    def setUpClass(cls):
+        import os
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        gui_compiler.pygame.init()
+        cls.app = gui_compiler.CompilerGUI()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.worker.stop()
+        gui_compiler.pygame.quit()
+
+    def wait_for_compile(self):
+        """Pump events until the compile in flight has been shown"""
+        pygame = gui_compiler.pygame
+        for _ in range(200):
+            if self.app.compiling is None:
+                return
+            self.app.handle_events([pygame.event.wait(100)])
+        self.fail("compile did not finish")
+
+    def test_text_area_renders_only_visible_lines(self):
+        """Test that the output area renders only visible lines"""
+        area = self.app.output_area
+        area.set_content("\n".join(f"line {i}" for i in range(5000)))
+        self.assertEqual(area.max_scroll, area.clip_rect.y + 5000 * area.LINE_HEIGHT - area.rect.bottom + 20)
+        area.scroll_offset = 100 * area.LINE_HEIGHT
+        first, last = area.visible_range()
+        self.assertEqual(first, 100)
+        self.assertLess(last - first, area.clip_rect.height // area.LINE_HEIGHT + 2)
+        area.draw(self.app.screen)
+        rendered = [i for i, surface in enumerate(area.surfaces) if surface is not None]
+        self.assertEqual(rendered, list(range(first, last)))
+
+    def test_compile_fills_stage_panels(self):
+        """Test a background compile filling the stage panels"""
+        self.app.input_box.text = "HCl + NaOH"
+        self.app.compile_reaction()
+        self.wait_for_compile()
+        self.app.draw()
+        self.assertEqual(self.app.stage4_area.lines[0][0], "✓ PASS")
+        self.assertEqual(self.app.stage1_area.lines[0][0], "1. Token(ELEMENT, 'H')")
+        self.assertTrue(any("NaCl" in text for text, _ in self.app.stage3_area.lines))
+
+    def test_redraws_only_dirty_widgets(self):
+        """Test that only changed widgets are redrawn"""
+        pygame = gui_compiler.pygame
+        self.app.full_redraw = True
+        self.app.draw()
+        self.assertEqual(self.app.draw(), [])
+        button = self.app.compile_button
+        self.app.handle_events([pygame.event.Event(pygame.MOUSEMOTION, pos=button.rect.center,
+                                                   rel=(0, 0), buttons=(0, 0, 0))])
+        self.assertEqual(self.app.draw(), [button.rect])
+        self.app.input_box.text = "Na + Cl"
+        self.assertEqual(self.app.draw(), [self.app.input_box.rect])
+
+    def test_token_columns(self):
+        """Test the compact token list compile results are sent back in"""
+        import pickle
+        tokens = Lexer("K4[Fe(CN)6] -> K + Fe").tokenize()
+        columns = pickle.loads(pickle.dumps(gui_compiler.TokenColumns.of(tokens)))
+        self.assertEqual(len(columns), len(tokens))
+        self.assertEqual([(t.type, t.value, t.pos) for t in columns[:-1]],
+                         [(t.type, t.value, t.pos) for t in tokens[:-1]])
+        self.assertEqual(columns[-1].type, TOKEN_EOF)
+
+    def test_newer_compile_supersedes_older(self):
+        """Test that a newer compile replaces one in flight"""
+        heavy = ' + '.join(['K4[Fe(CN)6]'] * 3000)
+        self.app.compile_reaction(f"{heavy} -> {heavy}")
+        self.app.compile_reaction("Zn + HCl")
+        self.wait_for_compile()
+        self.assertEqual(self.app.stage2_area.lines[0][0], "R: 2 mols")
+
+    def test_editing_cancels_compile(self):
+        """Test that typing cancels the compile in flight"""
+        pygame = gui_compiler.pygame
+        heavy = ' + '.join(['K4[Fe(CN)6]'] * 3000)
+        self.app.compile_reaction(f"{heavy} -> {heavy}")
+        generation = self.app.compiling['generation']
+        self.app.input_box.active = True
+        self.app.handle_events([pygame.event.Event(pygame.KEYDOWN, key=pygame.K_a, unicode='a',
+                                                   mod=0, scancode=0)])
+        self.assertIsNone(self.app.compiling)
+        self.assertNotEqual(self.app.worker.generation, generation)
+        self.app.input_box.active = False
+
+    def test_live_compile_as_you_type(self):
+        """Test compiling the input as it is typed"""
+        pygame = gui_compiler.pygame
+        self.app.input_box.text = ""
+        self.app.input_box.active = True
+        for char in "Zn + HCl":
+            self.app.handle_events([pygame.event.Event(pygame.KEYDOWN, key=0, unicode=char,
+                                                       mod=0, scancode=0)])
+            self.app.update()
+        self.app.input_box.active = False
+        self.assertIsNone(self.app.live_due)
+        self.wait_for_compile()
+        self.assertEqual(self.app.stage2_area.lines[0][0], "R: 2 mols")
+        self.assertEqual(self.app.stage4_area.lines[0][0], "✓ PASS")
+
+    def test_large_paste_never_blocks_loop(self):
+        """Test that a large paste compiles in the worker while frames stay short"""
+        import time
+        pygame = gui_compiler.pygame
+        heavy = ' + '.join(['K4[Fe(CN)6]'] * 5000)
+        paste = pygame.event.Event(pygame.KEYDOWN, key=0, unicode=f"{heavy} -> {heavy}", mod=0, scancode=0)
+        self.app.input_box.text = ""
+        self.app.input_box.active = True
+        with mock.patch.object(gui_compiler.Pipeline, 'run_stage',
+                               side_effect=AssertionError("compiled on the UI thread")):
+            start = time.perf_counter()
+            self.app.handle_events([paste])
+            self.app.update()
+            self.app.draw()
+            elapsed = time.perf_counter() - start
+            self.assertIsNotNone(self.app.compiling)
+            self.wait_for_compile()
+        self.app.input_box.active = False
+        self.assertLess(elapsed, 2 / gui_compiler.FPS)
+        self.assertLess(gui_compiler.FONT_BODY.size(self.app.input_box.visible_text())[0],
+                        self.app.input_box.rect.width)
+        self.assertEqual(self.app.stage2_area.lines[0][0], "R: 5000 mols")
+        self.app.clear_all()
+
+    def test_batch_mode(self):
+        """Test loading, filtering and selecting in batch mode"""
+        import os, tempfile
+        pygame = gui_compiler.pygame
+        lines = ["HCl + NaOH", "", "H2O@", "Zn + HCl -> ZnCl2 + H2"] + ["Na + Cl"] * 2000
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "reactions.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines))
+            self.assertTrue(self.app.open_batch(path))
+            job, batch_list = self.app.batch, self.app.batch_list
+            for _ in range(200):
+                if job.done:
+                    break
+                self.app.handle_events([pygame.event.wait(100)])
+            self.app.handle_events()
+            self.assertEqual(len(batch_list.view), len(job))
+            self.assertEqual(len(job), 2003)
+            self.assertEqual(job.counts, [2001, 1, 1])  # Valid, invalid (Zn + HCl), syntax error
+            self.assertEqual(len(job.offsets) * job.offsets.itemsize + len(job.line_numbers) * job.line_numbers.itemsize
+                             + len(job.statuses) + len(job.rule_ids), 14 * len(job))
+
+            self.app.draw()
+            self.assertLessEqual(len(batch_list.surfaces), batch_list.page_rows + 1)
+            batch_list.cycle_status()
+            batch_list.cycle_status()
+            batch_list.cycle_status()
+            self.assertEqual(list(batch_list.view), [1])
+            self.assertEqual(job.line(1), "H2O@")
+            self.assertTrue(batch_list.label(1).startswith("      3  H2O@"))  # Its line, past the blank one
+            batch_list.cycle_status()
+            while batch_list.rule_filter is None or job.rules[batch_list.rule_filter] != "Synthesis":
+                batch_list.cycle_rule()
+            self.assertEqual(len(batch_list.view), 2000)
+
+            click = pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=batch_list.clip_rect.topleft)
+            self.app.handle_events([click])
+            self.assertEqual(batch_list.selected, 3)
+            self.wait_for_compile()
+            self.assertTrue(any("NaCl" in text for text, _ in self.app.stage3_area.lines))
+            self.app.clear_all()
+        self.assertIsNone(self.app.batch)
+        self.assertIn(self.app.output_area, self.app.widgets)
+
+    def test_loop_exits_on_quit(self):
+        """Test that the main loop stops on QUIT"""
+        pygame = gui_compiler.pygame
+        self.app.running = True
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+        self.app.loop()
+        self.assertFalse(self.app.running)
+
+
+class TestIncremental(unittest.TestCase):
+    """Test incremental recompilation against full compiles"""
+
+    def signature(self, result):
+        error = result.error
+        return ([(t.type, t.value, t.pos) for t in result.tokens], repr(result.reaction),
+                result.rule, result.valid, result.message, result.outputs,
+                None if error is None else (error.code, error.pos, error.message))
+
+    def test_matches_full_compile(self):
+        """Test incremental results against full compiles while editing"""
+        import random
+        full = Pipeline(raise_errors=False)
+        compiler = IncrementalCompiler(cache_size=4)
+        rng = random.Random(0)
+        for line in CorpusGenerator(seed=1, invalid_rate=0.3, max_depth=2).lines(60):
+            text = ""
+            for char in line:
+                text += char
+                self.assertEqual(self.signature(compiler.compile(text)), self.signature(full.compile(text)))
+            for _ in range(10):
+                at = rng.randint(0, len(text))
+                end = rng.randint(at, min(len(text), at + 3))
+                text = text[:at] + "".join(rng.choice("HONaCl()[]2 +->@") for _ in range(rng.randint(0, 3))) + text[end:]
+                self.assertEqual(self.signature(compiler.compile(text)), self.signature(full.compile(text)), text)
+
+    def test_reuses_unchanged_tokens_and_molecules(self):
+        """Test reuse of unchanged tokens and molecules"""
+        compiler = IncrementalCompiler()
+        compiler.compile("K4[Fe(CN)6] + Ca(OH)2 -> CaO + H2O")
+        lexed, reused, molecules = compiler.lexed_tokens, compiler.reused_tokens, compiler.reused_molecules
+        result = compiler.compile("K4[Fe(CN)6] + Sr(OH)2 -> CaO + H2O")
+        self.assertEqual(compiler.lexed_tokens - lexed, 1)  # Sr
+        self.assertEqual(compiler.reused_tokens - reused, result.n_tokens)  # Everything else, EOF included
+        self.assertEqual(compiler.reused_molecules - molecules, 3)
+        self.assertEqual([t.pos for t in result.tokens], [t.pos for t in Lexer(result.text).tokenize()])
+
+    def test_compile_cache(self):
+        """Test the compile cache and its size limit"""
+        compiler = IncrementalCompiler(cache_size=2)
+        first = compiler.compile("HCl + NaOH")
+        compiler.compile("HCl + KOH")
+        self.assertIs(compiler.compile("HCl + NaOH"), first)
+        self.assertEqual(compiler.cache_hits, 1)
+        compiler.compile("Na + Cl")
+        self.assertNotIn("HCl + NaOH", compiler.cache)
+
+
+class TestLsp(unittest.TestCase):
+    """Test the stdio diagnostics daemon"""
+
+    def test_incremental_edits_match_fresh_analysis(self):
+        """Test incremental document edits against fresh analysis"""
+        import random
+        analyzer = LineAnalyzer()
+        rng = random.Random(0)
+        document = Document("file:///t.rxn", "\n".join(CorpusGenerator(seed=2).lines(100)), 1, analyzer)
+        for _ in range(200):
+            lines = document.lines
+            first = rng.randrange(len(lines))
+            last = min(len(lines) - 1, first + rng.choice((0, 0, 1, 2)))
+            start = rng.randint(0, len(lines[first]))
+            end = rng.randint(start if last == first else 0, len(lines[last]))
+            text = "".join(rng.choice(("H", "Na", "\n", " + ", "->", "→", "2", "@")) for _ in range(rng.randint(0, 3)))
+            document.apply({'range': {'start': {'line': first, 'character': start},
+                                      'end': {'line': last, 'character': end}}, 'text': text})
+            fresh = Document("file:///t.rxn", "\n".join(document.lines), 1, analyzer)
+            self.assertEqual(document.rendered, fresh.rendered)
+
+    def test_scripted_session(self):
+        """Test a scripted session with the daemon"""
+        uri = "file:///t.rxn"
+        client = LspClient()
+        try:
+            capabilities = client.initialize()['capabilities']
+            self.assertEqual(capabilities['textDocumentSync']['change'], 2)
+            client.open(uri, "HCl + NaOH\nH2O@\n\nZn + HCl -> ZnCl2 + H2\nHCl + NaOH -> NaCl + H2O")
+            diagnostics = client.diagnostics(uri)['diagnostics']
+            self.assertEqual([(d['range']['start']['line'], d['code']) for d in diagnostics],
+                             [(0, 'PREDICTED'), (1, 'INVALID_CHAR'), (3, 'VALIDATION')])
+            self.assertEqual(diagnostics[0]['message'], "Predicted: NaCl + H2O (Acid-Base Neutralization)")
+            self.assertEqual(diagnostics[1]['range']['start']['character'], 3)
+
+            # Fix the syntax error, then insert a line above everything
+            client.edit(uri, 2, (1, 3), (1, 4), "")
+            client.edit(uri, 3, (0, 0), (0, 0), "Na + Cl\n")
+            diagnostics = client.diagnostics(uri)
+            while diagnostics['version'] != 3:  # The edits may or may not be published together
+                diagnostics = client.diagnostics(uri)
+            self.assertEqual([(d['range']['start']['line'], d['code']) for d in diagnostics['diagnostics']],
+                             [(0, 'PREDICTED'), (1, 'PREDICTED'), (2, 'NO_PREDICTION'), (4, 'VALIDATION')])
+
+            self.assertIn('error', client.request('textDocument/unknown', {}))
+            client.notify('textDocument/didClose', {'textDocument': {'uri': uri}})
+            self.assertEqual(client.diagnostics(uri)['diagnostics'], [])
+        finally:
+            self.assertEqual(client.close(), 0)
+
+
+    def test_malformed_messages_keep_serving(self):
+        """Test that garbage gets error responses and the daemon keeps serving"""
+        import chem_lsp
+        uri = "file:///t.rxn"
+        client = LspClient()
+        try:
+            client.initialize()
+            client.open(uri, "Na + Cl")
+            client.diagnostics(uri)
+            for garbage in ('[{"jsonrpc": "2.0", "method": "initialized"}]', '5', '{"id": 7,', '{"id": 8, "method": 5}'):
+                chem_lsp.write_message(client.process.stdin, garbage)
+            client.notify('textDocument/didChange', {'textDocument': {'uri': uri, 'version': 2}})
+            client.notify('textDocument/didOpen', None)
+            codes = [client.receive(lambda message: 'error' in message)['error']['code'] for _ in range(4)]
+            self.assertEqual(codes, [chem_lsp.INVALID_REQUEST, chem_lsp.INVALID_REQUEST,
+                                     chem_lsp.PARSE_ERROR, chem_lsp.INVALID_REQUEST])
+            client.edit(uri, 3, (0, 5), (0, 7), "@")
+            diagnostics = client.diagnostics(uri)
+            while diagnostics['version'] != 3:
+                diagnostics = client.diagnostics(uri)
+            self.assertEqual([d['code'] for d in diagnostics['diagnostics']], ['INVALID_CHAR'])
+        finally:
+            self.assertEqual(client.close(), 0)
+
 
 class TestSemantics(unittest.TestCase):
     """Test the semantic analysis component"""